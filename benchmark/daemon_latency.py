@@ -0,0 +1,71 @@
+"""Benchmark latency of CLI runs with and without a formatting daemon.
+
+Usage: `python benchmark/daemon_latency.py [RUNS]`
+
+A small Markdown file is checked 20 (or RUNS) times by running
+`python -m mdformat --check` in a new process, the way pre-commit hooks
+and editors run mdformat. Cold runs format in-process. Warm runs are
+forwarded to a daemon started with `mdformat --daemon`.
+"""
+
+import os
+from pathlib import Path
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+SAMPLE = """\
+# Title
+
+Some *emphasis* and a [link](https://example.com).
+
+- item one
+- item two
+"""
+
+
+def time_runs(args: list[str], env: dict[str, str], runs: int) -> list[float]:
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(args, env=env, check=True)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def report(name: str, timings: list[float]) -> None:
+    print(
+        f"{name}: median {statistics.median(timings) * 1000:.1f} ms,"
+        f" min {min(timings) * 1000:.1f} ms"
+    )
+
+
+def main() -> None:
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        file_path = Path(tmp_dir) / "sample.md"
+        file_path.write_text(SAMPLE)
+        socket_path = os.path.join(tmp_dir, "daemon", "sock")
+        env = {**os.environ, "MDFORMAT_DAEMON_SOCKET": socket_path}
+        args = [sys.executable, "-m", "mdformat", "--check", str(file_path)]
+
+        report("cold", time_runs(args, env, runs))
+
+        daemon = subprocess.Popen(
+            [sys.executable, "-m", "mdformat", "--daemon"],
+            env=env,
+            stderr=subprocess.DEVNULL,
+        )
+        try:
+            while not os.path.exists(socket_path):
+                time.sleep(0.01)
+            report("warm", time_runs(args, env, runs))
+        finally:
+            daemon.terminate()
+            daemon.wait()
+
+
+if __name__ == "__main__":
+    main()
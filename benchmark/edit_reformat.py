@@ -0,0 +1,59 @@
+"""Benchmark reformatting an edited document with and without caching.
+
+Usage: `python benchmark/edit_reformat.py [WRAP]`
+
+A document of about 10k lines is generated from this project's docs.
+After an initial format, one paragraph is edited and the document is
+reformatted, first using a cold `mdformat.text()` call and then using a
+long-lived `mdformat.Formatter` with caching enabled.
+"""
+
+from pathlib import Path
+import sys
+import time
+
+import mdformat
+
+DOCS = Path(__file__).parent.parent / "docs"
+TARGET_LINES = 10_000
+EDITS = 20
+
+
+def make_document() -> str:
+    sources = [p.read_text(encoding="utf-8") for p in sorted(DOCS.glob("**/*.md"))]
+    md = "\n\n".join(sources)
+    return md * (TARGET_LINES // md.count("\n") + 1)
+
+
+def edited(md: str, i: int) -> str:
+    paragraphs = md.split("\n\n")
+    index = (i * 7919) % len(paragraphs)
+    paragraphs[index] += f" Edit number {i}."
+    return "\n\n".join(paragraphs)
+
+
+def main() -> None:
+    wrap = sys.argv[1] if len(sys.argv) > 1 else "keep"
+    options = {"wrap": int(wrap) if wrap.isdigit() else wrap}
+    md = mdformat.text(make_document(), options=options)
+    print(f"{md.count(chr(10))} lines, wrap={options['wrap']}")
+
+    formatter = mdformat.Formatter(options=options, cache=True)
+    formatter.text(md)  # warm up
+
+    cold_total = warm_total = 0.0
+    for i in range(EDITS):
+        doc = edited(md, i)
+        start = time.perf_counter()
+        cold = mdformat.text(doc, options=options)
+        cold_total += time.perf_counter() - start
+        start = time.perf_counter()
+        warm = formatter.text(doc)
+        warm_total += time.perf_counter() - start
+        assert warm == cold
+    print(f"cold mdformat.text():       {cold_total / EDITS * 1000:.1f} ms")
+    print(f"cached Formatter.text():    {warm_total / EDITS * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
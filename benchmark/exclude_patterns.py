@@ -0,0 +1,71 @@
+"""Benchmark matching paths against exclude patterns.
+
+Usage: `python benchmark/exclude_patterns.py [PATTERNS] [PATHS]`
+
+300 (or PATTERNS) exclude patterns are matched against 100k (or PATHS)
+relative paths, using a combined matcher compiled from all the patterns,
+using one compiled matcher per pattern, and, on Python 3.13+, using
+`PurePath.full_match`.
+"""
+
+from pathlib import PurePosixPath
+import random
+import sys
+import time
+
+from mdformat._glob import compile_patterns
+
+
+def make_patterns(count: int) -> list[str]:
+    patterns = []
+    for i in range(count):
+        kind = i % 4
+        if kind == 0:
+            patterns.append(f"docs/section{i}/page.md")
+        elif kind == 1:
+            patterns.append(f"**/vendor{i}/**")
+        elif kind == 2:
+            patterns.append(f"pkg{i}/*.md")
+        else:
+            patterns.append(f"**/draft{i}-*.md")
+    return patterns
+
+
+def make_paths(count: int) -> list[str]:
+    rng = random.Random(0)
+    return [
+        "/".join(f"dir{rng.randrange(500)}" for _ in range(rng.randrange(1, 5)))
+        + f"/file{i}.md"
+        for i in range(count)
+    ]
+
+
+def main() -> None:
+    pattern_count = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    path_count = int(sys.argv[2]) if len(sys.argv) > 2 else 100_000
+    patterns = make_patterns(pattern_count)
+    paths = make_paths(path_count)
+    print(f"{len(patterns)} patterns, {len(paths)} paths")
+
+    start = time.perf_counter()
+    matcher = compile_patterns(tuple(patterns))
+    combined = sum(matcher.match(path) for path in paths)
+    print(f"combined matcher:     {time.perf_counter() - start:.2f} s")
+
+    start = time.perf_counter()
+    matchers = [compile_patterns((pattern,)) for pattern in patterns]
+    separate = sum(any(m.match(path) for m in matchers) for path in paths)
+    print(f"matcher per pattern:  {time.perf_counter() - start:.2f} s")
+    assert combined == separate
+
+    if sys.version_info >= (3, 13):
+        start = time.perf_counter()
+        full_match = sum(
+            any(PurePosixPath(path).full_match(p) for p in patterns) for path in paths
+        )
+        print(f"PurePath.full_match:  {time.perf_counter() - start:.2f} s")
+        assert combined == full_match
+
+
+if __name__ == "__main__":
+    main()
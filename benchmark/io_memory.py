@@ -0,0 +1,60 @@
+"""Compare peak memory of decoding, newline conversion, comparison and
+writing around formatting, before and after the bytes-native I/O path.
+
+Usage: `python benchmark/io_memory.py [MEGABYTES]`
+
+Formatting itself is not measured. A document of MEGABYTES (default
+100) and its "formatted" version are generated up front, and each
+variant then does what the CLI does with them for an unchanged and a
+changed document, using LF and CRLF line endings. Output is written to
+`os.devnull`.
+"""
+
+import os
+import sys
+import tracemalloc
+
+from mdformat._util import detect_newline_type, newline_converted_equal, write_md
+
+
+def copying(original: bytes, formatted: str, eol: str) -> None:
+    original_str = original.decode()
+    newline = detect_newline_type(original_str, eol)
+    formatted = formatted.replace("\n", newline)
+    if formatted != original_str:
+        with open(os.devnull, "wb") as f:
+            f.write(formatted.encode())
+
+
+def bytes_native(original: bytes, formatted: str, eol: str) -> None:
+    original_str = original.decode()
+    newline = detect_newline_type(original_str, eol)
+    if not newline_converted_equal(formatted, newline, original_str):
+        with open(os.devnull, "wb") as f:
+            write_md(f, formatted, newline)
+
+
+def measure(func, original: bytes, formatted: str, eol: str) -> int:
+    tracemalloc.start()
+    func(original, formatted, eol)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def main() -> None:
+    megabytes = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    line_count = megabytes * 10**6 // 16
+    formatted = "".join(f"- item {i:08}\n" for i in range(line_count))
+    print(f"{len(formatted) / 1e6:.0f} MB of Markdown")
+    for eol, newline in (("lf", "\n"), ("crlf", "\r\n")):
+        unchanged = formatted.replace("\n", newline).encode()
+        changed = unchanged.replace(b"- ", b"* ")
+        for label, original in (("unchanged", unchanged), ("changed", changed)):
+            for func in (copying, bytes_native):
+                peak = measure(func, original, formatted, eol)
+                print(f"{eol:4} {label:9} {func.__name__:12}: {peak / 1e6:.1f} MB peak")
+
+
+if __name__ == "__main__":
+    main()
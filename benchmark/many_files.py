@@ -0,0 +1,68 @@
+"""Benchmark formatting a tree of many small Markdown files.
+
+Usage: `python benchmark/many_files.py [FILES]`
+
+A temporary directory of 10k (or FILES) small Markdown files is
+generated. Half of the subdirectories have their own `.mdformat.toml`.
+The tree is then formatted with the CLI, and for comparison the same
+files are formatted and validated one by one using a parser built per
+file.
+"""
+
+from pathlib import Path
+import sys
+import tempfile
+import time
+
+import mdformat
+from mdformat._cli import run
+from mdformat._conf import DEFAULT_OPTS, read_toml_opts
+from mdformat._util import is_md_equal
+
+DIRS = 20
+SAMPLE = """\
+# Title {i}
+
+Some *emphasis* and a [link](https://example.com/{i}).
+
+- item one
+- item two
+"""
+
+
+def make_tree(root: Path, files: int) -> list[Path]:
+    paths = []
+    for d in range(DIRS):
+        directory = root / f"dir{d}"
+        directory.mkdir()
+        if d % 2:
+            (directory / ".mdformat.toml").write_text("wrap = 60\n")
+        for i in range(files // DIRS):
+            path = directory / f"file{i}.md"
+            path.write_text(SAMPLE.format(i=i))
+            paths.append(path)
+    return paths
+
+
+def main() -> None:
+    files = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        paths = make_tree(Path(tmp_dir), files)
+        print(f"{len(paths)} files")
+
+        start = time.perf_counter()
+        for path in paths:
+            toml_opts, _ = read_toml_opts(path.parent)
+            opts = {**DEFAULT_OPTS, **toml_opts}
+            md = path.read_text()
+            formatted = mdformat.text(md, options=opts)
+            assert is_md_equal(md, formatted, options=opts)
+        print(f"parser per file:         {time.perf_counter() - start:.2f} s")
+
+        start = time.perf_counter()
+        assert run([tmp_dir]) == 0
+        print(f"CLI (pipeline per conf): {time.perf_counter() - start:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
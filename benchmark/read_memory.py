@@ -0,0 +1,45 @@
+"""Compare peak memory of reading a large Markdown file with
+`read_bytes().decode()` and with `mdformat._util.read_md`, which
+memory-maps large files.
+
+Usage: `python benchmark/read_memory.py [MEGABYTES]`
+
+A file of MEGABYTES (default 100) is generated in a temporary
+directory. Memory of the mapping is not allocated by Python, and is not
+included in the peak.
+"""
+
+from pathlib import Path
+import sys
+import tempfile
+import tracemalloc
+
+from mdformat._util import read_md
+
+
+def read_bytes_decode(path: Path) -> str:
+    return path.read_bytes().decode()
+
+
+def measure(func, path: Path) -> int:
+    tracemalloc.start()
+    func(path)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def main() -> None:
+    megabytes = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    line = "- ä reference entry\n".encode()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = Path(tmp_dir) / "large.md"
+        path.write_bytes(line * (megabytes * 10**6 // len(line)))
+        print(f"{path.stat().st_size / 1e6:.0f} MB file")
+        for func in (read_bytes_decode, read_md):
+            peak = measure(func, path)
+            print(f"{func.__name__:17}: {peak / 1e6:.1f} MB peak")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+"""Compare peak memory of `SyntaxTreeNode` and `RenderTreeNode` trees.
+
+Usage: `python benchmark/tree_memory.py [REPEAT]`
+
+A document is generated by repeating this project's README `REPEAT`
+times. Both tree types are then built from the same token stream, and
+every node is visited once, as rendering would do.
+"""
+
+from pathlib import Path
+import sys
+import tracemalloc
+
+from markdown_it import MarkdownIt
+from markdown_it.tree import SyntaxTreeNode
+
+from mdformat.renderer import RenderTreeNode
+
+README = Path(__file__).parent.parent / "README.md"
+
+
+def measure(tree_cls, tokens) -> int:
+    tracemalloc.start()
+    tree = tree_cls(tokens)
+    for _ in tree.walk():
+        pass
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def main() -> None:
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    md = README.read_text(encoding="utf-8") * repeat
+    tokens = MarkdownIt().parse(md)
+    print(f"{len(md) / 1e6:.1f} MB of Markdown, {len(tokens)} block tokens")
+    for tree_cls in (SyntaxTreeNode, RenderTreeNode):
+        peak = measure(tree_cls, tokens)
+        print(f"{tree_cls.__name__}: {peak / 1e6:.1f} MB peak")
+
+
+if __name__ == "__main__":
+    main()
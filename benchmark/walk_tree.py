@@ -0,0 +1,65 @@
+"""Benchmark finding Markdown files in a large directory tree.
+
+Usage: `python benchmark/walk_tree.py [ENTRIES]`
+
+A temporary tree of 200k (or ENTRIES) files and directories is
+generated. Most of it is a "node_modules" directory. Markdown files are
+then listed using `Path.glob`, using mdformat's directory walker, and
+using the walker with "node_modules" excluded.
+"""
+
+import os
+from pathlib import Path
+import sys
+import tempfile
+import time
+
+from mdformat._cli import walk_md_files
+
+FILES_PER_DIR = 20
+
+
+def make_tree(root: Path, entries: int) -> None:
+    count = 0
+    for top, share in (("docs", 0.1), ("node_modules", 0.9)):
+        for d in range(int(entries * share) // (FILES_PER_DIR + 1)):
+            directory = root / top / f"pkg{d // 100}" / f"dir{d}"
+            directory.mkdir(parents=True)
+            for i in range(FILES_PER_DIR):
+                suffix = ".md" if i % 4 == 0 else ".js"
+                (directory / f"file{i}{suffix}").touch()
+            count += FILES_PER_DIR + 1
+    print(f"{count} entries")
+
+
+def glob_md_files(directory: Path) -> list[Path]:
+    """The directory walking algorithm of mdformat 0.7.21."""
+    paths = []
+    for p in directory.glob("**/*.md"):
+        if p.is_file():
+            p = Path(os.path.abspath(p))
+            if p.exists():
+                paths.append(p)
+    return paths
+
+
+def main() -> None:
+    entries = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        root = Path(tmp_dir)
+        make_tree(root, entries)
+        for name, walk in [
+            ("Path.glob:           ", lambda: glob_md_files(root)),
+            ("walker:              ", lambda: list(walk_md_files(root))),
+            (
+                "walker, excluded dir:",
+                lambda: list(walk_md_files(root, lambda p: p.name == "node_modules")),
+            ),
+        ]:
+            start = time.perf_counter()
+            paths = walk()
+            print(f"{name} {time.perf_counter() - start:.2f} s ({len(paths)} files)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,28 @@
-__all__ = ("file", "text")
+__all__ = ("file", "text", "text_bytes", "fingerprint", "Formatter")
 __version__ = "0.7.21"  # DO NOT EDIT THIS LINE MANUALLY. LET bump2version UTILITY DO IT
 
-from mdformat._api import file, text
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from mdformat._api import Formatter, file, fingerprint, text, text_bytes
+
+# Public submodules that are imported on first attribute access
+_SUBMODULES = frozenset({"codepoints", "plugins", "renderer"})
+
+
+def __getattr__(name: str) -> Any:
+    # The API is imported lazily, so that the thin CLI client that
+    # forwards to a formatting daemon does not pay for importing the
+    # parser and plugins.
+    if name in __all__:
+        import mdformat._api
+
+        value = getattr(mdformat._api, name)
+    elif name in _SUBMODULES:
+        import importlib
+
+        value = importlib.import_module(f"mdformat.{name}")
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    globals()[name] = value
+    return value
@@ -1,11 +1,18 @@
 import sys
 from typing import NoReturn
 
-import mdformat._cli
+from mdformat import _daemon
 
 
 def run() -> NoReturn:
-    exit_code = mdformat._cli.run(sys.argv[1:])
+    args = sys.argv[1:]
+    # Forward to a running daemon if there is one. Import the CLI only
+    # when formatting in this process.
+    exit_code = _daemon.forward(args)
+    if exit_code is None:
+        from mdformat import _cli
+
+        exit_code = _cli.run(args)
     sys.exit(exit_code)
 
 
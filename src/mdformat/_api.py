@@ -1,14 +1,267 @@
 from __future__ import annotations
 
-from collections.abc import Iterable, Mapping
+from collections.abc import Iterable, Mapping, Sequence
+from concurrent.futures import Executor
 from contextlib import AbstractContextManager
+import hashlib
+import json
 from os import PathLike
 from pathlib import Path
 from typing import Any
 
+import markdown_it
+
 from mdformat._conf import DEFAULT_OPTS
-from mdformat._util import EMPTY_MAP, NULL_CTX, build_mdit, detect_newline_type
-from mdformat.renderer import MDRenderer
+from mdformat._util import (
+    EMPTY_MAP,
+    NULL_CTX,
+    build_mdit,
+    detect_newline_type,
+    encode_md,
+    newline_converted_equal,
+    read_md,
+    write_md,
+)
+import mdformat.plugins
+from mdformat.renderer import (
+    BlockMemo,
+    CodeFormatterCache,
+    MDRenderer,
+    RenderMemo,
+    RenderTreeNode,
+)
+
+# An inclusive range of 1-based line numbers
+LineRange = tuple[int, int]
+
+
+class Formatter:
+    """A reusable Markdown formatter.
+
+    The parser is built once for the given options, extensions and code
+    formatters. If `cache` is True, rendered top-level blocks and pure
+    inline renders are cached, so that reformatting an edited document
+    only renders the blocks that changed.
+
+    If `codeformatter_executor` is given, all code blocks of a document
+    are submitted to it for formatting before rendering the document.
+
+    Code formatter results are cached in `codeformatter_cache`. If
+    `cache` is True and no `codeformatter_cache` is given, an in-memory
+    one is created.
+    """
+
+    def __init__(
+        self,
+        *,
+        options: Mapping[str, Any] = EMPTY_MAP,
+        extensions: Iterable[str] = (),
+        codeformatters: Iterable[str] = (),
+        cache: bool = False,
+        codeformatter_executor: Executor | None = None,
+        codeformatter_cache: CodeFormatterCache | None = None,
+    ) -> None:
+        self._do_second_pass = options.get("wrap", DEFAULT_OPTS["wrap"]) != "keep"
+        self._end_of_line = options.get("end_of_line", DEFAULT_OPTS["end_of_line"])
+        self._mdformat_opts = {**options, "filename": ""}
+        self._mdit = build_mdit(
+            MDRenderer,
+            mdformat_opts=self._mdformat_opts,
+            extensions=extensions,
+            codeformatters=codeformatters,
+        )
+        if codeformatter_executor is not None:
+            self._mdit.options["codeformatter_executor"] = codeformatter_executor
+        if cache:
+            self._mdit.options["render_memo"] = RenderMemo()
+            BlockMemo().update_mdit(self._mdit)
+            if codeformatter_cache is None:
+                codeformatter_cache = CodeFormatterCache()
+        if codeformatter_cache is not None:
+            self._mdit.options["codeformatter_cache"] = codeformatter_cache
+
+    def text(
+        self,
+        md: str,
+        *,
+        lines: Iterable[LineRange] | None = None,
+        _first_pass_contextmanager: AbstractContextManager = NULL_CTX,
+        _filename: str = "",
+    ) -> str:
+        """Format a Markdown string.
+
+        If `lines` is given, only format top-level blocks that overlap
+        the given ranges of line numbers, and leave the rest of the
+        string as is.
+        """
+        self._mdformat_opts["filename"] = _filename
+        if lines is not None:
+            ranges = _validate_line_ranges(lines)
+            with _first_pass_contextmanager:
+                rendering, ranges = self._format_ranges(md, ranges)
+            if self._do_second_pass:
+                rendering, _ = self._format_ranges(rendering, ranges)
+            return rendering
+
+        with _first_pass_contextmanager:
+            rendering = self._mdit.render(md)
+
+        # If word wrap is changed, add a second pass of rendering.
+        # Some escapes will be different depending on word wrap, so
+        # rendering after 1st and 2nd pass will be different. Rendering
+        # twice seems like the easiest way to achieve stable formatting.
+        if self._do_second_pass:
+            rendering = self._mdit.render(rendering)
+
+        return rendering
+
+    def text_bytes(
+        self,
+        md: bytes,
+        *,
+        lines: Iterable[LineRange] | None = None,
+        _first_pass_contextmanager: AbstractContextManager = NULL_CTX,
+        _filename: str = "",
+    ) -> bytes:
+        """Format UTF-8 encoded Markdown.
+
+        Unlike `text`, newlines are converted as the "end_of_line"
+        option configures. If formatting changes nothing, `md` is
+        returned as is, without encoding the result.
+        """
+        original = md.decode()
+        formatted = self.text(
+            original,
+            lines=lines,
+            _first_pass_contextmanager=_first_pass_contextmanager,
+            _filename=_filename,
+        )
+        newline = detect_newline_type(original, self._end_of_line)
+        if newline_converted_equal(formatted, newline, original):
+            return md
+        return encode_md(formatted, newline)
+
+    def _format_ranges(
+        self, md: str, ranges: Sequence[LineRange]
+    ) -> tuple[str, list[LineRange]]:
+        """Format top-level blocks that overlap `ranges`.
+
+        Return the formatted string, and line ranges of the formatted
+        blocks in it.
+        """
+        md = md.replace("\r\n", "\n").replace("\r", "\n")
+        source_lines = md.split("\n")
+        env: dict = {}
+        tree = RenderTreeNode(self._mdit.parse(md, env))
+        spans = _block_spans(tree.children, source_lines)
+        selected = _select_blocks(tree.children, spans, ranges)
+        renderer: MDRenderer = self._mdit.renderer  # type: ignore[assignment]
+        rendered_blocks = renderer.render_blocks(
+            [tree.children[i] for i in selected], self._mdit.options, env
+        )
+
+        output_lines: list[str] = []
+        formatted_ranges: list[LineRange] = []
+        next_line = 0
+        for i, rendering in zip(selected, rendered_blocks):
+            start, end = spans[i]
+            output_lines.extend(source_lines[next_line:start])
+            next_line = end
+            block_source = "\n".join(source_lines[start:end])
+            # Link reference definitions are not rendered, so keep them
+            # after the block.
+            if "]:" in block_source:
+                rendering = "\n\n".join(
+                    filter(None, (rendering, self._reference_definitions(block_source)))
+                )
+            if not rendering:
+                continue
+            # Separate the block from adjacent blocks with blank lines,
+            # so that lazy continuation lines do not change meaning.
+            if output_lines and output_lines[-1].strip():
+                output_lines.append("")
+            formatted_start = len(output_lines) + 1
+            output_lines.extend(rendering.split("\n"))
+            formatted_ranges.append((formatted_start, len(output_lines)))
+            if end < len(source_lines) and source_lines[end].strip():
+                output_lines.append("")
+        output_lines.extend(source_lines[next_line:])
+        return "\n".join(output_lines), formatted_ranges
+
+    def _reference_definitions(self, md: str) -> str:
+        """Return formatted link reference definitions of a Markdown
+        string."""
+        env: dict = {}
+        self._mdit.parse(md, env)
+        references = env.get("references", {})
+        return MDRenderer._write_references(
+            {"used_refs": set(references), "references": references}
+        )
+
+
+_LIST_TYPES = frozenset({"bullet_list", "ordered_list"})
+
+
+def _block_spans(
+    blocks: Sequence[RenderTreeNode], source_lines: Sequence[str]
+) -> list[tuple[int, int]]:
+    """Return the source line span of each top-level block.
+
+    Trailing blank lines are not included. Blocks without a source map
+    get an empty span.
+    """
+    spans = []
+    next_start = 0
+    for block in blocks:
+        if block.map is None:
+            spans.append((next_start, next_start))
+            continue
+        start, end = block.map
+        # Maps of some blocks, e.g. lists, include trailing blank lines
+        while end > start + 1 and not source_lines[end - 1].strip():
+            end -= 1
+        spans.append((start, end))
+        next_start = end
+    return spans
+
+
+def _select_blocks(
+    blocks: Sequence[RenderTreeNode],
+    spans: Sequence[tuple[int, int]],
+    ranges: Sequence[LineRange],
+) -> list[int]:
+    """Return indexes of blocks that overlap `ranges`.
+
+    The indentation of a list affects how the block that follows it is
+    parsed, so a list and the following block are formatted together.
+    """
+    selected = {
+        i
+        for i, (start, end) in enumerate(spans)
+        if end > start
+        and any(r_start <= end and start < r_end for r_start, r_end in ranges)
+    }
+    stack = list(selected)
+    while stack:
+        i = stack.pop()
+        neighbors = []
+        if blocks[i].type in _LIST_TYPES and i + 1 < len(blocks):
+            neighbors.append(i + 1)
+        if i > 0 and blocks[i - 1].type in _LIST_TYPES:
+            neighbors.append(i - 1)
+        for neighbor in neighbors:
+            if neighbor not in selected and blocks[neighbor].map is not None:
+                selected.add(neighbor)
+                stack.append(neighbor)
+    return sorted(selected)
+
+
+def _validate_line_ranges(lines: Iterable[LineRange]) -> list[LineRange]:
+    ranges = list(lines)
+    for start, end in ranges:
+        if not 1 <= start <= end:
+            raise ValueError(f"Invalid line range {start}:{end}")
+    return ranges
 
 
 def text(
@@ -17,27 +270,102 @@ def text(
     options: Mapping[str, Any] = EMPTY_MAP,
     extensions: Iterable[str] = (),
     codeformatters: Iterable[str] = (),
+    lines: Iterable[LineRange] | None = None,
     _first_pass_contextmanager: AbstractContextManager = NULL_CTX,
     _filename: str = "",
 ) -> str:
-    """Format a Markdown string."""
-    with _first_pass_contextmanager:
-        mdit = build_mdit(
-            MDRenderer,
-            mdformat_opts={**options, **{"filename": _filename}},
-            extensions=extensions,
-            codeformatters=codeformatters,
-        )
-        rendering = mdit.render(md)
+    """Format a Markdown string.
+
+    If `lines` is given, only format top-level blocks that overlap the
+    given inclusive ranges of 1-based line numbers.
+    """
+    formatter = Formatter(
+        options=options, extensions=extensions, codeformatters=codeformatters
+    )
+    return formatter.text(
+        md,
+        lines=lines,
+        _first_pass_contextmanager=_first_pass_contextmanager,
+        _filename=_filename,
+    )
+
+
+def text_bytes(
+    md: bytes,
+    *,
+    options: Mapping[str, Any] = EMPTY_MAP,
+    extensions: Iterable[str] = (),
+    codeformatters: Iterable[str] = (),
+    lines: Iterable[LineRange] | None = None,
+    _filename: str = "",
+) -> bytes:
+    """Format UTF-8 encoded Markdown.
+
+    Newlines are converted as the "end_of_line" option configures. If
+    formatting changes nothing, `md` is returned as is.
+    """
+    formatter = Formatter(
+        options=options, extensions=extensions, codeformatters=codeformatters
+    )
+    return formatter.text_bytes(md, lines=lines, _filename=_filename)
+
+
+def _plugin_dists(
+    names: Iterable[str],
+    plugins: Mapping[str, Any],
+    dists: Mapping[str, tuple[str, list[str]]],
+) -> dict[str, list[str] | None]:
+    """Map plugin names to the name and version of the distribution that
+    provides the plugin.
+
+    Raise `KeyError` if a plugin is not installed.
+    """
+    providers = {
+        name: [dist_name, version]
+        for dist_name, (version, dist_plugins) in dists.items()
+        for name in dist_plugins
+    }
+    plugin_dists = {}
+    for name in sorted(set(names)):
+        if name not in plugins:
+            raise KeyError(name)
+        plugin_dists[name] = providers.get(name)
+    return plugin_dists
+
+
+def fingerprint(
+    *,
+    options: Mapping[str, Any] = EMPTY_MAP,
+    extensions: Iterable[str] = (),
+    codeformatters: Iterable[str] = (),
+) -> str:
+    """Return a hex digest of everything that affects formatting output.
 
-    # If word wrap is changed, add a second pass of rendering.
-    # Some escapes will be different depending on word wrap, so
-    # rendering after 1st and 2nd pass will be different. Rendering
-    # twice seems like the easiest way to achieve stable formatting.
-    if options.get("wrap", DEFAULT_OPTS["wrap"]) != "keep":
-        rendering = mdit.render(rendering)
+    The digest covers the versions of mdformat and markdown-it-py,
+    options merged with defaults, and enabled extensions and code
+    formatters along with versions of the distributions that provide
+    them. Nothing is formatted. Tools that code formatters run, e.g. a
+    Python formatter, are not covered.
 
-    return rendering
+    Raise `KeyError` if an extension or code formatter is not installed.
+    """
+    data = {
+        "mdformat": mdformat.__version__,
+        "markdown-it-py": markdown_it.__version__,
+        "options": {**DEFAULT_OPTS, **options},
+        "extensions": _plugin_dists(
+            extensions,
+            mdformat.plugins.PARSER_EXTENSIONS,
+            mdformat.plugins._PARSER_EXTENSION_DISTS,
+        ),
+        "codeformatters": _plugin_dists(
+            codeformatters,
+            mdformat.plugins.CODEFORMATTERS,
+            mdformat.plugins._CODEFORMATTER_DISTS,
+        ),
+    }
+    encoded = json.dumps(data, sort_keys=True, default=str).encode()
+    return hashlib.sha256(encoded).hexdigest()
 
 
 def file(
@@ -58,7 +386,7 @@ def file(
     if f.is_symlink():
         raise ValueError(f'Cannot format "{f}". It is a symlink.')
 
-    original_md = f.read_bytes().decode()
+    original_md = read_md(f)
     formatted_md = text(
         original_md,
         options=options,
@@ -69,6 +397,6 @@ def file(
     newline = detect_newline_type(
         original_md, options.get("end_of_line", DEFAULT_OPTS["end_of_line"])
     )
-    formatted_md = formatted_md.replace("\n", newline)
-    if formatted_md != original_md:
-        f.write_bytes(formatted_md.encode())
+    if not newline_converted_equal(formatted_md, newline, original_md):
+        with f.open("wb") as out:
+            write_md(out, formatted_md, newline)
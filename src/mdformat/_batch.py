@@ -0,0 +1,124 @@
+"""Formatting a stream of documents read from stdin.
+
+Each request is a header line followed by a document:
+
+    LENGTH[ PATH]\\n
+    DOCUMENT
+
+LENGTH is the size of the UTF-8 encoded document in bytes. PATH is
+optional. If given, configuration and exclude patterns that apply to
+the path are used, as if a file at the path was formatted. The path
+does not need to exist.
+
+Each request is answered, in order, with a header line followed by a
+body:
+
+    STATUS LENGTH\\n
+    BODY
+
+STATUS is "ok" if BODY is the formatted document, or "error" if BODY
+is an error message. An excluded document is returned as is.
+"""
+
+from __future__ import annotations
+
+import os
+from pathlib import Path
+from typing import IO
+
+from mdformat._cli import (
+    PipelineResolver,
+    RendererWarningPrinter,
+    format_text,
+    print_error,
+    renders_equal,
+)
+from mdformat._conf import InvalidConfError
+from mdformat._util import detect_newline_type, encode_md, newline_converted_equal
+
+_OK = b"ok"
+_ERROR = b"error"
+
+
+def _parse_header(header: bytes) -> tuple[int, Path | None]:
+    """Parse a request header line.
+
+    Raise `ValueError` if the header is invalid.
+    """
+    length_str, _, path_str = header.rstrip(b"\r\n").partition(b" ")
+    length = int(length_str)
+    if length < 0:
+        raise ValueError("negative length")
+    path = Path(os.path.abspath(os.fsdecode(path_str))) if path_str else None
+    return length, path
+
+
+def _format_document(  # noqa: C901
+    resolver: PipelineResolver,
+    data: bytes,
+    path: Path | None,
+    renderer_warning_printer: RendererWarningPrinter,
+) -> tuple[bytes, bytes]:
+    """Return status and body of the response to a request."""
+    try:
+        original_str = data.decode()
+    except UnicodeDecodeError as e:
+        return _ERROR, f"Invalid UTF-8: {e}".encode()
+    try:
+        opts, toml_path = resolver.opts(path)
+    except InvalidConfError as e:
+        return _ERROR, str(e).encode()
+    if resolver.is_excluded(path, opts, toml_path):
+        return _OK, data
+    pipeline = resolver.pipeline(opts, toml_path)
+    if pipeline is None:
+        return _ERROR, b"Failed to build a formatting pipeline. See stderr."
+    path_str = str(path) if path else "-"
+    try:
+        formatted_str = format_text(
+            pipeline, original_str, path_str, None, renderer_warning_printer
+        )
+        equal = renders_equal(pipeline, original_str, formatted_str)
+    except Exception as e:  # E.g. a bug in a plugin or the renderer
+        return _ERROR, f"Failed formatting: {e!r}".encode()
+    if not equal:
+        return (
+            _ERROR,
+            b"Formatted Markdown renders to different HTML than input Markdown.",
+        )
+    newline = detect_newline_type(original_str, pipeline.opts["end_of_line"])
+    if newline_converted_equal(formatted_str, newline, original_str):
+        return _OK, data
+    return _OK, encode_md(formatted_str, newline)
+
+
+def format_batch(
+    stdin: IO[bytes],
+    stdout: IO[bytes],
+    resolver: PipelineResolver,
+) -> int:
+    """Answer requests read from `stdin` until the end of the stream.
+
+    Return 1 if any request failed, or the stream is invalid.
+    """
+    errors_found = False
+    renderer_warning_printer = RendererWarningPrinter()
+    while True:
+        header = stdin.readline()
+        if not header:
+            break
+        try:
+            length, path = _parse_header(header)
+        except ValueError:
+            print_error(f"Invalid batch request header {header!r}.")
+            return 1
+        data = stdin.read(length)
+        if len(data) < length:
+            print_error("Unexpected end of batch input.")
+            return 1
+        status, body = _format_document(resolver, data, path, renderer_warning_printer)
+        if status != _OK:
+            errors_found = True
+        stdout.write(b"%s %d\n" % (status, len(body)) + body)
+        stdout.flush()
+    return 1 if errors_found else 0
@@ -1,19 +1,61 @@
 from __future__ import annotations
 
 import argparse
-from collections.abc import Generator, Iterable, Mapping, Sequence
+from collections.abc import (
+    Callable,
+    Collection,
+    Generator,
+    Hashable,
+    Iterable,
+    Iterator,
+    Mapping,
+    MutableMapping,
+    Sequence,
+)
+from concurrent.futures import Executor, ThreadPoolExecutor
 import contextlib
+from contextlib import AbstractContextManager
 import functools
+import heapq
+import itertools
+import json
 import logging
 import os.path
 from pathlib import Path
 import shutil
+import stat
 import sys
 import textwrap
+from typing import IO, NamedTuple
+import zlib
+
+from markdown_it import MarkdownIt
+from markdown_it.renderer import RendererHTML
 
 import mdformat
-from mdformat._conf import DEFAULT_OPTS, InvalidConfError, read_toml_opts
-from mdformat._util import detect_newline_type, is_md_equal
+from mdformat._api import LineRange
+from mdformat._conf import (
+    DEFAULT_OPTS,
+    InvalidConfError,
+    _file_signature,
+    invalidate_stale_toml_opts,
+    read_toml_opts,
+)
+from mdformat._file_io import FileIO
+from mdformat._git import GitError, changed_files, changed_lines
+from mdformat._gitignore import GitIgnore
+from mdformat._glob import compile_patterns
+from mdformat._output_dir import OutputTree
+from mdformat._stat_index import StatIndex
+from mdformat._util import (
+    build_mdit,
+    detect_newline_type,
+    is_md_equal,
+    newline_converted_equal,
+    read_md,
+    write_md,
+)
+from mdformat._workers import IsolatedExecutor
 import mdformat.plugins
 import mdformat.renderer
 
@@ -24,7 +66,14 @@ class RendererWarningPrinter(logging.Handler):
             sys.stderr.write(f"Warning: {record.msg}\n")
 
 
-def run(cli_args: Sequence[str]) -> int:  # noqa: C901
+def run(  # noqa: C901
+    cli_args: Sequence[str], *, run_cache: RunCache | None = None
+) -> int:
+    """Run the CLI.
+
+    If `run_cache` is given, formatting pipelines and code formatter
+    results are reused from, and stored in it.
+    """
     arg_parser = make_arg_parser(
         mdformat.plugins._PARSER_EXTENSION_DISTS,
         mdformat.plugins._CODEFORMATTER_DISTS,
@@ -35,126 +84,696 @@ def run(cli_args: Sequence[str]) -> int:  # noqa: C901
     }
     cli_core_opts, cli_plugin_opts = separate_core_and_plugin_opts(cli_opts)
 
-    if not cli_opts["paths"]:
+    if cli_opts.get("daemon"):
+        from mdformat._daemon import serve
+
+        return serve()
+
+    if cli_opts.get("print_fingerprint"):
+        return print_fingerprints(cli_opts["paths"], cli_core_opts, cli_plugin_opts)
+
+    cache_dir = cli_opts.get("cache_dir")
+    if run_cache is None:
+        codeformatter_cache = mdformat.renderer.CodeFormatterCache(directory=cache_dir)
+    else:
+        codeformatter_cache = run_cache.codeformatter_cache(cache_dir)
+
+    if cli_opts.get("stdin_batch"):
+        if cli_opts["paths"] or {
+            "check",
+            "watch",
+            "lines",
+            "diff_ranges",
+            "changed_since",
+            "staged",
+            "shard",
+            "output_dir",
+        }.intersection(k for k, v in cli_opts.items() if v):
+            arg_parser.error(
+                "--stdin-batch can not be used with paths, --check, --watch, "
+                "--shard, --output-dir, line ranges or git options"
+            )
+        from mdformat._batch import format_batch
+
+        with make_codeformatter_executor(cli_opts) as codeformatter_executor:
+            return format_batch(
+                sys.stdin.buffer,
+                sys.stdout.buffer,
+                PipelineResolver(
+                    cli_core_opts,
+                    cli_plugin_opts,
+                    codeformatter_executor,
+                    codeformatter_cache,
+                    run_cache.pipelines if run_cache is not None else None,
+                ),
+            )
+
+    files_from = cli_opts.get("files_from")
+    if not cli_opts["paths"] and files_from is None:
         print_paragraphs(["No files have been passed in. Doing nothing."])
         return 0
+    if files_from == "-" and "-" in cli_opts["paths"]:
+        arg_parser.error("--files-from - can not be used with standard input")
+
+    only_files: Collection[Path] | None = None
+    line_ranges: Callable[[Path | None], list[LineRange] | None] | None = None
+    if "lines" in cli_opts:
+        line_ranges = functools.partial(_const_line_ranges, ranges=cli_opts["lines"])
+    try:
+        if "diff_ranges" in cli_opts:
+            diff_ranges = changed_lines(
+                Path.cwd(),
+                cli_opts.get("changed_since"),
+                staged=cli_opts.get("staged", False),
+            )
+            only_files = diff_ranges.keys()
+            line_ranges = functools.partial(_mapped_line_ranges, ranges=diff_ranges)
+        elif "changed_since" in cli_opts or "staged" in cli_opts:
+            only_files = changed_files(
+                Path.cwd(),
+                cli_opts.get("changed_since"),
+                staged=cli_opts.get("staged", False),
+            )
+    except GitError as e:
+        print_error(str(e))
+        return 1
 
     try:
-        file_paths = resolve_file_paths(cli_opts["paths"])
+        root_paths = resolve_root_paths(cli_opts["paths"])
     except InvalidPath as e:
         arg_parser.error(f'File "{e.path}" does not exist.')
+    skip_dir = functools.partial(is_excluded_dir, cli_core_opts=cli_core_opts)
+    gitignore = GitIgnore() if cli_opts.get("respect_gitignore") else None
+    if cli_opts.get("watch"):
+        if None in root_paths:
+            arg_parser.error("--watch can not be used with standard input")
+        if only_files is not None or "shard" in cli_opts:
+            arg_parser.error(
+                "--watch can not be used with --changed-since, --staged, "
+                "--diff-ranges or --shard"
+            )
+    if "shard_by_size" in cli_opts and "shard" not in cli_opts:
+        arg_parser.error("--shard-by-size requires --shard")
+    output_tree = None
+    if "output_dir" in cli_opts:
+        if None in root_paths or files_from == "-":
+            arg_parser.error("--output-dir can not be used with standard input")
+        if cli_opts.get("check") or cli_opts.get("watch"):
+            arg_parser.error("--output-dir can not be used with --check or --watch")
+        output_tree = OutputTree(
+            Path(os.path.abspath(cli_opts["output_dir"])), Path.cwd()
+        )
+        skip_dir = functools.partial(
+            _is_skipped_output_dir, output_dir=output_tree.directory, skip_dir=skip_dir
+        )
+    elif "depfile" in cli_opts:
+        arg_parser.error("--depfile requires --output-dir")
 
-    format_errors_found = False
-    renderer_warning_printer = RendererWarningPrinter()
-    for path in file_paths:
+    path_list: AbstractContextManager[IO[bytes] | None] = contextlib.nullcontext()
+    if files_from == "-":
+        path_list = contextlib.nullcontext(sys.stdin.buffer)
+    elif files_from is not None:
         try:
-            toml_opts, toml_path = read_toml_opts(path.parent if path else Path.cwd())
-        except InvalidConfError as e:
-            print_error(str(e))
-            return 1
-
-        opts: Mapping = {**DEFAULT_OPTS, **toml_opts, **cli_core_opts}
-        for plugin_id, plugin_opts in cli_plugin_opts.items():
-            if plugin_id in opts["plugin"]:
-                opts["plugin"][plugin_id] |= plugin_opts
-            else:
-                opts["plugin"][plugin_id] = plugin_opts
-
-        if sys.version_info >= (3, 13):  # pragma: >=3.13 cover
-            if is_excluded(path, opts["exclude"], toml_path, "exclude" in cli_opts):
-                continue
-        else:  # pragma: <3.13 cover
-            if "exclude" in toml_opts:
-                print_error(
-                    "'exclude' patterns are only available on Python 3.13+.",
-                    paragraphs=[
-                        "Please remove the 'exclude' list from your .mdformat.toml"
-                        " or upgrade Python version."
-                    ],
-                )
-                return 1
+            path_list = open(files_from, "rb")
+        except OSError as e:
+            arg_parser.error(f'Can not read "{files_from}": {e.strerror}')
 
-        try:
-            enabled_parserplugins = (
-                mdformat.plugins.PARSER_EXTENSIONS
-                if opts["extensions"] is None
-                else {
-                    k: mdformat.plugins.PARSER_EXTENSIONS[k] for k in opts["extensions"]
-                }
-            )
-        except KeyError as e:
-            print_error(
-                "Invalid extension required.",
-                paragraphs=[
-                    f"The required {e.args[0]!r} extension is not available. "
-                    "Please install a plugin that adds the extension, "
-                    "or remove it from required extensions."
-                ],
+    stat_index = (
+        StatIndex(cache_dir)
+        if cache_dir is not None
+        and not cli_opts.get("no_stat_cache")
+        and output_tree is None
+        else None
+    )
+    with (
+        path_list as path_list_file,
+        make_codeformatter_executor(cli_opts) as codeformatter_executor,
+    ):
+        all_root_paths: Iterable[None | Path] = root_paths
+        if path_list_file is not None:
+            # Paths are read and checked lazily, while formatting
+            all_root_paths = itertools.chain(
+                root_paths,
+                iter_listed_paths(
+                    read_path_list(path_list_file, cli_opts.get("null", False))
+                ),
             )
-            return 1
         try:
-            enabled_codeformatters = (
-                mdformat.plugins.CODEFORMATTERS
-                if opts["codeformatters"] is None
-                else {
-                    k: mdformat.plugins.CODEFORMATTERS[k]
-                    for k in opts["codeformatters"]
-                }
+            if cli_opts.get("watch"):
+                return watch_file_paths(
+                    [path for path in all_root_paths if path is not None],
+                    skip_dir,
+                    gitignore,
+                    cli_core_opts,
+                    cli_plugin_opts,
+                    codeformatter_executor,
+                    codeformatter_cache,
+                    line_ranges,
+                    run_cache,
+                )
+            file_paths: Iterable[Path | None] = _iter_file_paths(
+                all_root_paths, skip_dir, gitignore, only_files
             )
-        except KeyError as e:
-            print_error(
-                "Invalid code formatter required.",
-                paragraphs=[
-                    f"The required {e.args[0]!r} code formatter language "
-                    "is not available. "
-                    "Please install a plugin "
-                    "that adds support for the language, "
-                    "or remove it from required languages."
-                ],
+            if "shard" in cli_opts:
+                file_paths = shard_file_paths(
+                    file_paths,
+                    *cli_opts["shard"],
+                    by_size=cli_opts.get("shard_by_size", False),
+                )
+            return format_file_paths(
+                file_paths,
+                cli_core_opts,
+                cli_plugin_opts,
+                codeformatter_executor,
+                codeformatter_cache,
+                line_ranges,
+                run_cache.pipelines if run_cache is not None else None,
+                stat_index,
+                output_tree,
+                cli_opts.get("io_workers", 0),
             )
+        except InvalidPath as e:
+            print_error(f'File "{e.path}" does not exist.')
             return 1
-        if path:
-            path_str = str(path)
-            # Unlike `path.read_text(encoding="utf-8")`, this preserves
-            # line ending type.
-            original_str = path.read_bytes().decode()
-        else:
-            path_str = "-"
-            original_str = sys.stdin.read()
-
-        formatted_str = mdformat.text(
-            original_str,
-            options=opts,
-            extensions=enabled_parserplugins,
-            codeformatters=enabled_codeformatters,
-            _first_pass_contextmanager=log_handler_applied(
-                mdformat.renderer.LOGGER, renderer_warning_printer
+        finally:
+            if stat_index is not None:
+                stat_index.save()
+            if output_tree is not None and "depfile" in cli_opts:
+                output_tree.write_depfile(Path(cli_opts["depfile"]))
+
+
+class RunCache:
+    """State that is reused across CLI runs in one process."""
+
+    def __init__(self) -> None:
+        self.pipelines: dict[Hashable, FormatPipeline] = {}
+        self._codeformatter_caches: dict[
+            str | None, mdformat.renderer.CodeFormatterCache
+        ] = {}
+
+    def codeformatter_cache(
+        self, directory: str | None
+    ) -> mdformat.renderer.CodeFormatterCache:
+        if directory is not None:
+            directory = os.path.abspath(directory)
+        if directory not in self._codeformatter_caches:
+            self._codeformatter_caches[directory] = (
+                mdformat.renderer.CodeFormatterCache(directory=directory)
+            )
+        return self._codeformatter_caches[directory]
+
+
+# Seconds without changes to wait for before formatting changed files
+WATCH_DEBOUNCE = 0.1
+
+
+def watch_file_paths(
+    root_paths: Sequence[Path],
+    skip_dir: Callable[[Path], bool],
+    gitignore: GitIgnore | None,
+    cli_core_opts: Mapping,
+    cli_plugin_opts: Mapping,
+    codeformatter_executor: Executor | None,
+    codeformatter_cache: mdformat.renderer.CodeFormatterCache,
+    line_ranges: Callable[[Path | None], list[LineRange] | None] | None,
+    run_cache: RunCache | None,
+) -> int:
+    """Format files, and then format them again whenever they change.
+
+    Pipelines are reused across changes, and rebuilt if a configuration
+    file changes. Return when interrupted.
+    """
+    from mdformat._watch import make_watcher
+
+    if run_cache is None:
+        run_cache = RunCache()
+
+    list_files = functools.partial(_iter_watched_files, root_paths, skip_dir, gitignore)
+    # Modification time and size of files after they were last formatted.
+    # Formatting a file again is skipped if they are unchanged, e.g. if
+    # the file was changed by formatting it.
+    signatures: dict[Path, tuple[int, int] | None] = {}
+
+    def format_files(file_paths: list[Path]) -> None:
+        format_file_paths(
+            file_paths,
+            cli_core_opts,
+            cli_plugin_opts,
+            codeformatter_executor,
+            codeformatter_cache,
+            line_ranges,
+            run_cache.pipelines,
+        )
+        for path in file_paths:
+            signatures[path] = _file_signature(path)
+
+    format_files(list(list_files()))
+    try:
+        with make_watcher(
+            root_paths,
+            functools.partial(
+                _is_skipped_watch_dir, skip_dir=skip_dir, gitignore=gitignore
             ),
-            _filename=path_str,
+            list_files,
+        ) as watcher:
+            print_paragraphs(["Watching for changes. Press Ctrl+C to stop."])
+            for changed in watcher.batches(WATCH_DEBOUNCE):
+                invalidate_stale_toml_opts()
+                file_paths = [
+                    path
+                    for path in _changed_file_paths(
+                        root_paths, changed, skip_dir, gitignore
+                    )
+                    if _file_signature(path) not in {None, signatures.get(path)}
+                ]
+                if file_paths:
+                    format_files(file_paths)
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+def _iter_watched_files(
+    root_paths: Sequence[Path],
+    skip_dir: Callable[[Path], bool],
+    gitignore: GitIgnore | None,
+) -> Iterator[Path]:
+    for path in _iter_file_paths(root_paths, skip_dir, gitignore, None):
+        if path is not None:
+            yield path
+
+
+def _is_skipped_watch_dir(
+    path: Path, skip_dir: Callable[[Path], bool], gitignore: GitIgnore | None
+) -> bool:
+    if gitignore is not None and gitignore.is_ignored(str(path), is_dir=True):
+        return True
+    return skip_dir(path)
+
+
+def _changed_file_paths(
+    root_paths: Sequence[Path],
+    changed: Iterable[Path],
+    skip_dir: Callable[[Path], bool],
+    gitignore: GitIgnore | None,
+) -> list[Path]:
+    """Return files to format in `root_paths` after `changed` paths
+    changed.
+
+    A changed directory may contain any number of new files.
+    """
+    file_paths: set[Path] = set()
+    for path in changed:
+        if path.is_dir():
+            if not skip_dir(path):
+                file_paths.update(walk_md_files(path, skip_dir, gitignore))
+        elif gitignore is None or not gitignore.is_ignored(str(path), is_dir=False):
+            file_paths.add(path)
+    return [
+        path
+        for path in _iter_file_paths(root_paths, None, None, file_paths)
+        if path is not None
+    ]
+
+
+def _shard_key(path: Path) -> str:
+    """Return the path of a file relative to the directory of its
+    configuration file, or the current working directory if there is
+    none.
+
+    Unlike an absolute path, this is the same on every machine.
+    """
+    try:
+        _, toml_path = read_toml_opts(path.parent)
+    except InvalidConfError:
+        toml_path = None
+    relative_path = _exclude_relative_path(path, toml_path, False)
+    return relative_path if relative_path is not None else path.as_posix()
+
+
+def shard_file_paths(
+    file_paths: Iterable[Path | None], index: int, count: int, *, by_size: bool
+) -> Iterator[Path | None]:
+    """Yield the files of shard `index` of `count` shards.
+
+    Shards are disjoint, and together contain all files. By default a
+    file is assigned by a hash of its path, without resolving other
+    paths first. If `by_size` is True, all paths are resolved first,
+    and files are assigned so that shards have about equal total size.
+    Standard input is assigned to the first shard.
+    """
+    if not by_size:
+        for path in file_paths:
+            if path is None:
+                if index == 1:
+                    yield path
+            elif zlib.crc32(_shard_key(path).encode()) % count == index - 1:
+                yield path
+        return
+
+    paths = list(file_paths)
+    # Largest files first. Ties are broken by path, so that the order is
+    # the same on every machine. One is added to sizes so that empty
+    # files are balanced too.
+    files_by_size = sorted(
+        (-(os.path.getsize(path) + 1), _shard_key(path), i)
+        for i, path in enumerate(paths)
+        if path is not None
+    )
+    # Assign each file to the shard with the least total size so far
+    shard_sizes = [(0, shard) for shard in range(count)]
+    selected: set[int] = set()
+    for neg_size, _, i in files_by_size:
+        total_size, shard = heapq.heappop(shard_sizes)
+        if shard == index - 1:
+            selected.add(i)
+        heapq.heappush(shard_sizes, (total_size - neg_size, shard))
+    for i, path in enumerate(paths):
+        if (path is None and index == 1) or i in selected:
+            yield path
+
+
+def _const_line_ranges(
+    path: Path | None, ranges: list[LineRange]
+) -> list[LineRange] | None:
+    return ranges
+
+
+def _mapped_line_ranges(
+    path: Path | None, ranges: Mapping[Path, list[LineRange] | None]
+) -> list[LineRange] | None:
+    return ranges.get(path) if path else None
+
+
+class FormatPipeline(NamedTuple):
+    """Formatting pipeline shared by files with the same configuration."""
+
+    opts: Mapping
+    parser_extensions: Mapping[str, mdformat.plugins.ParserExtensionInterface]
+    codeformatters: Mapping[str, Callable[[str, str], str]]
+    formatter: mdformat.Formatter
+    # Parser used for validating formatting, or `None` if validation
+    # is off
+    validation_mdit: MarkdownIt | None
+
+
+class PipelineResolver:
+    """Resolves options and formatting pipelines of files.
+
+    Files that share a configuration file share the effective
+    configuration, so all of them are formatted using the same pipeline.
+    Pipelines are looked up from, and stored in `pipeline_cache`, if
+    given. Pipelines that use a code formatter executor are not cached,
+    as the executor is shut down after the run.
+    """
+
+    def __init__(
+        self,
+        cli_core_opts: Mapping,
+        cli_plugin_opts: Mapping,
+        codeformatter_executor: Executor | None,
+        codeformatter_cache: mdformat.renderer.CodeFormatterCache | None = None,
+        pipeline_cache: MutableMapping[Hashable, FormatPipeline] | None = None,
+    ) -> None:
+        self._cli_core_opts = cli_core_opts
+        self._cli_plugin_opts = cli_plugin_opts
+        self._codeformatter_executor = codeformatter_executor
+        self._codeformatter_cache = codeformatter_cache
+        if pipeline_cache is None or codeformatter_executor is not None:
+            pipeline_cache = {}
+        self._pipeline_cache = pipeline_cache
+        # Options and pipelines of each configuration file
+        self._conf_opts: dict[Path | None, Mapping] = {}
+        self._pipelines: dict[Path | None, FormatPipeline] = {}
+
+    def opts(self, path: Path | None) -> tuple[Mapping, Path | None]:
+        """Return options of a file, and the path of its configuration
+        file.
+
+        Raise `InvalidConfError` if the configuration is invalid.
+        """
+        toml_opts, toml_path = read_toml_opts(path.parent if path else Path.cwd())
+        if toml_path not in self._conf_opts:
+            self._conf_opts[toml_path] = merge_opts(
+                toml_opts, self._cli_core_opts, self._cli_plugin_opts
+            )
+        return self._conf_opts[toml_path], toml_path
+
+    def is_excluded(
+        self, path: Path | None, opts: Mapping, toml_path: Path | None
+    ) -> bool:
+        return is_excluded(
+            path, opts["exclude"], toml_path, "exclude" in self._cli_core_opts
         )
-        newline = detect_newline_type(original_str, opts["end_of_line"])
-        formatted_str = formatted_str.replace("\n", newline)
 
-        if opts["check"]:
-            if formatted_str != original_str:
-                format_errors_found = True
-                print_error(f'File "{path_str}" is not formatted.')
+    def pipeline(self, opts: Mapping, toml_path: Path | None) -> FormatPipeline | None:
+        """Return the pipeline of a configuration file.
+
+        Print an error and return `None` if the pipeline can not be
+        built.
+        """
+        if toml_path in self._pipelines:
+            return self._pipelines[toml_path]
+        cache_key = _pipeline_cache_key(opts, self._codeformatter_cache)
+        if cache_key in self._pipeline_cache:
+            pipeline = self._pipeline_cache[cache_key]
         else:
-            changes_ast = any(
-                getattr(plugin, "CHANGES_AST", False)
-                for plugin in enabled_parserplugins.values()
+            maybe_pipeline = build_pipeline(
+                opts, self._codeformatter_executor, self._codeformatter_cache
             )
-            if (
-                opts["validate"]
-                and not changes_ast
-                and not is_md_equal(
-                    original_str,
-                    formatted_str,
-                    options=opts,
-                    extensions=enabled_parserplugins,
-                    codeformatters=enabled_codeformatters,
+            if maybe_pipeline is None:
+                return None
+            pipeline = self._pipeline_cache[cache_key] = maybe_pipeline
+        self._pipelines[toml_path] = pipeline
+        return pipeline
+
+
+def format_text(
+    pipeline: FormatPipeline,
+    original_str: str,
+    path_str: str,
+    lines: list[LineRange] | None,
+    renderer_warning_printer: logging.Handler,
+) -> str:
+    """Format a string.
+
+    Newlines of the result are "\n". Use `detect_newline_type` for the
+    configured line ending.
+    """
+    return pipeline.formatter.text(
+        original_str,
+        lines=lines,
+        _first_pass_contextmanager=log_handler_applied(
+            mdformat.renderer.LOGGER, renderer_warning_printer
+        ),
+        _filename=path_str,
+    )
+
+
+def renders_equal(
+    pipeline: FormatPipeline, original_str: str, formatted_str: str
+) -> bool:
+    """Check that formatting did not change the rendered HTML, unless
+    validation is off."""
+    return pipeline.validation_mdit is None or is_md_equal(
+        original_str,
+        formatted_str,
+        options=pipeline.opts,
+        extensions=pipeline.parser_extensions,
+        codeformatters=pipeline.codeformatters,
+        _mdit=pipeline.validation_mdit,
+    )
+
+
+class _SelectedFile(NamedTuple):
+    """A file to format, or an error to report in its place."""
+
+    path: Path | None
+    opts: Mapping
+    toml_path: Path | None
+    # Fingerprint of the configuration, if the stat index applies
+    fingerprint: str | None = None
+    report_error: Callable[[], None] | None = None
+
+
+def _select_file_paths(  # noqa: C901
+    file_paths: Iterable[Path | None],
+    resolver: PipelineResolver,
+    stat_index: StatIndex | None,
+    output_tree: OutputTree | None,
+) -> Iterator[_SelectedFile]:
+    """Yield files that are not excluded, and whose copy in
+    `output_tree` is not up to date.
+
+    Stop after yielding an error, so that it is reported in order.
+    """
+    fingerprints: dict[Path | None, str | None] = {}
+    for path in file_paths:
+        try:
+            opts, toml_path = resolver.opts(path)
+        except InvalidConfError as e:
+            yield _SelectedFile(
+                path, {}, None, report_error=functools.partial(print_error, str(e))
+            )
+            return
+
+        if resolver.is_excluded(path, opts, toml_path):
+            continue
+
+        if output_tree is not None and path:
+            try:
+                if not output_tree.needs_update(path, toml_path):
+                    continue
+            except ValueError:
+                yield _SelectedFile(
+                    path,
+                    opts,
+                    toml_path,
+                    report_error=functools.partial(
+                        print_error,
+                        f'Can not write a copy of "{path}".',
+                        paragraphs=[
+                            "Files formatted into an output directory "
+                            "must be in the current directory."
+                        ],
+                    ),
                 )
+                return
+
+        fingerprint = None
+        if stat_index is not None and path:
+            if toml_path not in fingerprints:
+                try:
+                    fingerprints[toml_path] = opts_fingerprint(opts)
+                except KeyError:
+                    # Reported when building the pipeline
+                    fingerprints[toml_path] = None
+            fingerprint = fingerprints[toml_path]
+        yield _SelectedFile(path, opts, toml_path, fingerprint)
+
+
+def _read_selected_file(
+    selected: _SelectedFile, stat_index: StatIndex | None
+) -> tuple[os.stat_result | None, str] | None:
+    """Return stat and content of a file.
+
+    Return `None` if `stat_index` has the file as formatted.
+    """
+    if selected.path is None:
+        return None, sys.stdin.read()
+    st = os.stat(selected.path)
+    if (
+        stat_index is not None
+        and selected.fingerprint is not None
+        and stat_index.is_unchanged(selected.path, st, selected.fingerprint)
+    ):
+        return None
+    return st, read_md(selected.path)
+
+
+def _write_file(path: Path, md: str, newline: str) -> os.stat_result:
+    with path.open("wb") as f:
+        write_md(f, md, newline)
+    return os.stat(path)
+
+
+def format_file_paths(  # noqa: C901
+    file_paths: Iterable[Path | None],
+    cli_core_opts: Mapping,
+    cli_plugin_opts: Mapping,
+    codeformatter_executor: Executor | None,
+    codeformatter_cache: mdformat.renderer.CodeFormatterCache | None = None,
+    line_ranges: Callable[[Path | None], list[LineRange] | None] | None = None,
+    pipeline_cache: MutableMapping[Hashable, FormatPipeline] | None = None,
+    stat_index: StatIndex | None = None,
+    output_tree: OutputTree | None = None,
+    io_workers: int = 0,
+) -> int:
+    """Format files.
+
+    If `line_ranges` is given, only format top-level blocks of a file
+    that overlap the line ranges it returns for the file. Format the
+    whole file if it returns `None`.
+
+    Pipelines are looked up from, and stored in `pipeline_cache`, if
+    given. Pipelines that use a code formatter executor are not cached,
+    as the executor is shut down after the run.
+
+    If `stat_index` is given, files it has as formatted are skipped
+    without reading them, and files found or made formatted are
+    recorded in it.
+
+    If `output_tree` is given, formatted copies are written into it
+    instead of formatting files in place, and copies that are up to
+    date are skipped.
+
+    If `io_workers` is positive, files are read ahead of, and written
+    behind formatting in that many threads.
+    """
+    format_errors_found = False
+    renderer_warning_printer = RendererWarningPrinter()
+    resolver = PipelineResolver(
+        cli_core_opts,
+        cli_plugin_opts,
+        codeformatter_executor,
+        codeformatter_cache,
+        pipeline_cache,
+    )
+    with FileIO(io_workers) as file_io:
+        for selected, read in file_io.read_ahead(
+            _select_file_paths(file_paths, resolver, stat_index, output_tree),
+            functools.partial(_read_selected_file, stat_index=stat_index),
+        ):
+            if selected.report_error is not None:
+                file_io.finish_writes()
+                selected.report_error()
+                return 1
+
+            pipeline = resolver.pipeline(selected.opts, selected.toml_path)
+            if pipeline is None:
+                file_io.finish_writes()
+                return 1
+
+            content = read()
+            if content is None:
+                continue
+            original_st, original_str = content
+            path = selected.path
+            path_str = str(path) if path else "-"
+            record_stat: Callable[[os.stat_result], None] | None = None
+            # A file formatted by line ranges may still be unformatted
+            if (
+                stat_index is not None
+                and path
+                and selected.fingerprint is not None
+                and not line_ranges
             ):
+                record_stat = functools.partial(
+                    stat_index.record, path, fingerprint=selected.fingerprint
+                )
+
+            formatted_str = format_text(
+                pipeline,
+                original_str,
+                path_str,
+                line_ranges(path) if line_ranges else None,
+                renderer_warning_printer,
+            )
+            newline = detect_newline_type(original_str, pipeline.opts["end_of_line"])
+            # Newlines are converted, and the result encoded, only when
+            # written, and in chunks, to avoid full size copies
+            changed = not newline_converted_equal(formatted_str, newline, original_str)
+
+            if pipeline.opts["check"]:
+                if changed:
+                    format_errors_found = True
+                    print_error(f'File "{path_str}" is not formatted.')
+                elif record_stat is not None and original_st is not None:
+                    record_stat(original_st)
+                continue
+
+            if not renders_equal(pipeline, original_str, formatted_str):
+                file_io.finish_writes()
                 print_error(
                     f'Could not format "{path_str}".',
                     paragraphs=[
@@ -169,16 +788,223 @@ def run(cli_args: Sequence[str]) -> int:  # noqa: C901
                     ],
                 )
                 return 1
-            if path:
-                if formatted_str != original_str:
-                    path.write_bytes(formatted_str.encode())
-            else:
-                sys.stdout.buffer.write(formatted_str.encode())
+            if path is None:
+                write_md(sys.stdout.buffer, formatted_str, newline)
+            elif output_tree is not None:
+                file_io.write(
+                    functools.partial(output_tree.write, path, formatted_str, newline),
+                    _ignore_result,
+                )
+            elif changed:
+                file_io.write(
+                    functools.partial(_write_file, path, formatted_str, newline),
+                    record_stat or _ignore_result,
+                )
+            elif record_stat is not None and original_st is not None:
+                record_stat(original_st)
+        file_io.finish_writes()
     if format_errors_found:
         return 1
     return 0
 
 
+def _ignore_result(result: object) -> None:
+    pass
+
+
+def _pipeline_cache_key(
+    opts: Mapping, codeformatter_cache: mdformat.renderer.CodeFormatterCache | None
+) -> Hashable:
+    """Return a key that is equal for runs that build equal pipelines."""
+    opts_str = json.dumps(
+        {k: v for k, v in opts.items() if k != "paths"}, sort_keys=True, default=str
+    )
+    # A cached pipeline references the code formatter cache, so the id
+    # is not reused by another cache.
+    return opts_str, id(codeformatter_cache)
+
+
+def merge_opts(
+    toml_opts: Mapping, cli_core_opts: Mapping, cli_plugin_opts: Mapping
+) -> dict:
+    """Merge default, TOML and CLI options.
+
+    The input mappings are not mutated.
+    """
+    opts: dict = {**DEFAULT_OPTS, **toml_opts, **cli_core_opts}
+    plugin_opts = {k: {**v} for k, v in opts["plugin"].items()}
+    for plugin_id, cli_opts in cli_plugin_opts.items():
+        plugin_opts[plugin_id] = {**plugin_opts.get(plugin_id, {}), **cli_opts}
+    opts["plugin"] = plugin_opts
+    return opts
+
+
+def print_fingerprints(
+    path_strings: Sequence[str], cli_core_opts: Mapping, cli_plugin_opts: Mapping
+) -> int:
+    """Print the fingerprint of options that apply to each path, or to
+    stdin if there are no paths.
+
+    The paths do not need to exist.
+    """
+    resolver = PipelineResolver(cli_core_opts, cli_plugin_opts, None)
+    for path_str in path_strings or ["-"]:
+        path = None if path_str == "-" else Path(os.path.abspath(path_str))
+        try:
+            opts, _ = resolver.opts(path)
+        except InvalidConfError as e:
+            print_error(str(e))
+            return 1
+        try:
+            fingerprint = opts_fingerprint(opts)
+        except KeyError as e:
+            print_error(f"The required {e.args[0]!r} plugin is not installed.")
+            return 1
+        print(f"{fingerprint}  {path_str}" if path_strings else fingerprint)
+    return 0
+
+
+def opts_fingerprint(opts: Mapping) -> str:
+    """Return `mdformat.fingerprint` of merged options.
+
+    Raise `KeyError` if a required plugin is not installed.
+    """
+    return mdformat.fingerprint(
+        options={k: opts[k] for k in DEFAULT_OPTS},
+        extensions=(
+            mdformat.plugins.PARSER_EXTENSIONS
+            if opts["extensions"] is None
+            else opts["extensions"]
+        ),
+        codeformatters=(
+            mdformat.plugins.CODEFORMATTERS
+            if opts["codeformatters"] is None
+            else opts["codeformatters"]
+        ),
+    )
+
+
+def build_pipeline(
+    opts: Mapping,
+    codeformatter_executor: Executor | None,
+    codeformatter_cache: mdformat.renderer.CodeFormatterCache | None,
+) -> FormatPipeline | None:
+    """Build a formatting pipeline for `opts`.
+
+    Print an error and return `None` if a required plugin is not
+    installed.
+    """
+    try:
+        enabled_parserplugins = (
+            mdformat.plugins.PARSER_EXTENSIONS
+            if opts["extensions"] is None
+            else {k: mdformat.plugins.PARSER_EXTENSIONS[k] for k in opts["extensions"]}
+        )
+    except KeyError as e:
+        print_error(
+            "Invalid extension required.",
+            paragraphs=[
+                f"The required {e.args[0]!r} extension is not available. "
+                "Please install a plugin that adds the extension, "
+                "or remove it from required extensions."
+            ],
+        )
+        return None
+    try:
+        enabled_codeformatters = (
+            mdformat.plugins.CODEFORMATTERS
+            if opts["codeformatters"] is None
+            else {k: mdformat.plugins.CODEFORMATTERS[k] for k in opts["codeformatters"]}
+        )
+    except KeyError as e:
+        print_error(
+            "Invalid code formatter required.",
+            paragraphs=[
+                f"The required {e.args[0]!r} code formatter language "
+                "is not available. "
+                "Please install a plugin "
+                "that adds support for the language, "
+                "or remove it from required languages."
+            ],
+        )
+        return None
+
+    formatter = mdformat.Formatter(
+        options=opts,
+        extensions=enabled_parserplugins,
+        codeformatters=enabled_codeformatters,
+        codeformatter_executor=codeformatter_executor,
+        codeformatter_cache=codeformatter_cache,
+    )
+    changes_ast = any(
+        getattr(plugin, "CHANGES_AST", False)
+        for plugin in enabled_parserplugins.values()
+    )
+    validation_mdit = (
+        build_mdit(RendererHTML, mdformat_opts=opts, extensions=enabled_parserplugins)
+        if opts["validate"] and not changes_ast and not opts["check"]
+        else None
+    )
+    return FormatPipeline(
+        opts,
+        enabled_parserplugins,
+        enabled_codeformatters,
+        formatter,
+        validation_mdit,
+    )
+
+
+def make_codeformatter_executor(
+    cli_opts: Mapping,
+) -> AbstractContextManager[Executor | None]:
+    workers = cli_opts.get("codeformatter_workers")
+    timeout = cli_opts.get("codeformatter_timeout")
+    if timeout is not None or cli_opts.get("codeformatter_processes"):
+        return IsolatedExecutor(workers or os.cpu_count() or 1, timeout=timeout)
+    if workers is None:
+        return contextlib.nullcontext()
+    return ThreadPoolExecutor(max_workers=workers)
+
+
+def validate_positive_int_arg(value: str) -> int:
+    number = int(value)
+    if number < 1:
+        raise ValueError("must be a positive integer")
+    return number
+
+
+def validate_positive_float_arg(value: str) -> float:
+    number = float(value)
+    if not number > 0:
+        raise ValueError("must be a positive number")
+    return number
+
+
+def validate_line_range_arg(value: str) -> LineRange:
+    start_str, sep, end_str = value.partition(":")
+    try:
+        start = int(start_str)
+        end = int(end_str) if sep else start
+    except ValueError:
+        start = end = 0
+    if not 1 <= start <= end:
+        raise argparse.ArgumentTypeError(
+            f"invalid line range {value!r}: expected START[:END] "
+            "with 1 <= START <= END"
+        )
+    return start, end
+
+
+def validate_shard_arg(value: str) -> tuple[int, int]:
+    index_str, sep, count_str = value.partition("/")
+    if not sep:
+        raise ValueError("invalid shard")
+    index, count = int(index_str), int(count_str)
+    if not 1 <= index <= count:
+        raise ValueError("invalid shard")
+    return index, count
+
+
 def validate_wrap_arg(value: str) -> str | int:
     if value in {"keep", "no"}:
         return value
@@ -234,14 +1060,87 @@ def make_arg_parser(
         choices=("lf", "crlf", "keep"),
         help="output file line ending mode (default: lf)",
     )
-    if sys.version_info >= (3, 13):  # pragma: >=3.13 cover
-        parser.add_argument(
-            "--exclude",
-            action="append",
-            metavar="PATTERN",
-            help="exclude files that match the Unix-style glob pattern "
-            "(multiple allowed)",
-        )
+    parser.add_argument(
+        "--files-from",
+        metavar="FILE",
+        help="also format paths listed in FILE, one per line "
+        "(use `-` to read the list from stdin)",
+    )
+    parser.add_argument(
+        "-0",
+        "--null",
+        action="store_const",
+        const=True,
+        help="paths listed in --files-from FILE are separated by NUL characters",
+    )
+    parser.add_argument(
+        "--exclude",
+        action="append",
+        metavar="PATTERN",
+        help="exclude files that match the Unix-style glob pattern "
+        "(multiple allowed)",
+    )
+    parser.add_argument(
+        "--respect-gitignore",
+        action="store_const",
+        const=True,
+        help="do not format files ignored by .gitignore files when "
+        "searching directories",
+    )
+    parser.add_argument(
+        "--changed-since",
+        metavar="REF",
+        help="only format files that differ from git revision REF, or are untracked",
+    )
+    parser.add_argument(
+        "--staged",
+        action="store_const",
+        const=True,
+        help="only format files with changes staged in git "
+        "(compared to --changed-since REF, or HEAD)",
+    )
+    ranges_group = parser.add_mutually_exclusive_group()
+    ranges_group.add_argument(
+        "--lines",
+        action="append",
+        type=validate_line_range_arg,
+        metavar="START:END",
+        help="only format top-level blocks that overlap the line range "
+        "(multiple allowed)",
+    )
+    ranges_group.add_argument(
+        "--diff-ranges",
+        action="store_const",
+        const=True,
+        help="only format top-level blocks that overlap lines changed in git "
+        "(compared to --changed-since REF, or HEAD)",
+    )
+    parser.add_argument(
+        "--shard",
+        type=validate_shard_arg,
+        metavar="INDEX/COUNT",
+        help="split files into COUNT shards by a hash of their path, "
+        "and only format shard INDEX (1-based)",
+    )
+    parser.add_argument(
+        "--shard-by-size",
+        action="store_const",
+        const=True,
+        help="split files into shards of equal total size instead "
+        "(resolves all paths before formatting)",
+    )
+    parser.add_argument(
+        "--output-dir",
+        metavar="DIR",
+        help="write formatted copies of files into DIR, at their paths "
+        "relative to the current directory, and skip copies newer than "
+        "their file and configuration file",
+    )
+    parser.add_argument(
+        "--depfile",
+        metavar="FILE",
+        help="write make rules of the copies in --output-dir DIR to FILE",
+    )
     extensions_group = parser.add_mutually_exclusive_group()
     extensions_group.add_argument(
         "--extensions",
@@ -276,6 +1175,73 @@ def make_arg_parser(
         dest="codeformatters",
         help=argparse.SUPPRESS,
     )
+    parser.add_argument(
+        "--codeformatter-workers",
+        type=validate_positive_int_arg,
+        metavar="N",
+        help="run code formatter plugins concurrently in N worker threads",
+    )
+    parser.add_argument(
+        "--codeformatter-processes",
+        action="store_const",
+        const=True,
+        help="use worker processes instead of threads for code formatters",
+    )
+    parser.add_argument(
+        "--codeformatter-timeout",
+        type=validate_positive_float_arg,
+        metavar="SECONDS",
+        help="leave a code block unformatted if formatting takes longer than "
+        "SECONDS (runs code formatters in worker processes)",
+    )
+    parser.add_argument(
+        "--io-workers",
+        type=validate_positive_int_arg,
+        metavar="N",
+        help="read files ahead of, and write them behind formatting in N "
+        "threads, e.g. to hide latency of network filesystems",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        metavar="DIR",
+        help="persist code formatter results, and an index of files "
+        "formatted and their stats (stat-index-v1.json), in DIR",
+    )
+    parser.add_argument(
+        "--no-stat-cache",
+        action="store_const",
+        const=True,
+        help="do not skip files that are unchanged since --cache-dir DIR "
+        "recorded them as formatted",
+    )
+    parser.add_argument(
+        "--print-fingerprint",
+        action="store_const",
+        const=True,
+        help="print a fingerprint of the configuration and plugins that "
+        "apply to each path, and exit",
+    )
+    parser.add_argument(
+        "--stdin-batch",
+        action="store_const",
+        const=True,
+        help="format a stream of length-prefixed documents read from stdin, "
+        "and write formatted documents to stdout",
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_const",
+        const=True,
+        help="after formatting, keep watching the paths and format files "
+        "when they change (stop with Ctrl+C)",
+    )
+    parser.add_argument(
+        "--daemon",
+        action="store_const",
+        const=True,
+        help="run a formatting server that later mdformat commands forward "
+        "to (stop with Ctrl+C)",
+    )
     for plugin in parser_extensions.values():
         if hasattr(plugin, "add_cli_options"):
             import warnings
@@ -327,55 +1293,219 @@ class InvalidPath(Exception):
         self.path = path
 
 
-def resolve_file_paths(path_strings: Iterable[str]) -> list[None | Path]:
+def resolve_file_paths(
+    path_strings: Iterable[str],
+    *,
+    skip_dir: Callable[[Path], bool] | None = None,
+    gitignore: GitIgnore | None = None,
+    only_files: Collection[Path] | None = None,
+) -> Iterator[None | Path]:
     """Resolve pathlib.Path objects from filepath strings.
 
     Convert path strings to pathlib.Path objects. Check that all paths
     are either files, directories or stdin. If not, raise InvalidPath.
-    Resolve directory paths to a list of file paths (ending with ".md").
+    Return an iterator that lazily resolves directory paths to file
+    paths (ending with ".md"). Do not walk directories for which
+    `skip_dir` returns True, or files and directories ignored by
+    `gitignore`. If `only_files` is given, do not walk directories, but
+    resolve them to those of `only_files` that they contain.
+    """
+    return _iter_file_paths(
+        resolve_root_paths(path_strings), skip_dir, gitignore, only_files
+    )
+
+
+def resolve_root_paths(path_strings: Iterable[str]) -> list[None | Path]:
+    """Resolve normalized paths to files and directories, or `None` for
+    stdin/stdout.
+
+    Raise InvalidPath if a path does not exist.
     """
-    file_paths: list[None | Path] = []  # Path to file or None for stdin/stdout
+    root_paths: list[None | Path] = []
     for path_str in path_strings:
         if path_str == "-":
-            file_paths.append(None)
+            root_paths.append(None)
             continue
         path_obj = Path(path_str)
         path_obj = _normalize_path(path_obj)
         if path_obj.is_dir():
-            for p in path_obj.glob("**/*.md"):
-                if p.is_file():
-                    p = _normalize_path(p)
-                    file_paths.append(p)
+            root_paths.append(path_obj)
         elif path_obj.is_file():  # pragma: nt no cover
-            file_paths.append(path_obj)
+            root_paths.append(path_obj)
         else:  # pragma: nt no cover
             raise InvalidPath(path_obj)
-    return file_paths
+    return root_paths
 
 
-def is_excluded(  # pragma: >=3.13 cover
+def read_path_list(file: IO[bytes], null_separated: bool) -> Iterator[str]:
+    """Yield paths of a newline or NUL separated list.
+
+    The file is read in chunks, so that paths are yielded before the
+    whole list is read. Empty entries are skipped.
+    """
+    sep = b"\0" if null_separated else b"\n"
+    read = getattr(file, "read1", file.read)
+    remainder = b""
+    while True:
+        chunk = read(1 << 16)
+        entries = (remainder + chunk).split(sep)
+        remainder = entries.pop() if chunk else b""
+        for entry in entries:
+            if not null_separated and entry.endswith(b"\r"):
+                entry = entry[:-1]
+            if entry:
+                yield os.fsdecode(entry)
+        if not chunk:
+            return
+
+
+def iter_listed_paths(path_strings: Iterable[str]) -> Iterator[Path]:
+    """Resolve normalized paths to files and directories.
+
+    Unlike on the command line, "-" is a path, not stdin. Raise
+    InvalidPath once a path that does not exist is reached.
+    """
+    for path_str in path_strings:
+        path = Path(os.path.abspath(path_str))
+        try:
+            st = os.stat(path)
+        except (OSError, ValueError):
+            raise InvalidPath(path)
+        if not (stat.S_ISDIR(st.st_mode) or stat.S_ISREG(st.st_mode)):
+            raise InvalidPath(path)
+        yield path
+
+
+def _iter_file_paths(
+    root_paths: Iterable[None | Path],
+    skip_dir: Callable[[Path], bool] | None,
+    gitignore: GitIgnore | None,
+    only_files: Collection[Path] | None,
+) -> Generator[None | Path, None, None]:
+    for path in root_paths:
+        if path is None:
+            yield path
+        elif only_files is not None:
+            yield from _filter_file_paths(path, only_files)
+        elif path.is_dir():
+            yield from walk_md_files(path, skip_dir, gitignore)
+        else:
+            yield path
+
+
+def _filter_file_paths(
+    path: Path, only_files: Collection[Path]
+) -> Generator[Path, None, None]:
+    """Yield `path` if it is in `only_files`, or if it is a directory,
+    the Markdown files of `only_files` that it contains."""
+    if path in only_files:
+        yield path
+        return
+    if not path.is_dir():
+        return
+    prefix = os.path.join(str(path), "")
+    for file_path in sorted(only_files):
+        if (
+            str(file_path).startswith(prefix)
+            and os.path.normcase(file_path.name).endswith(".md")
+            and file_path.is_file()
+        ):
+            yield file_path
+
+
+def walk_md_files(
+    directory: Path,
+    skip_dir: Callable[[Path], bool] | None = None,
+    gitignore: GitIgnore | None = None,
+) -> Generator[Path, None, None]:
+    """Yield paths to Markdown files in `directory` and its subdirectories.
+
+    Do not follow symlinks to directories, and do not enter directories
+    for which `skip_dir` returns True. If `gitignore` is given, skip
+    files and directories ignored by git.
+    """
+    dir_stack = [str(directory)]
+    while dir_stack:
+        try:
+            with os.scandir(dir_stack.pop()) as it:
+                entries = list(it)
+        except OSError:
+            continue
+        subdirs = []
+        for entry in entries:
+            # `DirEntry` methods use file type info from the directory
+            # listing, so these usually do not need a `stat` call.
+            if entry.is_dir(follow_symlinks=False):
+                if gitignore is None or not gitignore.is_ignored(
+                    entry.path, is_dir=True
+                ):
+                    subdirs.append(entry.path)
+            elif os.path.normcase(entry.name).endswith(".md") and entry.is_file():
+                if gitignore is None or not gitignore.is_ignored(
+                    entry.path, is_dir=False
+                ):
+                    yield Path(entry.path)
+        if skip_dir is not None:
+            subdirs = [d for d in subdirs if not skip_dir(Path(d))]
+        dir_stack.extend(reversed(subdirs))
+
+
+def _is_skipped_output_dir(
+    path: Path, output_dir: Path, skip_dir: Callable[[Path], bool]
+) -> bool:
+    return path == output_dir or skip_dir(path)
+
+
+def is_excluded_dir(path: Path, cli_core_opts: Mapping) -> bool:
+    """Check if every file in a directory is excluded by `--exclude`.
+
+    Exclude patterns of configuration files are not checked, as a
+    configuration file deeper in the directory may override them.
+    """
+    patterns = cli_core_opts.get("exclude")
+    if not patterns:
+        return False
+    relative_path = _exclude_relative_path(path, None, True)
+    return relative_path is not None and compile_patterns(tuple(patterns)).match_dir(
+        relative_path
+    )
+
+
+def is_excluded(
     path: Path | None,
     patterns: list[str],
     toml_path: Path | None,
     excludes_from_cli: bool,
 ) -> bool:
-    if not path:
+    if not path or not patterns:
         return False
+    relative_path = _exclude_relative_path(path, toml_path, excludes_from_cli)
+    return relative_path is not None and compile_patterns(tuple(patterns)).match(
+        relative_path
+    )
 
-    if not excludes_from_cli and toml_path:
-        exclude_root = toml_path.parent
-    else:
-        exclude_root = Path.cwd()
 
-    try:
-        relative_path = path.relative_to(exclude_root)
-    except ValueError:
-        return False
+def _exclude_relative_path(
+    path: Path, toml_path: Path | None, excludes_from_cli: bool
+) -> str | None:
+    """Return "/" separated path relative to the root of exclude patterns.
 
-    return any(
-        relative_path.full_match(pattern)  # type: ignore[attr-defined]
-        for pattern in patterns
-    )
+    Return `None` if the path is not in the root directory. Both `path`
+    and the root are assumed to be normalized absolute paths.
+    """
+    if not excludes_from_cli and toml_path:
+        exclude_root = str(toml_path.parent)
+    else:
+        exclude_root = str(Path.cwd())
+    if not exclude_root.endswith(os.sep):
+        exclude_root += os.sep
+    path_str = str(path)
+    if not os.path.normcase(path_str).startswith(os.path.normcase(exclude_root)):
+        return None
+    relative_path = path_str[len(exclude_root) :]
+    if os.sep != "/":  # pragma: no cover
+        relative_path = relative_path.replace(os.sep, "/")
+    return relative_path
 
 
 def _normalize_path(path: Path) -> Path:
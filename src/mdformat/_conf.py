@@ -1,7 +1,9 @@
 from __future__ import annotations
 
 import functools
+import os
 from pathlib import Path
+import stat
 from typing import Mapping
 
 from mdformat._compat import tomllib
@@ -28,10 +30,37 @@ class InvalidConfError(Exception):
     """
 
 
+# Modification time and size of every configuration file path checked by
+# `read_toml_opts`, or `None` if there was no file
+_conf_file_signatures: dict[Path, tuple[int, int] | None] = {}
+
+
+def _file_signature(path: Path) -> tuple[int, int] | None:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    if not stat.S_ISREG(st.st_mode):
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+def invalidate_stale_toml_opts() -> None:
+    """Clear the cache of `read_toml_opts` if a configuration file it
+    checked has been created, modified or removed since."""
+    for path, signature in _conf_file_signatures.items():
+        if _file_signature(path) != signature:
+            read_toml_opts.cache_clear()
+            _conf_file_signatures.clear()
+            return
+
+
 @functools.lru_cache()
 def read_toml_opts(conf_dir: Path) -> tuple[Mapping, Path | None]:
     conf_path = conf_dir / ".mdformat.toml"
-    if not conf_path.is_file():
+    signature = _file_signature(conf_path)
+    _conf_file_signatures[conf_path] = signature
+    if signature is None:
         parent_dir = conf_dir.parent
         if conf_dir == parent_dir:
             return {}, None
@@ -66,7 +95,7 @@ def _validate_values(opts: Mapping, conf_path: Path) -> None:  # noqa: C901
     if "number" in opts:
         if not isinstance(opts["number"], bool):
             raise InvalidConfError(f"Invalid 'number' value in {conf_path}")
-    if "exclude" in opts:  # pragma: >=3.13 cover
+    if "exclude" in opts:
         if not isinstance(opts["exclude"], list):
             raise InvalidConfError(f"Invalid 'exclude' value in {conf_path}")
         for pattern in opts["exclude"]:
@@ -0,0 +1,289 @@
+"""A formatting daemon, and a client that forwards CLI runs to it.
+
+The daemon keeps plugins loaded and formatting pipelines built across
+runs. A run is forwarded as a JSON request over a Unix domain socket,
+and executed in the daemon's process with the client's working
+directory, environment variables, arguments and standard input. Runs
+of a client in a different Python environment, or with different
+plugins installed, than the daemon are not forwarded.
+
+This module is imported by the client on every run, so it must only
+import modules of the standard library that are fast to import.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Sequence
+import io
+import json
+import os
+import socket
+import stat
+import sys
+import tempfile
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from mdformat._cli import RunCache
+
+_SOCKET_ENV_VAR = "MDFORMAT_DAEMON_SOCKET"
+_CONNECT_TIMEOUT = 1.0
+# Unix domain sockets and file ownership are not available on Windows
+_SUPPORTED = hasattr(socket, "AF_UNIX") and hasattr(os, "getuid")
+# Options of runs that do not finish on their own, or stream stdin. These
+# are not forwarded.
+_IN_PROCESS_ARGS = frozenset({"--daemon", "--watch", "--stdin-batch"})
+_PLUGIN_GROUPS = ("mdformat.parser_extension", "mdformat.codeformatter")
+
+
+def socket_path() -> str:
+    """Return the path of the daemon's socket.
+
+    Use `MDFORMAT_DAEMON_SOCKET` environment variable if it is set.
+    Else use a path in a directory that only the current user can
+    access.
+    """
+    path = os.environ.get(_SOCKET_ENV_VAR)
+    if path:
+        return path
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime_dir:
+        return os.path.join(runtime_dir, "mdformat.sock")
+    return os.path.join(tempfile.gettempdir(), f"mdformat-{os.getuid()}", "daemon.sock")
+
+
+def _is_own_socket(path: str) -> bool:
+    """Check that `path` is a socket owned by the current user."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return False
+    return stat.S_ISSOCK(st.st_mode) and st.st_uid == os.getuid()
+
+
+def _recv_all(sock: socket.socket) -> bytes:
+    chunks: list[bytes] = []
+    while True:
+        chunk = sock.recv(1 << 16)
+        if not chunk:
+            return b"".join(chunks)
+        chunks.append(chunk)
+
+
+def _terminal_columns() -> int | None:
+    """Return terminal width the way `shutil.get_terminal_size` does, or
+    `None` if it is unknown."""
+    try:
+        return int(os.environ["COLUMNS"])
+    except (KeyError, ValueError):
+        pass
+    if sys.__stdout__ is None:
+        return None
+    try:
+        return os.get_terminal_size(sys.__stdout__.fileno()).columns
+    except (ValueError, OSError):
+        return None
+
+
+def _identity() -> dict:
+    """Return the identity of the Python environment, and the mdformat
+    version and plugins installed in it.
+
+    Unlike `mdformat.fingerprint`, plugins are identified by the
+    versions of the distributions that provide them, from metadata,
+    without loading them.
+    """
+    import mdformat
+    from mdformat._compat import importlib_metadata
+
+    plugins = sorted(
+        [group, ep.name, ep.dist.name, ep.dist.version] if ep.dist else [group, ep.name]
+        for group in _PLUGIN_GROUPS
+        for ep in importlib_metadata.entry_points(group=group)
+    )
+    return {
+        "version": mdformat.__version__,
+        "prefix": sys.prefix,
+        "executable": sys.executable,
+        "plugins": plugins,
+    }
+
+
+def _stdin_stream(text: str) -> io.TextIOWrapper:
+    """Return a stream of `text` that, like `sys.stdin`, has a binary
+    buffer."""
+    data = text.encode("utf-8", "surrogateescape")
+    return io.TextIOWrapper(io.BytesIO(data), encoding="utf-8", newline="")
+
+
+def forward(args: Sequence[str]) -> int | None:
+    """Run the CLI with `args` in a running daemon.
+
+    Write output of the run to stdout and stderr, and return its exit
+    code. Return `None` if no daemon is running, or it cannot run the
+    request, in which case the caller should run the CLI in-process.
+    """
+    if not _SUPPORTED or _IN_PROCESS_ARGS.intersection(args):
+        return None
+    path = socket_path()
+    if not _is_own_socket(path):
+        return None
+
+    stdin = None
+    if "-" in args or "--files-from=-" in args:
+        stdin = sys.stdin.read()
+        # Let an in-process fallback read the same input
+        sys.stdin = _stdin_stream(stdin)
+    request = {
+        "identity": _identity(),
+        "cwd": os.getcwd(),
+        "env": dict(os.environ),
+        "args": list(args),
+        "stdin": stdin,
+        "columns": _terminal_columns(),
+    }
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(_CONNECT_TIMEOUT)
+            sock.connect(path)
+            sock.settimeout(None)
+            sock.sendall(json.dumps(request).encode())
+            sock.shutdown(socket.SHUT_WR)
+            response = json.loads(_recv_all(sock))
+    except (OSError, ValueError):
+        return None
+    if response.get("fallback"):
+        return None
+    sys.stdout.buffer.write(response["stdout"].encode())
+    sys.stdout.flush()
+    sys.stderr.write(response["stderr"])
+    return response["exit_code"]
+
+
+def _handle(request_bytes: bytes, run_cache: RunCache, identity: dict) -> dict:
+    """Run a request in this process, and return the response.
+
+    `identity` is the `_identity()` of this process, taken when it
+    loaded plugins.
+    """
+    import traceback
+
+    import mdformat._cli
+    from mdformat._conf import invalidate_stale_toml_opts
+
+    request = json.loads(request_bytes)
+    if request.get("identity") != identity:
+        return {"fallback": True}
+    if _IN_PROCESS_ARGS.intersection(request["args"]):
+        return {"fallback": True}
+
+    invalidate_stale_toml_opts()
+    stdout_bytes = io.BytesIO()
+    stdout = io.TextIOWrapper(stdout_bytes, encoding="utf-8", newline="")
+    stderr = io.StringIO()
+    saved_streams = sys.stdin, sys.stdout, sys.stderr
+    saved_cwd = os.getcwd()
+    saved_env = dict(os.environ)
+    try:
+        os.chdir(request["cwd"])
+        # Code formatters and git, run by `--changed-since`, read
+        # environment variables of the client
+        os.environ.clear()
+        os.environ.update(request["env"])
+        if request.get("columns"):
+            os.environ["COLUMNS"] = str(request["columns"])
+        sys.stdin = _stdin_stream(request.get("stdin") or "")
+        sys.stdout, sys.stderr = stdout, stderr
+        try:
+            exit_code = mdformat._cli.run(request["args"], run_cache=run_cache)
+        except SystemExit as e:
+            exit_code = e.code if isinstance(e.code, int) else int(e.code is not None)
+        except Exception:
+            traceback.print_exc()
+            exit_code = 1
+    finally:
+        sys.stdin, sys.stdout, sys.stderr = saved_streams
+        os.chdir(saved_cwd)
+        os.environ.clear()
+        os.environ.update(saved_env)
+    stdout.flush()
+    return {
+        "exit_code": exit_code,
+        "stdout": stdout_bytes.getvalue().decode(),
+        "stderr": stderr.getvalue(),
+    }
+
+
+def _prepare_socket_path(path: str) -> str | None:
+    """Create the directory of the socket, and remove a stale socket.
+
+    Return an error message if the daemon cannot listen on `path`.
+    """
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    dir_stat = os.stat(directory)
+    if dir_stat.st_uid != os.getuid() or dir_stat.st_mode & 0o022:
+        return (
+            f"Directory {directory} of the daemon socket must be owned"
+            " and only writable by the current user."
+        )
+    if os.path.exists(path):
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+            try:
+                probe.connect(path)
+            except OSError:
+                os.unlink(path)  # Left behind by a daemon that crashed
+            else:
+                return f"A daemon is already listening on {path}."
+    return None
+
+
+def serve(path: str | None = None) -> int:  # noqa: C901
+    """Serve formatting requests until interrupted."""
+    import signal
+
+    from mdformat._cli import RunCache, print_error, print_paragraphs
+
+    if not _SUPPORTED:  # pragma: no cover
+        print_error("The daemon requires Unix domain socket support.")
+        return 1
+    if path is None:
+        path = socket_path()
+    error = _prepare_socket_path(path)
+    if error:
+        print_error(error)
+        return 1
+
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    # Exit cleanly on SIGTERM, removing the socket
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        old_umask = os.umask(0o177)
+        try:
+            server.bind(path)
+        finally:
+            os.umask(old_umask)
+        server.listen()
+        print_paragraphs([f"Listening on {path}"])
+        run_cache = RunCache()
+        # JSON round trip, to compare with identities of requests
+        identity = json.loads(json.dumps(_identity()))
+        while True:
+            conn, _ = server.accept()
+            with conn:
+                try:
+                    response = _handle(_recv_all(conn), run_cache, identity)
+                except ValueError:
+                    response = {"fallback": True}
+                try:
+                    conn.sendall(json.dumps(response).encode())
+                except OSError:
+                    pass
+    except KeyboardInterrupt:
+        return 0
+    finally:
+        server.close()
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
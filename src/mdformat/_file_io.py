@@ -0,0 +1,114 @@
+"""Reading files ahead of, and writing them behind formatting.
+
+On a network filesystem, each stat, read and write may take
+milliseconds. Running them in a thread pool, a bounded number of files
+ahead of or behind the formatting loop, overlaps that latency with
+formatting. Files are still formatted, and read and write errors
+raised, in order.
+"""
+
+from __future__ import annotations
+
+from collections import deque
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import Future, ThreadPoolExecutor
+import functools
+from types import TracebackType
+from typing import Any, TypeVar
+
+_T = TypeVar("_T")
+_R = TypeVar("_R")
+
+# Files read ahead and written behind per worker thread
+_WINDOW_PER_WORKER = 2
+
+
+class FileIO:
+    """Runs reads and writes of files in `workers` threads.
+
+    If `workers` is 0, reads and writes run in the calling thread when
+    asked to.
+    """
+
+    def __init__(self, workers: int = 0) -> None:
+        self._executor = (
+            ThreadPoolExecutor(workers, thread_name_prefix="mdformat-io")
+            if workers
+            else None
+        )
+        self._window = workers * _WINDOW_PER_WORKER
+        self._writes: deque[tuple[Future, Callable[[Any], None]]] = deque()
+
+    def read_ahead(  # noqa: C901
+        self, items: Iterable[_T], read: Callable[[_T], _R]
+    ) -> Iterator[tuple[_T, Callable[[], _R]]]:
+        """Yield items, each with a function that returns the result of
+        `read` of the item, or raises its exception.
+
+        If iterating `items` raises, the exception is raised after the
+        items before it are yielded.
+        """
+        if self._executor is None:
+            for item in items:
+                yield item, functools.partial(read, item)
+            return
+        iterator = iter(items)
+        pending: deque[tuple[_T, Future[_R]]] = deque()
+        error: Exception | None = None
+        try:
+            while True:
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    break
+                except Exception as e:
+                    error = e
+                    break
+                pending.append((item, self._executor.submit(read, item)))
+                if len(pending) > self._window:
+                    item, future = pending.popleft()
+                    yield item, future.result
+            while pending:
+                item, future = pending.popleft()
+                yield item, future.result
+            if error is not None:
+                raise error
+        finally:
+            # The caller stopped early. Skip reads that did not start.
+            for _, future in pending:
+                future.cancel()
+
+    def write(self, write: Callable[[], _R], done: Callable[[_R], None]) -> None:
+        """Call `write`, and then `done` with its result.
+
+        `done` is called in the calling thread, in the order of writes,
+        by this method or `finish_writes`.
+        """
+        if self._executor is None:
+            done(write())
+            return
+        self._writes.append((self._executor.submit(write), done))
+        while len(self._writes) > self._window:
+            self._finish_write()
+
+    def _finish_write(self) -> None:
+        future, done = self._writes.popleft()
+        done(future.result())
+
+    def finish_writes(self) -> None:
+        """Wait for writes, and raise the first error of any."""
+        while self._writes:
+            self._finish_write()
+
+    def __enter__(self) -> FileIO:
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        if self._executor is not None:
+            # Pending writes are completed, but their `done` is not called
+            self._executor.shutdown(wait=True)
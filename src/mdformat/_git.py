@@ -0,0 +1,153 @@
+from __future__ import annotations
+
+import os
+from pathlib import Path
+import re
+import subprocess
+
+
+class GitError(Exception):
+    """Error raised if querying the git repository fails."""
+
+
+def _git(args: list[str], cwd: Path) -> bytes:
+    try:
+        result = subprocess.run(
+            ["git", *args], cwd=cwd, capture_output=True, check=False
+        )
+    except OSError as e:
+        raise GitError(f"Failed to run git: {e}")
+    if result.returncode:
+        message = result.stderr.decode(errors="replace").strip()
+        raise GitError(message or f"git {args[0]} failed")
+    return result.stdout
+
+
+def _split_paths(output: bytes) -> list[str]:
+    return [os.fsdecode(p) for p in output.split(b"\0") if p]
+
+
+def _diff_args(since: str | None, staged: bool) -> list[str]:
+    if since is not None and since.startswith("-"):
+        raise GitError(f"Invalid git revision {since!r}")
+    args = ["--no-renames", "--no-ext-diff", "--diff-filter=d"]
+    if staged:
+        args.append("--cached")
+    return [*args, since or "HEAD", "--"]
+
+
+def _toplevel(cwd: Path) -> str:
+    """Return the root of the working tree, normalized like
+    `os.path.abspath` normalizes paths."""
+    cdup = os.fsdecode(_git(["rev-parse", "--show-cdup"], cwd).strip())
+    return os.path.abspath(os.path.join(cwd, cdup))
+
+
+def _untracked_files(toplevel: str) -> list[str]:
+    return _split_paths(
+        _git(["ls-files", "-z", "--others", "--exclude-standard"], Path(toplevel))
+    )
+
+
+def changed_files(cwd: Path, since: str | None, *, staged: bool) -> set[Path]:
+    """Return paths of files that git reports as changed.
+
+    If `staged` is True, return files whose staged content differs from
+    `since`, or from HEAD if `since` is `None`. Otherwise return files
+    whose working tree content differs from `since`, and untracked files
+    that are not ignored.
+
+    Deleted files are not included. Returned paths are absolute and
+    normalized like `os.path.abspath` normalizes them, so that they
+    compare equal to paths given on the command line.
+    """
+    diff_args = _diff_args(since, staged)
+    toplevel = _toplevel(cwd)
+    paths = _split_paths(_git(["diff", "--name-only", "-z", *diff_args], cwd))
+    if not staged:
+        paths += _untracked_files(toplevel)
+    return {Path(os.path.join(toplevel, os.path.normpath(p))) for p in paths}
+
+
+_HUNK_HEADER = re.compile(rb"@@ -\d+(?:,\d+)? \+(\d+)(?:,(\d+))? @@")
+
+
+# Escape sequences of paths quoted by git
+_PATH_ESCAPE = re.compile(rb"\\([0-7]{3}|.)")
+_PATH_ESCAPES = {
+    b"a": b"\a",
+    b"b": b"\b",
+    b"t": b"\t",
+    b"n": b"\n",
+    b"v": b"\v",
+    b"f": b"\f",
+    b"r": b"\r",
+}
+
+
+def _unescape_path_char(match: re.Match[bytes]) -> bytes:
+    escaped = match.group(1)
+    if len(escaped) == 3:
+        return bytes([int(escaped, 8) & 0xFF])
+    return _PATH_ESCAPES.get(escaped, escaped)
+
+
+def _unquote_path(path: bytes) -> str:
+    """Decode a path of a diff header, quoted by git if it has unusual
+    characters."""
+    if path.endswith(b"\t"):
+        # git ends paths that have spaces with a tab. A tab in a path is
+        # escaped.
+        path = path[:-1]
+    if len(path) > 1 and path.startswith(b'"') and path.endswith(b'"'):
+        path = _PATH_ESCAPE.sub(_unescape_path_char, path[1:-1])
+    return os.fsdecode(path)
+
+
+def changed_lines(
+    cwd: Path, since: str | None, *, staged: bool
+) -> dict[Path, list[tuple[int, int]] | None]:
+    """Return changed line ranges of files that git reports as changed.
+
+    Files are the same as `changed_files` returns. Line ranges are
+    inclusive and 1-based, and refer to the new version of a file. Lines
+    around deletions are included. Untracked files map to `None`, as
+    all of their lines are new.
+    """
+    diff_args = _diff_args(since, staged)
+    toplevel = _toplevel(cwd)
+    output = _git(
+        ["-c", "core.quotePath=false", "diff", "-U0", "--no-color", "--no-prefix"]
+        + diff_args,
+        cwd,
+    )
+    ranges: dict[Path, list[tuple[int, int]] | None] = {}
+    file_ranges: list[tuple[int, int]] = []
+    # Header lines of a file are between "diff --git" and the first hunk.
+    # Elsewhere, a line starting with "+++ " is an added line.
+    in_file_header = False
+    for line in output.split(b"\n"):
+        if line.startswith(b"diff --git "):
+            in_file_header = True
+        elif in_file_header and line.startswith(b"+++ "):
+            path = Path(
+                os.path.join(toplevel, os.path.normpath(_unquote_path(line[4:])))
+            )
+            file_ranges = []
+            ranges[path] = file_ranges
+        elif line.startswith(b"@@ "):
+            in_file_header = False
+            match = _HUNK_HEADER.match(line)
+            if match is None:  # pragma: no cover
+                continue
+            start = int(match.group(1))
+            count = 1 if match.group(2) is None else int(match.group(2))
+            if count:
+                file_ranges.append((start, start + count - 1))
+            else:
+                # Lines were deleted after line `start`
+                file_ranges.append((max(start, 1), start + 1))
+    if not staged:
+        for path_str in _untracked_files(toplevel):
+            ranges[Path(os.path.join(toplevel, os.path.normpath(path_str)))] = None
+    return ranges
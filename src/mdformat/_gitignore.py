@@ -0,0 +1,203 @@
+"""Matching of paths against `.gitignore` files.
+
+This implements the pattern format documented in `gitignore(5)`:
+
+- blank lines and lines starting with "#" are ignored
+- a leading "!" negates a pattern, re-including a path
+- a trailing "/" makes a pattern only match directories
+- a pattern with a "/" at the beginning or middle is relative to the
+  directory of the `.gitignore` file, any other pattern matches a name
+  at any level below it
+- "*", "?", "[seq]" and "**" work as in git
+- the last matching pattern wins, and patterns in a deeper `.gitignore`
+  file take precedence
+
+Patterns of `.git/info/exclude` of the repository are read too. Global
+excludes configured in git config are not.
+"""
+
+from __future__ import annotations
+
+import os
+import re
+
+_NOT_SEP = "[^/]"
+_ANY_SEGMENTS = "(?:.*/)?"
+
+
+def _translate_segment(segment: str) -> str:  # noqa: C901
+    """Translate a pattern segment to a regex."""
+    res: list[str] = []
+    i, n = 0, len(segment)
+    while i < n:
+        c = segment[i]
+        i += 1
+        if c == "*":
+            res.append(f"{_NOT_SEP}*")
+        elif c == "?":
+            res.append(_NOT_SEP)
+        elif c == "\\":
+            if i < n:
+                res.append(re.escape(segment[i]))
+                i += 1
+        elif c == "[":
+            j = i
+            negate = j < n and segment[j] in "!^"
+            if negate:
+                j += 1
+            chars: list[str] = []
+            # A "]" right after the opening bracket is a literal
+            if j < n and segment[j] == "]":
+                chars.append("\\]")
+                j += 1
+            while j < n and segment[j] != "]":
+                if segment[j] == "\\" and j + 1 < n:
+                    j += 1
+                    chars.append(re.escape(segment[j]))
+                elif segment[j] == "-":
+                    chars.append("-")
+                else:
+                    chars.append(re.escape(segment[j]))
+                j += 1
+            if j >= n:
+                res.append("\\[")
+                continue
+            i = j + 1
+            stuff = "".join(chars)
+            res.append(f"[^/{stuff}]" if negate else f"[{stuff}]")
+        else:
+            res.append(re.escape(c))
+    return "".join(res)
+
+
+class _Rule:
+    __slots__ = ("regex", "negate", "dir_only")
+
+    def __init__(self, regex: re.Pattern[str], negate: bool, dir_only: bool) -> None:
+        self.regex = regex
+        self.negate = negate
+        self.dir_only = dir_only
+
+
+def _parse_line(line: str, flags: int) -> _Rule | None:  # noqa: C901
+    """Parse a line of a `.gitignore` file.
+
+    Return `None` if the line has no pattern.
+    """
+    if not line or line.startswith("#"):
+        return None
+    pattern = line.rstrip(" ")
+    # Trailing spaces are kept if escaped with a backslash
+    if pattern.endswith("\\") and len(pattern) < len(line):
+        pattern += " "
+    negate = pattern.startswith("!")
+    if negate:
+        pattern = pattern[1:]
+    dir_only = pattern.endswith("/")
+    if dir_only:
+        pattern = pattern[:-1]
+    if not pattern:
+        return None
+    anchored = "/" in pattern
+    segments = pattern.lstrip("/").split("/")
+
+    parts = [] if anchored else [_ANY_SEGMENTS]
+    last_idx = len(segments) - 1
+    for idx, segment in enumerate(segments):
+        if segment == "**":
+            parts.append(".*" if idx == last_idx else _ANY_SEGMENTS)
+        else:
+            parts.append(_translate_segment(segment))
+            if idx < last_idx:
+                parts.append("/")
+    try:
+        regex = re.compile(f"(?s:{''.join(parts)})\\Z", flags)
+    except re.error:
+        return None
+    return _Rule(regex, negate, dir_only)
+
+
+class _IgnoreFile:
+    """Patterns of one ignore file, relative to directory `base`."""
+
+    __slots__ = ("prefix", "rules")
+
+    def __init__(self, base: str, rules: list[_Rule]) -> None:
+        self.prefix = base if base.endswith(os.sep) else base + os.sep
+        self.rules = rules
+
+    @classmethod
+    def load(cls, path: str, base: str, flags: int) -> _IgnoreFile | None:
+        try:
+            with open(path, encoding="utf-8", errors="surrogateescape") as f:
+                lines = f.read().splitlines()
+        except OSError:
+            return None
+        rules = [r for r in (_parse_line(line, flags) for line in lines) if r]
+        return cls(base, rules) if rules else None
+
+    def match(self, path: str, is_dir: bool) -> bool | None:
+        """Return True if `path` is ignored, False if it is re-included,
+        or `None` if no pattern matches it."""
+        if not path.startswith(self.prefix):
+            return None
+        relative_path = path[len(self.prefix) :]
+        if os.sep != "/":  # pragma: no cover
+            relative_path = relative_path.replace(os.sep, "/")
+        for rule in reversed(self.rules):
+            if rule.dir_only and not is_dir:
+                continue
+            if rule.regex.match(relative_path):
+                return not rule.negate
+        return None
+
+
+class GitIgnore:
+    """Checks paths against `.gitignore` files in their directory and its
+    parents up to the root of the git repository.
+
+    Ignore files are read once, on first check of a path in their
+    directory. Paths are expected to be normalized absolute paths.
+    """
+
+    def __init__(self, *, case_sensitive: bool = os.name != "nt") -> None:
+        self._flags = 0 if case_sensitive else re.IGNORECASE
+        self._dir_ignore_files: dict[str, tuple[_IgnoreFile, ...]] = {}
+
+    def _ignore_files(self, directory: str) -> tuple[_IgnoreFile, ...]:
+        """Return ignore files that apply in `directory`, outermost
+        first."""
+        try:
+            return self._dir_ignore_files[directory]
+        except KeyError:
+            pass
+        git_path = os.path.join(directory, ".git")
+        parent = os.path.dirname(directory)
+        ignore_files: tuple[_IgnoreFile, ...]
+        if os.path.exists(git_path):
+            info_exclude = _IgnoreFile.load(
+                os.path.join(git_path, "info", "exclude"), directory, self._flags
+            )
+            ignore_files = (info_exclude,) if info_exclude else ()
+        elif parent == directory:
+            ignore_files = ()
+        else:
+            ignore_files = self._ignore_files(parent)
+        gitignore = _IgnoreFile.load(
+            os.path.join(directory, ".gitignore"), directory, self._flags
+        )
+        if gitignore:
+            ignore_files += (gitignore,)
+        self._dir_ignore_files[directory] = ignore_files
+        return ignore_files
+
+    def is_ignored(self, path: str, *, is_dir: bool) -> bool:
+        """Check if git ignores a file or a directory."""
+        directory, name = os.path.split(path)
+        if is_dir and name == ".git":
+            return True
+        for ignore_file in reversed(self._ignore_files(directory)):
+            result = ignore_file.match(path, is_dir)
+            if result is not None:
+                return result
+        return False
@@ -0,0 +1,199 @@
+"""Glob pattern matching of relative paths.
+
+The pattern language is that of `pathlib.PurePath.full_match` in Python
+3.13:
+
+- "**" as a whole segment matches any number of segments, including zero
+- "*" matches any number of non-separator characters
+- "?" matches one non-separator character
+- "[seq]" and "[!seq]" match one character in, or not in, seq
+
+Paths and patterns are "/" separated (also "\\" on Windows).
+"""
+
+from __future__ import annotations
+
+from collections.abc import Iterable
+import functools
+import os
+import re
+
+_SEP = "/"
+_NOT_SEP = "[^/]"
+_STAR = f"{_NOT_SEP}*"
+# Regexes of "*" and "**" segments. "*" does not match an empty segment.
+_ONE_SEGMENT = f"{_NOT_SEP}+/"
+_ONE_LAST_SEGMENT = f"{_NOT_SEP}+"
+_ANY_SEGMENTS = "(?:.+/)?"
+_ANY_LAST_SEGMENTS = ".*"
+
+_MAGIC_CHARS = frozenset("*?[")
+
+
+def _split(pattern: str) -> list[str] | None:
+    """Split a pattern to segments the way `pathlib` parses paths.
+
+    Return `None` for absolute patterns, which never match a relative
+    path.
+    """
+    if os.name == "nt":  # pragma: no cover
+        pattern = pattern.replace("\\", "/")
+        if re.match(r"[a-zA-Z]:", pattern):
+            return None
+    if pattern.startswith("/"):
+        return None
+    return [s for s in pattern.split("/") if s and s != "."]
+
+
+def _translate_segment(segment: str) -> list[str]:  # noqa: C901
+    """Translate a pattern segment to a list of regex parts.
+
+    This follows `fnmatch.translate`.
+    """
+    res: list[str] = []
+    i, n = 0, len(segment)
+    while i < n:
+        c = segment[i]
+        i += 1
+        if c == "*":
+            # Compress consecutive "*" into one
+            if not res or res[-1] is not _STAR:
+                res.append(_STAR)
+        elif c == "?":
+            res.append(_NOT_SEP)
+        elif c == "[":
+            j = i
+            if j < n and segment[j] == "!":
+                j += 1
+            if j < n and segment[j] == "]":
+                j += 1
+            while j < n and segment[j] != "]":
+                j += 1
+            if j >= n:
+                res.append("\\[")
+                continue
+            stuff = segment[i:j]
+            if "-" not in stuff:
+                stuff = stuff.replace("\\", r"\\")
+            else:
+                chunks = []
+                k = i + 2 if segment[i] == "!" else i + 1
+                while True:
+                    k = segment.find("-", k, j)
+                    if k < 0:
+                        break
+                    chunks.append(segment[i:k])
+                    i = k + 1
+                    k += 3
+                chunk = segment[i:j]
+                if chunk:
+                    chunks.append(chunk)
+                else:
+                    chunks[-1] += "-"
+                # Remove empty ranges, they are invalid in a regex
+                for k in range(len(chunks) - 1, 0, -1):
+                    if chunks[k - 1][-1] > chunks[k][0]:
+                        chunks[k - 1] = chunks[k - 1][:-1] + chunks[k][1:]
+                        del chunks[k]
+                # Escape backslashes and hyphens that do not create a range
+                stuff = "-".join(
+                    s.replace("\\", r"\\").replace("-", r"\-") for s in chunks
+                )
+            # Escape set operations
+            stuff = re.sub(r"([&~|])", r"\\\1", stuff)
+            i = j + 1
+            if not stuff:
+                res.append("(?!)")
+            elif stuff == "!":
+                res.append(".")
+            else:
+                if stuff[0] == "!":
+                    stuff = "^" + stuff[1:]
+                elif stuff[0] in ("^", "["):
+                    stuff = "\\" + stuff
+                res.append(f"[{stuff}]")
+        else:
+            res.append(re.escape(c))
+    return res
+
+
+def _translate(segments: list[str]) -> str:
+    """Translate pattern segments to a regex.
+
+    This follows `glob.translate` with `recursive=True` and
+    `include_hidden=True`.
+    """
+    res: list[str] = []
+    last_idx = len(segments) - 1
+    for idx, segment in enumerate(segments):
+        if segment == "*":
+            res.append(_ONE_SEGMENT if idx < last_idx else _ONE_LAST_SEGMENT)
+        elif segment == "**":
+            if idx < last_idx:
+                if segments[idx + 1] != "**":
+                    res.append(_ANY_SEGMENTS)
+            else:
+                res.append(_ANY_LAST_SEGMENTS)
+        else:
+            res.extend(_translate_segment(segment))
+            if idx < last_idx:
+                res.append(_SEP)
+    return "".join(res)
+
+
+class PathMatcher:
+    """A matcher of relative paths against a set of glob patterns.
+
+    Literal patterns are looked up in a set. All other patterns are
+    combined into a single regex.
+    """
+
+    def __init__(self, patterns: Iterable[str], *, case_sensitive: bool) -> None:
+        self._case_sensitive = case_sensitive
+        self._literals: set[str] = set()
+        regexes = []
+        # Regexes matching directories whose every descendant matches
+        dir_regexes = []
+        for pattern in patterns:
+            segments = _split(pattern)
+            if segments is None:
+                continue
+            if not _MAGIC_CHARS.intersection(pattern):
+                self._literals.add(self._normcase(_SEP.join(segments)))
+            else:
+                regexes.append(_translate(segments))
+            if segments and segments[-1] == "**":
+                dir_regexes.append(
+                    _translate(segments[:-1]) + "(?:/.*)?"
+                    if len(segments) > 1
+                    else _ANY_LAST_SEGMENTS
+                )
+        flags = 0 if case_sensitive else re.IGNORECASE
+        self._regex = self._compile(regexes, flags)
+        self._dir_regex = self._compile(dir_regexes, flags)
+
+    @staticmethod
+    def _compile(regexes: list[str], flags: int) -> re.Pattern[str] | None:
+        if not regexes:
+            return None
+        return re.compile(f"(?s:{'|'.join(regexes)})\\Z", flags)
+
+    def _normcase(self, path: str) -> str:
+        return path if self._case_sensitive else path.lower()
+
+    def match(self, path: str) -> bool:
+        """Check if a "/" separated relative path matches any pattern."""
+        if self._normcase(path) in self._literals:
+            return True
+        return self._regex is not None and self._regex.match(path) is not None
+
+    def match_dir(self, path: str) -> bool:
+        """Check if every path in a directory matches a pattern."""
+        return self._dir_regex is not None and self._dir_regex.match(path) is not None
+
+
+@functools.lru_cache()
+def compile_patterns(
+    patterns: tuple[str, ...], *, case_sensitive: bool = os.name != "nt"
+) -> PathMatcher:
+    return PathMatcher(patterns, case_sensitive=case_sensitive)
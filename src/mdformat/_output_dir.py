@@ -0,0 +1,87 @@
+"""Writing formatted copies of files into an output directory."""
+
+from __future__ import annotations
+
+import os
+from pathlib import Path
+import stat
+import tempfile
+
+from mdformat._util import write_md
+
+
+def _escape_make_path(path: str) -> str:
+    return path.replace("$", "$$").replace("#", "\\#").replace(" ", "\\ ")
+
+
+class OutputTree:
+    """Formatted copies of files under `base`, at the same relative paths
+    under `directory`.
+
+    Like in make, a copy is up to date if it was modified after the file
+    and the configuration file that applies to it.
+    """
+
+    def __init__(self, directory: Path, base: Path) -> None:
+        self.directory = directory
+        self._base = base
+        # Prerequisites of each copy
+        self._dependencies: dict[Path, list[Path]] = {}
+
+    def output_path(self, path: Path) -> Path:
+        """Return the path of the copy of a file.
+
+        Raise `ValueError` if the file is not under `base`.
+        """
+        return self.directory / path.relative_to(self._base)
+
+    def needs_update(self, path: Path, toml_path: Path | None) -> bool:
+        """Record the prerequisites of the copy of a file, and check if
+        the copy is missing or out of date.
+
+        Raise `ValueError` if the file is not under `base`.
+        """
+        output_path = self.output_path(path)
+        dependencies = [path] if toml_path is None else [path, toml_path]
+        self._dependencies[output_path] = dependencies
+        try:
+            output_mtime_ns = os.stat(output_path).st_mtime_ns
+        except OSError:
+            return True
+        return any(os.stat(dep).st_mtime_ns >= output_mtime_ns for dep in dependencies)
+
+    def write(self, path: Path, md: str, newline: str) -> None:
+        """Write the copy of a file.
+
+        The copy is written to a temporary file that then replaces it,
+        so that an interrupted write never leaves a truncated copy that
+        looks up to date. The copy gets the permissions of the file.
+        """
+        output_path = self.output_path(path)
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(
+            dir=output_path.parent, prefix=f".{output_path.name}.", suffix=".tmp"
+        )
+        try:
+            with os.fdopen(fd, "wb") as f:
+                write_md(f, md, newline)
+            os.chmod(tmp_path, stat.S_IMODE(os.stat(path).st_mode))
+            os.replace(tmp_path, output_path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def write_depfile(self, depfile: Path) -> None:
+        """Write a make rule for each copy recorded by `needs_update`.
+
+        Paths are relative to the current working directory.
+        """
+        lines = []
+        for output_path, dependencies in self._dependencies.items():
+            target = _escape_make_path(os.path.relpath(output_path))
+            prerequisites = " ".join(
+                _escape_make_path(os.path.relpath(dep)) for dep in dependencies
+            )
+            lines.append(f"{target}: {prerequisites}\n")
+        depfile.parent.mkdir(parents=True, exist_ok=True)
+        depfile.write_text("".join(lines), encoding="utf-8")
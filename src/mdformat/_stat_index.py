@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+from pathlib import Path
+import tempfile
+
+LOGGER = logging.getLogger(__name__)
+
+# Name of the index file. Bump the version if the format changes.
+_INDEX_FILE_NAME = "stat-index-v1.json"
+
+
+def _file_id(st: os.stat_result, fingerprint: str) -> list:
+    return [st.st_size, st.st_mtime_ns, st.st_ino, fingerprint]
+
+
+class StatIndex:
+    """An index of files that were formatted when last seen.
+
+    Files are identified by size, modification time and inode number,
+    and keyed by absolute path. An entry is valid only for the
+    configuration it was recorded with.
+
+    A file modified right after it was recorded may keep the same
+    modification time. Entries with a modification time not older than
+    the index file are therefore not trusted, and are checked again.
+    """
+
+    def __init__(self, directory: str | os.PathLike[str]) -> None:
+        self._path = Path(directory) / _INDEX_FILE_NAME
+        self._entries: dict[str, list] = {}
+        self._saved_mtime_ns = 0
+        self._changed = False
+        try:
+            with open(self._path, "rb") as f:
+                self._saved_mtime_ns = os.fstat(f.fileno()).st_mtime_ns
+                entries = json.load(f)
+        except (OSError, ValueError):
+            return
+        if isinstance(entries, dict):
+            self._entries = entries
+
+    def is_unchanged(self, path: Path, st: os.stat_result, fingerprint: str) -> bool:
+        """Check if a file is formatted according to the index."""
+        entry = self._entries.get(str(path))
+        return (
+            entry == _file_id(st, fingerprint) and st.st_mtime_ns < self._saved_mtime_ns
+        )
+
+    def record(self, path: Path, st: os.stat_result, fingerprint: str) -> None:
+        """Record that a file is formatted."""
+        file_id = _file_id(st, fingerprint)
+        if self._entries.get(str(path)) != file_id:
+            self._entries[str(path)] = file_id
+            self._changed = True
+
+    def save(self) -> None:
+        """Write the index to disk if it changed."""
+        if not self._changed:
+            return
+        try:
+            self._path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self._path.parent, prefix=".tmp-")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(self._entries, f, separators=(",", ":"))
+            os.replace(tmp_path, self._path)
+        except OSError as e:
+            LOGGER.debug(f"Failed to write stat index: {e}")
+            return
+        self._changed = False
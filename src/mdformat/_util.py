@@ -2,9 +2,11 @@ from __future__ import annotations
 
 from collections.abc import Iterable, Mapping
 from contextlib import nullcontext
+import mmap
+import os
 import re
 from types import MappingProxyType
-from typing import Any, Literal
+from typing import IO, Any, Literal
 
 from markdown_it import MarkdownIt
 from markdown_it.renderer import RendererHTML
@@ -61,6 +63,7 @@ def is_md_equal(
     options: Mapping[str, Any] = EMPTY_MAP,
     extensions: Iterable[str] = (),
     codeformatters: Iterable[str] = (),
+    _mdit: MarkdownIt | None = None,
 ) -> bool:
     """Check if two Markdown produce the same HTML.
 
@@ -68,9 +71,14 @@ def is_md_equal(
     whitespace to a single space and checks equality. Note that this is
     not a perfect solution, as there can be meaningful whitespace in
     HTML, e.g. in a <code> block.
+
+    A parser built by `build_mdit(RendererHTML, ...)` with the same
+    options and extensions can be reused by passing it as `_mdit`.
     """
     html_texts = {}
-    mdit = build_mdit(RendererHTML, mdformat_opts=options, extensions=extensions)
+    mdit = _mdit or build_mdit(
+        RendererHTML, mdformat_opts=options, extensions=extensions
+    )
     for key, text in [("md1", md1), ("md2", md2)]:
         html = mdit.render(text)
 
@@ -124,3 +132,61 @@ def detect_newline_type(md: str, eol_setting: str) -> Literal["\n", "\r\n"]:
     if eol_setting == "crlf":
         return "\r\n"
     return "\n"
+
+
+# Characters converted at a time by `newline_converted_equal` and
+# `write_md`
+_CHUNK_SIZE = 1 << 20
+
+
+def newline_converted_equal(md: str, newline: str, original: str) -> bool:
+    """Check if `md`, with newlines converted to `newline`, equals
+    `original`.
+
+    `md` is converted in chunks, and only if the lengths match, so that
+    no full size copy of it is made.
+    """
+    if newline == "\n":
+        return md == original
+    if len(md) + md.count("\n") * (len(newline) - 1) != len(original):
+        return False
+    pos = 0
+    for start in range(0, len(md), _CHUNK_SIZE):
+        chunk = md[start : start + _CHUNK_SIZE].replace("\n", newline)
+        if not original.startswith(chunk, pos):
+            return False
+        pos += len(chunk)
+    return True
+
+
+def encode_md(md: str, newline: str) -> bytes:
+    """UTF-8 encode `md`, converting newlines to `newline`."""
+    return md.replace("\n", newline).encode()
+
+
+def write_md(file: IO[bytes], md: str, newline: str) -> None:
+    """Write `md` UTF-8 encoded, converting newlines to `newline`.
+
+    `md` is converted and encoded in chunks, so that no full size copy
+    of it is made.
+    """
+    for start in range(0, len(md), _CHUNK_SIZE):
+        chunk = md[start : start + _CHUNK_SIZE]
+        file.write(chunk.replace("\n", newline).encode())
+
+
+# Files of at least this many bytes are memory-mapped by `read_md`
+MMAP_THRESHOLD = 1 << 24
+
+
+def read_md(path: str | os.PathLike[str]) -> str:
+    """Read a UTF-8 encoded file, preserving line endings.
+
+    Large files are memory-mapped and decoded directly from the mapping,
+    so that no bytes copy of the whole file is made.
+    """
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size < max(MMAP_THRESHOLD, 1):
+            return f.read().decode()
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapping:
+            return str(mapping, "utf-8")
@@ -0,0 +1,251 @@
+"""Watching directory trees for changed files.
+
+On Linux, the kernel's inotify API is used through `ctypes`. Elsewhere,
+or if inotify is not available, files are polled for changed
+modification times.
+
+A watcher reports paths of files that were written, and paths of
+directories that appeared, in which case any file in the directory may
+be new.
+"""
+
+from __future__ import annotations
+
+from abc import ABC, abstractmethod
+from collections.abc import Callable, Iterable, Iterator, Sequence
+import logging
+import os
+from pathlib import Path
+import select
+import struct
+import sys
+import time
+from types import TracebackType
+
+from mdformat._conf import _file_signature
+
+LOGGER = logging.getLogger(__name__)
+
+# Flags and event masks of <sys/inotify.h>
+_IN_NONBLOCK = 0o4000
+_IN_CLOEXEC = 0o2000000
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_MOVE_SELF = 0x00000800
+_IN_Q_OVERFLOW = 0x00004000
+_IN_IGNORED = 0x00008000
+_IN_ONLYDIR = 0x01000000
+_IN_ISDIR = 0x40000000
+_WATCH_MASK = _IN_CLOSE_WRITE | _IN_MOVED_TO | _IN_CREATE | _IN_MOVE_SELF | _IN_ONLYDIR
+# struct inotify_event: wd, mask, cookie, len, followed by the name
+_EVENT = struct.Struct("iIII")
+
+
+class Watcher(ABC):
+    """Base class of watchers."""
+
+    @abstractmethod
+    def wait(self, timeout: float | None) -> set[Path]:
+        """Wait for changes, and return changed paths.
+
+        Return an empty set if there were no changes in `timeout`
+        seconds.
+        """
+
+    def close(self) -> None:
+        pass
+
+    def __enter__(self) -> Watcher:
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        self.close()
+
+    def batches(self, debounce: float) -> Iterator[set[Path]]:
+        """Yield sets of changed paths.
+
+        A set is yielded once there have been no changes for `debounce`
+        seconds, so that a burst of changes, e.g. an editor saving
+        several files, is reported at once.
+        """
+        while True:
+            changed = self.wait(None)
+            while True:
+                more = self.wait(debounce)
+                if not more:
+                    break
+                changed |= more
+            if changed:
+                yield changed
+
+
+class InotifyWatcher(Watcher):
+    """Watches directories using inotify.
+
+    Raise `OSError` if inotify is not available, or the root
+    directories cannot be watched, e.g. because the user's limit of
+    watches is reached. Files in `roots` are watched through their
+    parent directory.
+    """
+
+    def __init__(
+        self, roots: Sequence[Path], skip_dir: Callable[[Path], bool] | None = None
+    ) -> None:
+        import ctypes
+
+        if not sys.platform.startswith("linux"):
+            raise OSError("inotify is only available on Linux")
+        libc = ctypes.CDLL(None, use_errno=True)
+        if not hasattr(libc, "inotify_init1"):  # pragma: no cover
+            raise OSError("inotify is not available")
+        self._libc = libc
+        self._skip_dir = skip_dir
+        self._roots = list(roots)
+        fd = libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+        if fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+        self._fd = fd
+        # Watched directories by watch descriptor
+        self._dirs: dict[int, str] = {}
+        try:
+            for root in self._roots:
+                if root.is_dir():
+                    self._add_tree(str(root), strict=True)
+                else:
+                    self._add_watch(str(root.parent), strict=True)
+        except OSError:
+            self.close()
+            raise
+
+    def _add_watch(self, directory: str, *, strict: bool) -> None:
+        import ctypes
+
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(directory), _WATCH_MASK)
+        if wd < 0:
+            errno = ctypes.get_errno()
+            if strict:
+                raise OSError(errno, os.strerror(errno), directory)
+            # The directory may have been removed already
+            LOGGER.debug(f"Failed to watch {directory}: {os.strerror(errno)}")
+            return
+        self._dirs[wd] = directory
+
+    def _add_tree(self, directory: str, *, strict: bool = False) -> None:
+        dir_stack = [directory]
+        while dir_stack:
+            current = dir_stack.pop()
+            self._add_watch(current, strict=strict)
+            try:
+                with os.scandir(current) as it:
+                    subdirs = [e.path for e in it if e.is_dir(follow_symlinks=False)]
+            except OSError:
+                continue
+            if self._skip_dir is not None:
+                subdirs = [d for d in subdirs if not self._skip_dir(Path(d))]
+            dir_stack.extend(subdirs)
+
+    def wait(self, timeout: float | None) -> set[Path]:
+        ready, _, _ = select.select([self._fd], [], [], timeout)
+        if not ready:
+            return set()
+        try:
+            data = os.read(self._fd, 1 << 16)
+        except BlockingIOError:
+            return set()
+        return self._parse_events(data)
+
+    def _parse_events(self, data: bytes) -> set[Path]:
+        changed: set[str] = set()
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, name_len = _EVENT.unpack_from(data, offset)
+            offset += _EVENT.size
+            name = os.fsdecode(data[offset : offset + name_len].rstrip(b"\0"))
+            offset += name_len
+            if mask & _IN_Q_OVERFLOW:
+                # Events were lost. Report everything as changed.
+                changed.update(str(root) for root in self._roots)
+                continue
+            if mask & (_IN_IGNORED | _IN_MOVE_SELF):
+                # The directory was removed or moved away
+                if wd in self._dirs and not mask & _IN_IGNORED:
+                    self._libc.inotify_rm_watch(self._fd, wd)
+                self._dirs.pop(wd, None)
+                continue
+            directory = self._dirs.get(wd)
+            if directory is None:
+                continue
+            path = os.path.join(directory, name)
+            if mask & _IN_ISDIR:
+                if self._skip_dir is not None and self._skip_dir(Path(path)):
+                    continue
+                self._add_tree(path)
+            elif not mask & (_IN_CLOSE_WRITE | _IN_MOVED_TO):
+                # A file was created, it will be reported once written
+                continue
+            changed.add(path)
+        return {Path(p) for p in changed}
+
+    def close(self) -> None:
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+
+class PollingWatcher(Watcher):
+    """Watches files by comparing their modification time and size every
+    `interval` seconds.
+
+    `list_files` returns the files to watch. It is called on every poll,
+    so that new files are noticed.
+    """
+
+    def __init__(
+        self, list_files: Callable[[], Iterable[Path]], interval: float = 0.5
+    ) -> None:
+        self._list_files = list_files
+        self._interval = interval
+        self._signatures = self._scan()
+
+    def _scan(self) -> dict[Path, tuple[int, int] | None]:
+        return {path: _file_signature(path) for path in self._list_files()}
+
+    def wait(self, timeout: float | None) -> set[Path]:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            signatures = self._scan()
+            changed = {
+                path
+                for path, signature in signatures.items()
+                if signature is not None and self._signatures.get(path) != signature
+            }
+            self._signatures = signatures
+            if changed:
+                return changed
+            if deadline is None:
+                time.sleep(self._interval)
+                continue
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return set()
+            time.sleep(min(self._interval, remaining))
+
+
+def make_watcher(
+    roots: Sequence[Path],
+    skip_dir: Callable[[Path], bool] | None,
+    list_files: Callable[[], Iterable[Path]],
+) -> Watcher:
+    """Return an inotify watcher if possible, else a polling watcher."""
+    try:
+        return InotifyWatcher(roots, skip_dir)
+    except OSError as e:
+        LOGGER.debug(f"Falling back to polling for changes: {e}")
+        return PollingWatcher(list_files)
@@ -0,0 +1,204 @@
+from __future__ import annotations
+
+from collections.abc import Callable
+from concurrent.futures import Executor, Future
+import multiprocessing
+from multiprocessing.connection import Connection
+from multiprocessing.context import BaseContext
+from multiprocessing.reduction import ForkingPickler
+import queue
+import threading
+from typing import Any, TypeVar
+
+_T = TypeVar("_T")
+
+# A task: a future to resolve, a function to call and its arguments
+_Task = tuple[Future, Callable[..., Any], tuple[Any, ...], dict[str, Any]]
+
+
+def _worker_main(conn: Connection) -> None:  # noqa: C901
+    """Run tasks received from `conn` until receiving `None`."""
+    while True:
+        try:
+            data = conn.recv_bytes()
+        except EOFError:
+            return
+        try:
+            msg = ForkingPickler.loads(data)
+        except Exception as e:  # E.g. the function is not importable
+            conn.send((False, RuntimeError(f"Could not unpickle task: {e!r}")))
+            continue
+        if msg is None:
+            return
+        fn, args, kwargs = msg
+        try:
+            response = (True, fn(*args, **kwargs))
+        except Exception as e:
+            response = (False, e)
+        try:
+            conn.send(response)
+        except Exception as e:  # Result or exception is not picklable
+            conn.send((False, RuntimeError(repr(e))))
+
+
+class _Worker:
+    """A worker process, and a thread feeding tasks to it.
+
+    The process is spawned on first task, and respawned if a task times
+    out or the process dies.
+    """
+
+    def __init__(
+        self,
+        tasks: queue.SimpleQueue[_Task | None],
+        timeout: float | None,
+        mp_context: BaseContext,
+    ) -> None:
+        self._tasks = tasks
+        self._timeout = timeout
+        self._mp_context = mp_context
+        self._process: Any = None
+        self._conn: Connection | None = None
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _spawn(self) -> Connection:
+        parent_conn, child_conn = self._mp_context.Pipe()
+        self._process = self._mp_context.Process(  # type: ignore[attr-defined]
+            target=_worker_main, args=(child_conn,), daemon=True
+        )
+        self._process.start()
+        child_conn.close()
+        self._conn = parent_conn
+        return parent_conn
+
+    def _kill(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+        if self._process is not None:
+            self._process.kill()
+            self._process.join()
+            self._process = None
+
+    def _run(self) -> None:
+        while True:
+            task = self._tasks.get()
+            if task is None:
+                break
+            future, fn, args, kwargs = task
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                data = bytes(ForkingPickler.dumps((fn, args, kwargs)))
+            except Exception as e:
+                # Only this task is broken, the worker process is not
+                future.set_exception(e)
+                continue
+            try:
+                ok, value = self._call(data)
+            except BaseException as e:
+                self._kill()
+                future.set_exception(e)
+                continue
+            if ok:
+                future.set_result(value)
+            else:
+                future.set_exception(value)
+        self._stop()
+
+    def _call(self, data: bytes) -> tuple[bool, Any]:
+        """Send a pickled task to the worker process, and receive its
+        result."""
+        conn = self._conn or self._spawn()
+        try:
+            conn.send_bytes(data)
+            if conn.poll(self._timeout):
+                return conn.recv()
+        except (EOFError, OSError) as e:
+            raise RuntimeError("Worker process died") from e
+        raise TimeoutError(f"Task did not finish in {self._timeout} seconds")
+
+    def _stop(self) -> None:
+        if self._conn is None:
+            return
+        try:
+            self._conn.send(None)
+        except OSError:  # pragma: no cover
+            pass
+        assert self._process is not None
+        self._process.join(1)
+        self._kill()
+
+
+def _default_context() -> BaseContext:
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("forkserver")
+    return multiprocessing.get_context("spawn")
+
+
+class IsolatedExecutor(Executor):
+    """An executor that runs tasks in persistent worker processes.
+
+    Worker processes are reused across tasks. A task that does not
+    finish in `timeout` seconds fails with `TimeoutError`, and its
+    worker process is killed and replaced with a new one.
+
+    Unlike `concurrent.futures.ProcessPoolExecutor`, a task that crashes
+    or hangs its worker only fails that task, not the whole executor.
+
+    Worker processes are started with the "forkserver" start method
+    where available, and "spawn" elsewhere, so that they are not forked
+    from the multithreaded parent process. Functions and their arguments
+    must be picklable, and functions importable.
+    """
+
+    def __init__(
+        self,
+        max_workers: int,
+        *,
+        timeout: float | None = None,
+        mp_context: BaseContext | None = None,
+    ) -> None:
+        if max_workers < 1:
+            raise ValueError("max_workers must be greater than 0")
+        self._max_workers = max_workers
+        self._timeout = timeout
+        self._mp_context = mp_context or _default_context()
+        self._tasks: queue.SimpleQueue[_Task | None] = queue.SimpleQueue()
+        self._workers: list[_Worker] = []
+        self._lock = threading.Lock()
+        self._shutdown = False
+
+    def submit(self, fn: Callable[..., _T], /, *args: Any, **kwargs: Any) -> Future[_T]:
+        with self._lock:
+            if self._shutdown:
+                raise RuntimeError("cannot schedule new futures after shutdown")
+            future: Future[_T] = Future()
+            self._tasks.put((future, fn, args, kwargs))
+            # Start workers lazily, so that no processes are spawned
+            # if there is nothing to format.
+            if len(self._workers) < self._max_workers:
+                self._workers.append(
+                    _Worker(self._tasks, self._timeout, self._mp_context)
+                )
+            return future
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False) -> None:
+        with self._lock:
+            if self._shutdown:
+                return
+            self._shutdown = True
+            if cancel_futures:
+                while True:
+                    try:
+                        task = self._tasks.get_nowait()
+                    except queue.Empty:
+                        break
+                    if task is not None:
+                        task[0].cancel()
+            for _ in self._workers:
+                self._tasks.put(None)
+        if wait:
+            for worker in self._workers:
+                worker.thread.join()
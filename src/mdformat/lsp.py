@@ -0,0 +1,402 @@
+"""A Language Server Protocol server that formats Markdown documents.
+
+Run the server with `mdformat-lsp` or `python -m mdformat.lsp`. It
+talks JSON-RPC over stdio, and implements `textDocument/formatting` and
+`textDocument/rangeFormatting` for documents the client has opened.
+
+Configuration is read from `.mdformat.toml` files the way the CLI reads
+it. A formatting pipeline is built once per configuration file and
+reused until the file changes. Formatting runs in a worker thread so
+that the server keeps reading messages. A request is answered with an
+error instead of text edits if it is cancelled, or if the document is
+changed before the edits are sent. Formatting of a document is not
+interrupted, so a request cancelled while it is being formatted is
+answered with an error once formatting finishes.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Mapping
+import difflib
+import json
+import os
+from pathlib import Path
+import queue
+import re
+import sys
+import threading
+from typing import IO, Any
+from urllib.parse import urlparse
+from urllib.request import url2pathname
+
+import mdformat
+from mdformat._api import LineRange
+from mdformat._cli import (
+    FormatPipeline,
+    build_pipeline,
+    is_excluded,
+    merge_opts,
+    renders_equal,
+)
+from mdformat._conf import InvalidConfError, invalidate_stale_toml_opts, read_toml_opts
+from mdformat._util import detect_newline_type
+import mdformat.renderer
+
+# JSON-RPC and LSP error codes
+_PARSE_ERROR = -32700
+_INVALID_REQUEST = -32600
+_METHOD_NOT_FOUND = -32601
+_INVALID_PARAMS = -32602
+_REQUEST_CANCELLED = -32800
+_CONTENT_MODIFIED = -32801
+_REQUEST_FAILED = -32803
+
+_FORMATTING_METHODS = frozenset(
+    {"textDocument/formatting", "textDocument/rangeFormatting"}
+)
+# Full document sync
+_TEXT_DOCUMENT_SYNC_FULL = 1
+
+# Line endings recognized by LSP are "\n", "\r\n" and "\r"
+_LINE = re.compile(r"[^\r\n]*(?:\r\n?|\n)|[^\r\n]+")
+
+
+class _ResponseError(Exception):
+    def __init__(self, code: int, message: str) -> None:
+        super().__init__(message)
+        self.code = code
+        self.message = message
+
+
+def _split_lines(text: str) -> list[str]:
+    """Split text to lines, keeping line endings."""
+    return _LINE.findall(text)
+
+
+def _utf16_len(text: str) -> int:
+    return len(text.encode("utf-16-le")) // 2
+
+
+def _position(lines: list[str], index: int) -> dict:
+    """Return the LSP position of the start of line `index`.
+
+    If `index` is past the last line, and the last line has no line
+    ending, return the position of the end of the last line.
+    """
+    if index < len(lines) or not lines or lines[-1].endswith(("\n", "\r")):
+        return {"line": index, "character": 0}
+    return {"line": len(lines) - 1, "character": _utf16_len(lines[-1])}
+
+
+def text_edits(original: str, formatted: str) -> list[dict]:
+    """Return LSP text edits that change `original` to `formatted`.
+
+    Edits replace whole lines, and only lines that changed.
+    """
+    old_lines = _split_lines(original)
+    new_lines = _split_lines(formatted)
+    matcher = difflib.SequenceMatcher(None, old_lines, new_lines, autojunk=False)
+    return [
+        {
+            "range": {
+                "start": _position(old_lines, i1),
+                "end": _position(old_lines, i2),
+            },
+            "newText": "".join(new_lines[j1:j2]),
+        }
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes()
+        if tag != "equal"
+    ]
+
+
+def _line_range(lsp_range: Mapping) -> LineRange:
+    """Convert an LSP range to an inclusive, 1-based range of lines.
+
+    A range that ends at the start of a line does not include the line.
+    """
+    start = lsp_range["start"]["line"]
+    end = lsp_range["end"]
+    end_line = (
+        end["line"]
+        if end["character"] == 0 and end["line"] > start
+        else end["line"] + 1
+    )
+    return start + 1, end_line
+
+
+def _uri_to_path(uri: str) -> Path | None:
+    """Return the path of a "file" URI, or `None` for other URIs."""
+    parsed = urlparse(uri)
+    if parsed.scheme != "file":
+        return None
+    return Path(os.path.abspath(url2pathname(parsed.path)))
+
+
+class LanguageServer:
+    """A language server reading messages from `reader` and writing
+    messages to `writer`."""
+
+    def __init__(self, reader: IO[bytes], writer: IO[bytes]) -> None:
+        self._reader = reader
+        self._writer = writer
+        self._write_lock = threading.Lock()
+        # Text and version of open documents by URI
+        self._documents: dict[str, tuple[str, int]] = {}
+        # Formatting requests, and the document version they were made for
+        self._requests: queue.Queue[tuple[dict, int] | None] = queue.Queue()
+        # IDs of queued formatting requests, and of those cancelled. Both
+        # the reader and the worker thread access them, holding `_ids_lock`.
+        self._ids_lock = threading.Lock()
+        self._pending_ids: set[int | str] = set()
+        self._cancelled_ids: set[int | str] = set()
+        # Pipelines by configuration file path, and the options they were
+        # built from
+        self._pipelines: dict[Path | None, tuple[Mapping, FormatPipeline]] = {}
+        self._codeformatter_cache = mdformat.renderer.CodeFormatterCache()
+        self._shutdown = False
+
+    def serve(self) -> int:
+        """Serve until the client sends an "exit" notification or closes
+        the stream.
+
+        Return the exit code the server should exit with.
+        """
+        worker = threading.Thread(target=self._work, daemon=True)
+        worker.start()
+        try:
+            while True:
+                message = self._read_message()
+                if message is None or message.get("method") == "exit":
+                    break
+                self.handle(message)
+        finally:
+            self._requests.put(None)
+            worker.join()
+        return 0 if self._shutdown else 1
+
+    def _read_content_length(self) -> int | None:
+        """Read headers of a message, and return its content length.
+
+        Return `None` at the end of the stream.
+        """
+        content_length = -1
+        while True:
+            line = self._reader.readline()
+            if not line:
+                return None
+            line = line.strip()
+            if not line:
+                return content_length
+            name, _, value = line.partition(b":")
+            if name.strip().lower() == b"content-length":
+                content_length = int(value)
+
+    def _read_message(self) -> dict | None:
+        """Read a message, or return `None` at the end of the stream."""
+        while True:
+            content_length = self._read_content_length()
+            if content_length is None:
+                return None
+            if content_length < 0:
+                continue
+            body = self._reader.read(content_length)
+            if len(body) < content_length:
+                return None
+            try:
+                message = json.loads(body)
+            except ValueError as e:
+                self._send_error(None, _PARSE_ERROR, f"Invalid JSON: {e}")
+                continue
+            if isinstance(message, dict):
+                return message
+            self._send_error(None, _INVALID_REQUEST, "Message is not an object")
+
+    def _send(self, message: dict) -> None:
+        body = json.dumps({"jsonrpc": "2.0", **message}).encode()
+        with self._write_lock:
+            self._writer.write(b"Content-Length: %d\r\n\r\n" % len(body) + body)
+            self._writer.flush()
+
+    def _respond(self, msg_id: int | str, result: Any) -> None:
+        self._send({"id": msg_id, "result": result})
+
+    def _send_error(self, msg_id: int | str | None, code: int, message: str) -> None:
+        self._send({"id": msg_id, "error": {"code": code, "message": message}})
+
+    def handle(self, message: dict) -> None:
+        """Handle a message read from the client.
+
+        Formatting requests are queued for the worker thread. Other
+        messages are handled immediately.
+        """
+        method = message.get("method")
+        if method is None:
+            # A response. The server sends no requests to the client.
+            return
+        is_request = "id" in message
+        try:
+            result = self._handle_method(message, method, is_request)
+        except (KeyError, TypeError) as e:
+            if is_request:
+                self._send_error(
+                    message["id"], _INVALID_PARAMS, f"Invalid params: {e!r}"
+                )
+        except _ResponseError as e:
+            if is_request:
+                self._send_error(message["id"], e.code, e.message)
+        else:
+            if is_request and method not in _FORMATTING_METHODS:
+                self._respond(message["id"], result)
+
+    def _handle_method(  # noqa: C901
+        self, message: dict, method: str, is_request: bool
+    ) -> Any:
+        params = message.get("params") or {}
+        if method == "$/cancelRequest":
+            with self._ids_lock:
+                if params["id"] in self._pending_ids:
+                    self._cancelled_ids.add(params["id"])
+        elif method == "textDocument/didOpen":
+            doc = params["textDocument"]
+            self._documents[doc["uri"]] = (doc["text"], doc["version"])
+        elif method == "textDocument/didChange":
+            doc = params["textDocument"]
+            # With full document sync, the last change has the whole text
+            text = params["contentChanges"][-1]["text"]
+            self._documents[doc["uri"]] = (text, doc["version"])
+        elif method == "textDocument/didClose":
+            self._documents.pop(params["textDocument"]["uri"], None)
+        elif not is_request:
+            pass
+        elif self._shutdown:
+            raise _ResponseError(_INVALID_REQUEST, "Server is shutting down")
+        elif method == "initialize":
+            return {
+                "capabilities": {
+                    "textDocumentSync": {
+                        "openClose": True,
+                        "change": _TEXT_DOCUMENT_SYNC_FULL,
+                    },
+                    "documentFormattingProvider": True,
+                    "documentRangeFormattingProvider": True,
+                },
+                "serverInfo": {"name": "mdformat", "version": mdformat.__version__},
+            }
+        elif method == "shutdown":
+            self._shutdown = True
+        elif method in _FORMATTING_METHODS:
+            uri = params["textDocument"]["uri"]
+            if uri not in self._documents:
+                raise _ResponseError(_INVALID_PARAMS, f"Document {uri} is not open")
+            with self._ids_lock:
+                self._pending_ids.add(message["id"])
+            self._requests.put((message, self._documents[uri][1]))
+        else:
+            raise _ResponseError(_METHOD_NOT_FOUND, f"Unknown method {method!r}")
+        return None
+
+    def _work(self) -> None:
+        while True:
+            item = self._requests.get()
+            if item is None:
+                return
+            self._process(*item)
+
+    def _check_cancelled(self, msg_id: int | str) -> None:
+        """Raise an error if the request has been cancelled."""
+        with self._ids_lock:
+            if msg_id in self._cancelled_ids:
+                raise _ResponseError(_REQUEST_CANCELLED, "Request cancelled")
+
+    def _process(self, message: dict, version: int) -> None:
+        """Answer a queued formatting request."""
+        msg_id = message["id"]
+        try:
+            self._check_cancelled(msg_id)
+            edits = self._format(message["method"], message["params"], version)
+            # The client may have given up while formatting was running
+            self._check_cancelled(msg_id)
+        except _ResponseError as e:
+            self._send_error(msg_id, e.code, e.message)
+        except Exception as e:
+            self._send_error(msg_id, _REQUEST_FAILED, f"Formatting failed: {e!r}")
+        else:
+            self._respond(msg_id, edits)
+        finally:
+            with self._ids_lock:
+                self._pending_ids.discard(msg_id)
+                self._cancelled_ids.discard(msg_id)
+
+    def _check_version(self, uri: str, version: int) -> str:
+        """Return text of the document.
+
+        Raise an error if the document has changed since `version`.
+        """
+        text, current_version = self._documents.get(uri, ("", None))
+        if current_version != version:
+            raise _ResponseError(_CONTENT_MODIFIED, "Document changed")
+        return text
+
+    def _pipeline(self, path: Path | None) -> tuple[FormatPipeline, Path | None]:
+        """Return the pipeline of the configuration that applies to
+        `path`, and the configuration file path."""
+        try:
+            toml_opts, toml_path = read_toml_opts(path.parent if path else Path.cwd())
+        except InvalidConfError as e:
+            raise _ResponseError(_REQUEST_FAILED, f"Invalid configuration: {e}")
+        cached = self._pipelines.get(toml_path)
+        # `read_toml_opts` returns new options once the file changes
+        if cached is not None and cached[0] is toml_opts:
+            return cached[1], toml_path
+        pipeline = build_pipeline(
+            merge_opts(toml_opts, {"check": False}, {}),
+            None,
+            self._codeformatter_cache,
+        )
+        if pipeline is None:
+            raise _ResponseError(
+                _REQUEST_FAILED,
+                "A plugin required by the configuration is not installed",
+            )
+        self._pipelines[toml_path] = toml_opts, pipeline
+        return pipeline, toml_path
+
+    def _format(self, method: str, params: Mapping, version: int) -> list[dict]:
+        uri = params["textDocument"]["uri"]
+        text = self._check_version(uri, version)
+        path = _uri_to_path(uri)
+        invalidate_stale_toml_opts()
+        pipeline, toml_path = self._pipeline(path)
+        opts = pipeline.opts
+        if is_excluded(path, opts["exclude"], toml_path, False):
+            return []
+
+        lines = None
+        if method == "textDocument/rangeFormatting":
+            lines = [_line_range(params["range"])]
+        formatted = pipeline.formatter.text(
+            text, lines=lines, _filename=str(path) if path else uri
+        )
+        formatted = formatted.replace(
+            "\n", detect_newline_type(text, opts["end_of_line"])
+        )
+        # Do not spend time validating if the user kept typing
+        self._check_version(uri, version)
+        if not renders_equal(pipeline, text, formatted):
+            raise _ResponseError(
+                _REQUEST_FAILED,
+                "Formatted Markdown renders to different HTML than input Markdown",
+            )
+        return text_edits(text, formatted)
+
+
+def main() -> int:
+    reader = sys.stdin.buffer
+    writer = sys.stdout.buffer
+    # Anything printed by plugins must not end up in the message stream
+    sys.stdout = sys.stderr
+    return LanguageServer(reader, writer).serve()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
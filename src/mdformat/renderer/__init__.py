@@ -6,7 +6,11 @@ __all__ = (
     "RenderTreeNode",
     "DEFAULT_RENDERERS",
     "RenderContext",
+    "RenderMemo",
+    "BlockMemo",
+    "CodeFormatterCache",
     "WRAP_POINT",
+    "pure_render",
 )
 
 from collections.abc import Mapping, MutableMapping, Sequence
@@ -17,7 +21,9 @@ from typing import Any
 
 from markdown_it.token import Token
 
+from mdformat.renderer._codeformatters import CodeFormatterCache, preformat_code_blocks
 from mdformat.renderer._context import DEFAULT_RENDERERS, WRAP_POINT, RenderContext
+from mdformat.renderer._memo import BlockMemo, RenderMemo, pure_render
 from mdformat.renderer._tree import RenderTreeNode
 from mdformat.renderer.typing import Postprocess
 
@@ -65,7 +71,45 @@ class MDRenderer:
         finalize: bool = True,
     ) -> str:
         self._prepare_env(env)
+        render_context = self._make_context(options, env)
+        preformat_code_blocks(tree, options, env)
+        text = tree.render(render_context)
+        self._log_memo_stats(options)
+        if finalize:
+            if env["used_refs"]:
+                text += "\n\n"
+                text += self._write_references(env)
+            if text:
+                text += "\n"
+
+        assert "\x00" not in text, "null bytes should be removed by now"
+        return text
+
+    def render_blocks(
+        self,
+        blocks: Sequence[RenderTreeNode],
+        options: Mapping[str, Any],
+        env: MutableMapping,
+    ) -> list[str]:
+        """Render top-level blocks of a tree separately.
 
+        Return a rendering of each block, without a trailing newline.
+        Link reference definitions are not written, so they are all
+        treated as used and kept in the source.
+        """
+        self._prepare_env(env)
+        env["used_refs"].update(env.get("references", ()))
+        render_context = self._make_context(options, env)
+        subtree = RenderTreeNode()
+        subtree.children = list(blocks)
+        preformat_code_blocks(subtree, options, env)
+        texts = [block.render(render_context) for block in blocks]
+        self._log_memo_stats(options)
+        return texts
+
+    def _make_context(
+        self, options: Mapping[str, Any], env: MutableMapping
+    ) -> RenderContext:
         # Update RENDERER_MAP defaults with renderer functions defined
         # by plugins.
         updated_renderers = {}
@@ -84,20 +128,27 @@ class MDRenderer:
                     postprocessors[syntax_name] = (pp,)
                 else:
                     postprocessors[syntax_name] += (pp,)
-        renderer_map = MappingProxyType({**DEFAULT_RENDERERS, **updated_renderers})
+        renderer_map = {**DEFAULT_RENDERERS, **updated_renderers}
+        memo: RenderMemo | None = options.get("render_memo")
+        if memo is not None:
+            renderer_map = {k: memo.wrap(v) for k, v in renderer_map.items()}
+        block_memo: BlockMemo | None = options.get("block_memo")
+        if block_memo is not None and "root" not in updated_renderers:
+            renderer_map["root"] = block_memo.wrap_root(renderer_map["root"])
         postprocessor_map = MappingProxyType(postprocessors)
 
-        render_context = RenderContext(renderer_map, postprocessor_map, options, env)
-        text = tree.render(render_context)
-        if finalize:
-            if env["used_refs"]:
-                text += "\n\n"
-                text += self._write_references(env)
-            if text:
-                text += "\n"
+        return RenderContext(
+            MappingProxyType(renderer_map), postprocessor_map, options, env
+        )
 
-        assert "\x00" not in text, "null bytes should be removed by now"
-        return text
+    @staticmethod
+    def _log_memo_stats(options: Mapping[str, Any]) -> None:
+        memo: RenderMemo | None = options.get("render_memo")
+        if memo is not None:
+            LOGGER.debug(
+                f"Render memo: {memo.hits} hits, {memo.misses} misses"
+                f" ({memo.hit_rate:.1%} hit rate)"
+            )
 
     @staticmethod
     def _write_references(env: MutableMapping) -> str:
@@ -0,0 +1,396 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+from collections.abc import Callable, Mapping, MutableMapping, Sequence
+from concurrent.futures import Executor
+import hashlib
+import logging
+import os
+from pathlib import Path
+import tempfile
+from typing import TYPE_CHECKING, Any, Union
+
+import mdformat.plugins
+
+if TYPE_CHECKING:
+    from mdformat.renderer import RenderTreeNode
+
+# A key identifying a code formatting job: (language, info string, code)
+CodeKey = tuple[str, str, str]
+# Formatted code, or the exception raised by the code formatter
+CodeResult = Union[str, Exception]
+
+_RESULTS_ENV_KEY = "formatted_code"
+
+LOGGER = logging.getLogger(__name__)
+
+
+def info_and_lang(node: RenderTreeNode) -> tuple[str, str]:
+    """Return stripped info string and language of a code block node."""
+    info_str = node.info.strip()
+    lang = info_str.split(maxsplit=1)[0] if info_str else ""
+    return info_str, lang
+
+
+def preformat_code_blocks(  # noqa: C901
+    tree: RenderTreeNode, options: Mapping[str, Any], env: MutableMapping
+) -> None:
+    """Format code blocks of a document before rendering it.
+
+    All blocks of a code formatter that has a `format_batch` attribute
+    are formatted in one batch call. If `options["codeformatter_executor"]`
+    is set, batches and all other blocks are submitted to it, and
+    formatted concurrently. If the executor fails a batch, e.g. because
+    it timed out, its blocks are submitted again one by one. Blocks with a result in
+    `options["codeformatter_cache"]` are not formatted again.
+
+    The results are stored in `env` for `format_code` to find.
+    """
+    executor: Executor | None = options.get("codeformatter_executor")
+    codeformatters: Mapping[str, Callable[[str, str], str]] = options.get(
+        "codeformatters", {}
+    )
+    if not codeformatters or (
+        executor is None
+        and not any(hasattr(f, "format_batch") for f in codeformatters.values())
+    ):
+        return
+    cache: CodeFormatterCache | None = options.get("codeformatter_cache")
+
+    results: dict[CodeKey, CodeResult] = {}
+    jobs: list[tuple[Callable[[str, str], str], list[CodeKey]]] = []
+    batches: dict[Callable[[str, str], str], list[CodeKey]] = {}
+    seen: set[CodeKey] = set()
+    for node in tree.walk():
+        if node.type not in {"fence", "code_block"}:
+            continue
+        info_str, lang = info_and_lang(node)
+        fmt_func = codeformatters.get(lang)
+        if fmt_func is None:
+            continue
+        key = (lang, info_str, node.content)
+        if key in seen:
+            continue
+        seen.add(key)
+        if cache is not None:
+            try:
+                results[key] = cache.get(fmt_func, key)
+                continue
+            except KeyError:
+                pass
+        if hasattr(fmt_func, "format_batch"):
+            if fmt_func not in batches:
+                batches[fmt_func] = []
+                jobs.append((fmt_func, batches[fmt_func]))
+            batches[fmt_func].append(key)
+        elif executor is not None:
+            jobs.append((fmt_func, [key]))
+
+    # Results of each job, and whether they came from the code formatter
+    outputs: list[
+        tuple[Callable[[str, str], str], list[CodeKey], list[CodeResult], bool]
+    ] = []
+    if executor is None:
+        outputs = [
+            (fmt_func, keys, _format_blocks(fmt_func, keys), True)
+            for fmt_func, keys in jobs
+        ]
+    else:
+        pending = [
+            (fmt_func, keys, executor.submit(_format_blocks, fmt_func, keys))
+            for fmt_func, keys in jobs
+        ]
+        while pending:
+            retries = []
+            for fmt_func, keys, future in pending:
+                try:
+                    outputs.append((fmt_func, keys, future.result(), True))
+                except Exception as e:
+                    # The executor failed, e.g. the task timed out, its
+                    # worker process died, or it could not be pickled. If
+                    # the task was a batch, retry its blocks one per task,
+                    # so that only the blocks that fail on their own fail.
+                    if len(keys) == 1:
+                        outputs.append((fmt_func, keys, [e], False))
+                        continue
+                    retries += [
+                        (
+                            fmt_func,
+                            [key],
+                            executor.submit(_format_blocks, fmt_func, [key]),
+                        )
+                        for key in keys
+                    ]
+            pending = retries
+
+    for fmt_func, keys, job_results, from_formatter in outputs:
+        for key, result in zip(keys, job_results):
+            results[key] = result
+            # Do not cache failures of the executor. The next run may
+            # succeed.
+            if cache is not None and from_formatter:
+                cache.set(fmt_func, key, result)
+    env[_RESULTS_ENV_KEY] = results
+
+
+def _format_blocks(
+    fmt_func: Callable[[str, str], str], keys: Sequence[CodeKey]
+) -> list[CodeResult]:
+    """Format code blocks using `fmt_func`.
+
+    Use a single call to `fmt_func.format_batch` if it exists. Fall back
+    to formatting blocks one by one if the batch call fails.
+    """
+    format_batch = getattr(fmt_func, "format_batch", None)
+    if format_batch is not None:
+        try:
+            formatted: list[CodeResult] = list(
+                format_batch([(code, info_str) for _, info_str, code in keys])
+            )
+        except Exception as e:
+            LOGGER.debug(f"Batch code formatting failed: {e!r}")
+        else:
+            if len(formatted) == len(keys):
+                return formatted
+            LOGGER.debug(
+                f"Batch code formatter returned {len(formatted)} results "
+                f"for {len(keys)} code blocks"
+            )
+
+    results: list[CodeResult] = []
+    for _, info_str, code in keys:
+        try:
+            results.append(fmt_func(code, info_str))
+        except Exception as e:
+            results.append(e)
+    return results
+
+
+def format_code(
+    fmt_func: Callable[[str, str], str],
+    lang: str,
+    info_str: str,
+    code: str,
+    options: Mapping[str, Any],
+    env: Mapping,
+) -> str:
+    """Format code using `fmt_func`.
+
+    Return a result of `preformat_code_blocks` or a result cached in
+    `options["codeformatter_cache"]` if one exists. Raise the exception
+    of the code formatter if formatting failed.
+    """
+    results: Mapping[CodeKey, CodeResult] = env.get(_RESULTS_ENV_KEY, {})
+    key = (lang, info_str, code)
+    if key in results:
+        result = results[key]
+    else:
+        result = _format_code_cached(fmt_func, key, options.get("codeformatter_cache"))
+    if isinstance(result, Exception):
+        # The exception may be cached and raised again for later
+        # documents. Drop its traceback, so that frames of earlier raises,
+        # and the render trees they reference, do not pile up on it.
+        raise result.with_traceback(None)
+    return result
+
+
+def _format_code_cached(
+    fmt_func: Callable[[str, str], str],
+    key: CodeKey,
+    cache: CodeFormatterCache | None,
+) -> CodeResult:
+    if cache is None:
+        return fmt_func(key[2], key[1])
+    try:
+        return cache.get(fmt_func, key)
+    except KeyError:
+        pass
+    result: CodeResult
+    try:
+        result = fmt_func(key[2], key[1])
+    except Exception as e:
+        result = e
+    cache.set(fmt_func, key, result)
+    return result
+
+
+def _formatter_id(lang: str, fmt_func: Callable[[str, str], str]) -> str:
+    """Return a string identifying a code formatter and its version."""
+    func_name = (
+        f"{getattr(fmt_func, '__module__', '')}."
+        f"{getattr(fmt_func, '__qualname__', type(fmt_func).__qualname__)}"
+    )
+    for dist_name, (version, langs) in mdformat.plugins._CODEFORMATTER_DISTS.items():
+        if lang in langs:
+            return f"{dist_name}=={version}:{func_name}"
+    return func_name
+
+
+class CodeFormatterCache:
+    """A cache of code formatter results.
+
+    Results are keyed by code formatter distribution version, language,
+    info string and code. Exceptions raised by a code formatter are
+    cached too, so that formatting invalid code is not retried.
+
+    Results are held in an in-memory LRU cache of `maxsize` entries. If
+    `directory` is given, results are also persisted there, and the
+    least recently used files are evicted once the total size of the
+    store exceeds `max_disk_size` bytes.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 1024,
+        directory: str | os.PathLike[str] | None = None,
+        max_disk_size: int = 64 * 1024 * 1024,
+    ) -> None:
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._cache: OrderedDict[tuple[str, str, str, str], CodeResult] = OrderedDict()
+        self._formatter_ids: dict[tuple[str, Callable[[str, str], str]], str] = {}
+        self._disk = (
+            None
+            if directory is None
+            else _DiskStore(Path(directory) / _DISK_STORE_NAME, max_disk_size)
+        )
+
+    def get(self, fmt_func: Callable[[str, str], str], key: CodeKey) -> CodeResult:
+        """Return a cached result.
+
+        Raise `KeyError` if there is none.
+        """
+        cache_key = self._cache_key(fmt_func, key)
+        try:
+            result = self._cache[cache_key]
+        except KeyError:
+            data = None if self._disk is None else self._disk.get(cache_key)
+            if data is None:
+                self.misses += 1
+                raise
+            result = _decode_result(data)
+            self._store_in_memory(cache_key, result)
+        else:
+            self._cache.move_to_end(cache_key)
+        self.hits += 1
+        return result
+
+    def set(
+        self, fmt_func: Callable[[str, str], str], key: CodeKey, result: CodeResult
+    ) -> None:
+        """Cache the result of formatting `key` with `fmt_func`."""
+        cache_key = self._cache_key(fmt_func, key)
+        self._store_in_memory(cache_key, result)
+        if self._disk is not None:
+            self._disk.set(cache_key, _encode_result(result))
+
+    def _cache_key(
+        self, fmt_func: Callable[[str, str], str], key: CodeKey
+    ) -> tuple[str, str, str, str]:
+        lang = key[0]
+        try:
+            formatter_id = self._formatter_ids[(lang, fmt_func)]
+        except KeyError:
+            formatter_id = _formatter_id(lang, fmt_func)
+            self._formatter_ids[(lang, fmt_func)] = formatter_id
+        return (formatter_id, *key)
+
+    def _store_in_memory(
+        self, cache_key: tuple[str, str, str, str], result: CodeResult
+    ) -> None:
+        self._cache[cache_key] = result
+        if len(self._cache) > self.maxsize:
+            self._cache.popitem(last=False)
+
+
+# Name of the on-disk store directory. Bump the version if the file
+# format changes.
+_DISK_STORE_NAME = "codeformatter-v1"
+_OK_PREFIX = b"+"
+_ERROR_PREFIX = b"-"
+
+
+def _encode_result(result: CodeResult) -> bytes:
+    if isinstance(result, Exception):
+        return _ERROR_PREFIX + f"{type(result).__name__}: {result}".encode()
+    return _OK_PREFIX + result.encode()
+
+
+def _decode_result(data: bytes) -> CodeResult:
+    if data.startswith(_ERROR_PREFIX):
+        return CachedCodeFormatterError(data[1:].decode())
+    return data[1:].decode()
+
+
+class CachedCodeFormatterError(Exception):
+    """A code formatter error loaded from the on-disk cache."""
+
+
+class _DiskStore:
+    """A directory of files, one per cached code formatter result.
+
+    File modification time is updated on read and used to evict the
+    least recently used files.
+    """
+
+    def __init__(self, directory: Path, max_size: int) -> None:
+        self._directory = directory
+        self._max_size = max_size
+        self._size: int | None = None
+
+    def _path(self, cache_key: tuple[str, ...]) -> Path:
+        digest = hashlib.sha256("\0".join(cache_key).encode()).hexdigest()
+        return self._directory / digest
+
+    def get(self, cache_key: tuple[str, ...]) -> bytes | None:
+        path = self._path(cache_key)
+        try:
+            data = path.read_bytes()
+            os.utime(path)
+        except OSError:
+            return None
+        return data
+
+    def set(self, cache_key: tuple[str, ...], data: bytes) -> None:
+        path = self._path(cache_key)
+        try:
+            self._directory.mkdir(parents=True, exist_ok=True)
+            if self._size is None:
+                self._size = self._total_size()
+            fd, tmp_path = tempfile.mkstemp(dir=self._directory, prefix=".tmp-")
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            LOGGER.debug(f"Failed to write code formatter cache: {e}")
+            return
+        self._size += len(data)
+        if self._size > self._max_size:
+            self._evict()
+
+    def _entries(self) -> list[os.DirEntry[str]]:
+        with os.scandir(self._directory) as it:
+            return [e for e in it if e.is_file() and not e.name.startswith(".")]
+
+    def _total_size(self) -> int:
+        return sum(e.stat().st_size for e in self._entries())
+
+    def _evict(self) -> None:
+        """Remove least recently used files until the store is at most 80%
+        of the maximum size."""
+        entries = sorted(
+            ((e.stat(), e.path) for e in self._entries()),
+            key=lambda item: item[0].st_mtime,
+        )
+        size = sum(stat.st_size for stat, _ in entries)
+        target = self._max_size * 4 // 5
+        for stat, path in entries:
+            if size <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            size -= stat.st_size
+        self._size = size
@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 from collections import defaultdict
-from collections.abc import Generator, Iterable, Mapping, MutableMapping
+from collections.abc import Generator, Hashable, Iterable, Mapping, MutableMapping
 from contextlib import contextmanager
 import functools
 import logging
@@ -14,6 +14,8 @@ from markdown_it.rules_block.html_block import HTML_SEQUENCES
 
 from mdformat import codepoints
 from mdformat._conf import DEFAULT_OPTS
+from mdformat.renderer._codeformatters import format_code, info_and_lang
+from mdformat.renderer._memo import pure_render
 from mdformat.renderer._util import (
     RE_CHAR_REFERENCE,
     decimalify_leading,
@@ -66,6 +68,7 @@ def hr(node: RenderTreeNode, context: RenderContext) -> str:
     return "_" * thematic_break_width
 
 
+@pure_render()
 def code_inline(node: RenderTreeNode, context: RenderContext) -> str:
     code = node.content
     all_chars_are_whitespace = not code.strip()
@@ -111,14 +114,9 @@ def softbreak(node: RenderTreeNode, context: RenderContext) -> str:
     return "\n"
 
 
-def text(node: RenderTreeNode, context: RenderContext) -> str:
-    """Process a text token.
-
-    Text should always be a child of an inline token. An inline token
-    should always be enclosed by a heading or a paragraph.
-    """
-    text = node.content
-
+def _escape_text_before_brackets(text: str) -> str:
+    """Do the escapes of `text` renderer that precede square bracket
+    escaping."""
     # Convert tabs to spaces
     text = text.replace("\t", " ")
     # Reduce tabs and spaces to one space
@@ -130,6 +128,45 @@ def text(node: RenderTreeNode, context: RenderContext) -> str:
 
     text = escape_asterisk_emphasis(text)  # Escape emphasis/strong marker.
     text = escape_underscore_emphasis(text)  # Escape emphasis/strong marker.
+    return text
+
+
+RE_BRACKET_ENCLOSURE = re.compile(r"\[([^\[\]]*)\]")
+
+
+@functools.lru_cache(maxsize=1024)
+def _bracket_enclosures(content: str) -> tuple[str, ...]:
+    """Return upper cased texts that `escape_square_brackets` will look up
+    from used refs when rendering a text token with `content`."""
+    escaped = _escape_text_before_brackets(content)
+    return tuple(enclosed.upper() for enclosed in RE_BRACKET_ENCLOSURE.findall(escaped))
+
+
+def _text_memo_key(node: RenderTreeNode, context: RenderContext) -> Hashable:
+    content = node.content
+    used_refs_key: tuple[bool, ...] = ()
+    if "]" in content:
+        used_refs = context.env["used_refs"]
+        used_refs_key = tuple(
+            enclosed in used_refs for enclosed in _bracket_enclosures(content)
+        )
+    next_sibling = node.next_sibling
+    return (
+        content,
+        used_refs_key,
+        bool(next_sibling and next_sibling.type == "link"),
+        context.do_wrap and _in_block("paragraph", node),
+    )
+
+
+@pure_render(key=_text_memo_key)
+def text(node: RenderTreeNode, context: RenderContext) -> str:
+    """Process a text token.
+
+    Text should always be a child of an inline token. An inline token
+    should always be enclosed by a heading or a paragraph.
+    """
+    text = _escape_text_before_brackets(node.content)
     # Escape link label and link ref enclosures
     text = escape_square_brackets(text, context.env["used_refs"])
     text = escape_less_than_sign(text)  # Escape URI enclosure and HTML.
@@ -157,8 +194,7 @@ def text(node: RenderTreeNode, context: RenderContext) -> str:
 
 
 def fence(node: RenderTreeNode, context: RenderContext) -> str:
-    info_str = node.info.strip()
-    lang = info_str.split(maxsplit=1)[0] if info_str else ""
+    info_str, lang = info_and_lang(node)
     code_block = node.content
 
     # Info strings of backtick code fences cannot contain backticks.
@@ -169,7 +205,9 @@ def fence(node: RenderTreeNode, context: RenderContext) -> str:
     fmt_func = context.options.get("codeformatters", {}).get(lang)
     if fmt_func:
         try:
-            code_block = fmt_func(code_block, info_str)
+            code_block = format_code(
+                fmt_func, lang, info_str, code_block, context.options, context.env
+            )
         except Exception:
             # Swallow exceptions so that formatter errors (e.g. due to
             # invalid code) do not crash mdformat.
@@ -0,0 +1,172 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from markdown_it import MarkdownIt
+    from markdown_it.rules_core import StateCore
+
+    from mdformat.renderer import RenderTreeNode
+    from mdformat.renderer.typing import MemoKey, Render
+
+_MEMO_KEY_ATTR = "_mdformat_memo_key"
+
+
+def _content_key(node: RenderTreeNode, context: Any) -> Hashable:
+    return node.content
+
+
+def pure_render(key: MemoKey = _content_key) -> Callable[[Render], Render]:
+    """Mark a `Render` function as pure.
+
+    The output of a pure `Render` function must only depend on the
+    value that `key` returns for the same node and context. By default
+    this is `node.content`. Output of pure `Render` functions is
+    memoized when a `RenderMemo` is in use.
+    """
+
+    def decorator(func: Render) -> Render:
+        setattr(func, _MEMO_KEY_ATTR, key)
+        return func
+
+    return decorator
+
+
+class RenderMemo:
+    """A bounded LRU cache for output of pure `Render` functions.
+
+    Enable by setting `mdit.options["render_memo"] = RenderMemo()`. A
+    memo can be shared by any number of renders that use the same
+    options.
+    """
+
+    def __init__(self, maxsize: int = 4096) -> None:
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._cache: OrderedDict[Hashable, str] = OrderedDict()
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def wrap(self, renderer: Render) -> Render:
+        """Return a memoizing version of `renderer` if it is marked pure.
+
+        Return `renderer` unchanged otherwise.
+        """
+        key_func: MemoKey | None = getattr(renderer, _MEMO_KEY_ATTR, None)
+        if key_func is None:
+            return renderer
+        cache = self._cache
+
+        def memoized(node: RenderTreeNode, context: Any) -> str:
+            key = (renderer, key_func(node, context))
+            try:
+                text = cache[key]
+            except KeyError:
+                self.misses += 1
+                text = renderer(node, context)
+                cache[key] = text
+                if len(cache) > self.maxsize:
+                    cache.popitem(last=False)
+            else:
+                self.hits += 1
+                cache.move_to_end(key)
+            return text
+
+        return memoized
+
+
+class BlockMemo:
+    """A bounded LRU cache for rendered top-level blocks of a document.
+
+    Rendered blocks are keyed by their source lines and the env state
+    that affects rendering, so when an edited document is rendered
+    again, only the blocks whose source changed are rendered. Enable
+    by calling `BlockMemo().update_mdit(mdit)`. A memo must only be
+    shared by renders that use the same options.
+
+    Note that renderer warnings are not logged again for cached blocks.
+    """
+
+    def __init__(self, maxsize: int = 16384) -> None:
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._cache: OrderedDict[Hashable, tuple[str, frozenset[str]]] = OrderedDict()
+
+    def update_mdit(self, mdit: MarkdownIt) -> None:
+        mdit.options["block_memo"] = self
+        if _SOURCE_LINES_KEY not in mdit.core.ruler.get_all_rules():
+            mdit.core.ruler.push(_SOURCE_LINES_KEY, _store_source_lines)
+
+    def wrap_root(self, renderer: Render) -> Render:
+        """Return a version of a root `Render` that renders the root's
+        children using the memo."""
+        cache = self._cache
+
+        def render_root(node: RenderTreeNode, context: Any) -> str:
+            env = context.env
+            source_lines = env.get(_SOURCE_LINES_KEY)
+            if source_lines is None:
+                return renderer(node, context)
+            references = frozenset(
+                (label, ref["href"], ref["title"])
+                for label, ref in env.get("references", {}).items()
+            )
+            used_refs = env["used_refs"]
+            outputs = []
+            consecutive_same_type = 0
+            previous_type = None
+            for child in node.children:
+                child_type = child.type
+                if child_type == previous_type:
+                    consecutive_same_type += 1
+                else:
+                    consecutive_same_type = 0
+                previous_type = child_type
+                child_map = child.map
+                if child_map is None:
+                    outputs.append(child.render(context))
+                    continue
+                used_refs_before = frozenset(used_refs)
+                key = (
+                    "\n".join(source_lines[child_map[0] : child_map[1]]),
+                    child_type,
+                    # List markers alternate in consecutive lists
+                    (
+                        consecutive_same_type % 2
+                        if child_type in {"bullet_list", "ordered_list"}
+                        else 0
+                    ),
+                    env["indent_width"],
+                    used_refs_before,
+                    references,
+                )
+                try:
+                    text, added_refs = cache[key]
+                except KeyError:
+                    self.misses += 1
+                    text = child.render(context)
+                    cache[key] = (text, frozenset(used_refs - used_refs_before))
+                    if len(cache) > self.maxsize:
+                        cache.popitem(last=False)
+                else:
+                    self.hits += 1
+                    cache.move_to_end(key)
+                    used_refs.update(added_refs)
+                outputs.append(text)
+            return "\n\n".join(out for out in outputs if out)
+
+        return render_root
+
+
+_SOURCE_LINES_KEY = "mdformat_source_lines"
+
+
+def _store_source_lines(state: StateCore) -> None:
+    state.env[_SOURCE_LINES_KEY] = state.src.split("\n")
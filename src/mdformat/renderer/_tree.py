@@ -1,10 +1,90 @@
-from markdown_it.tree import SyntaxTreeNode
+from __future__ import annotations
+
+from collections.abc import Generator, Sequence
+import textwrap
+from typing import Any, NamedTuple, overload
+
+from markdown_it.token import Token
 
 from mdformat.renderer._context import RenderContext
 
+# Value of `RenderTreeNode._start` for a root node
+_ROOT = -1
+
+
+class NesterTokens(NamedTuple):
+    opening: Token
+    closing: Token
+
+
+class RenderTreeNode:
+    """A syntax tree node capable of making a text rendering of itself.
+
+    The API mirrors `markdown_it.tree.SyntaxTreeNode`, but nodes are
+    slotted and only store a slice (`_start` and `_end` indexes) of the
+    token sequence they were built from. Child nodes are created lazily
+    on first access to `children`.
+    """
+
+    __slots__ = ("_tokens", "_start", "_end", "_parent", "_index", "_children")
+
+    def __init__(
+        self, tokens: Sequence[Token] = (), *, create_root: bool = True
+    ) -> None:
+        """Initialize a `RenderTreeNode` from a token stream.
+
+        If `create_root` is True, create a root node for the document.
+        """
+        self._tokens: Sequence[Token] = tokens
+        self._parent: RenderTreeNode | None = None
+        self._index = 0
+        self._children: list[RenderTreeNode] | None = None
+        if create_root:
+            self._start = _ROOT
+            self._end = len(tokens)
+            return
+
+        if not tokens:
+            raise ValueError(
+                "Can only create root from empty token sequence."
+                " Set `create_root=True`."
+            )
+        if len(tokens) == 1 and tokens[0].nesting:
+            raise ValueError(
+                "Unequal nesting level at the start and end of token stream."
+            )
+        self._start = 0
+        self._end = len(tokens)
+
+    @classmethod
+    def _from_slice(
+        cls,
+        tokens: Sequence[Token],
+        start: int,
+        end: int,
+        parent: RenderTreeNode,
+        index: int,
+    ) -> RenderTreeNode:
+        node = cls.__new__(cls)
+        node._tokens = tokens
+        node._start = start
+        node._end = end
+        node._parent = parent
+        node._index = index
+        node._children = None
+        return node
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.type})"
+
+    @overload
+    def __getitem__(self, item: int) -> RenderTreeNode: ...
+
+    @overload
+    def __getitem__(self, item: slice) -> list[RenderTreeNode]: ...
 
-class RenderTreeNode(SyntaxTreeNode):
-    """A syntax tree node capable of making a text rendering of itself."""
+    def __getitem__(self, item: int | slice) -> RenderTreeNode | list[RenderTreeNode]:
+        return self.children[item]
 
     def render(self, context: RenderContext) -> str:
         renderer = context.renderers[self.type]
@@ -12,3 +92,274 @@ class RenderTreeNode(SyntaxTreeNode):
         for postprocessor in context.postprocessors.get(self.type, ()):
             text = postprocessor(text, self, context)
         return text
+
+    def _make_children(self) -> list[RenderTreeNode]:
+        """Convert the tokens nested in `self` to child nodes."""
+        tokens = self._tokens
+        if self._start == _ROOT:
+            start, end = 0, self._end
+        elif self._end - self._start == 1:
+            tokens = tokens[self._start].children or ()
+            start, end = 0, len(tokens)
+        else:
+            start, end = self._start + 1, self._end - 1
+
+        children: list[RenderTreeNode] = []
+        i = start
+        while i < end:
+            nesting: int = tokens[i].nesting
+            j = i + 1
+            if nesting:
+                if nesting != 1:
+                    raise ValueError("Invalid token nesting")
+                while j < end and nesting:
+                    nesting += tokens[j].nesting
+                    j += 1
+                if nesting:
+                    raise ValueError(f"unclosed tokens starting {tokens[i]}")
+            children.append(self._from_slice(tokens, i, j, self, len(children)))
+            i = j
+        return children
+
+    def to_tokens(self) -> list[Token]:
+        """Recover the linear token stream."""
+
+        def recursive_collect_tokens(
+            node: RenderTreeNode, token_list: list[Token]
+        ) -> None:
+            if node.is_root:
+                for child in node.children:
+                    recursive_collect_tokens(child, token_list)
+            elif not node.is_nested:
+                token_list.append(node._tokens[node._start])
+            else:
+                token_list.append(node._tokens[node._start])
+                for child in node.children:
+                    recursive_collect_tokens(child, token_list)
+                token_list.append(node._tokens[node._end - 1])
+
+        tokens: list[Token] = []
+        recursive_collect_tokens(self, tokens)
+        return tokens
+
+    @property
+    def children(self) -> list[RenderTreeNode]:
+        if self._children is not None:
+            return self._children
+        children = self._make_children()
+        # Empty lists of leaf nodes are not stored to save memory. Use the
+        # setter to add children to a leaf node.
+        if children:
+            self._children = children
+        return children
+
+    @children.setter
+    def children(self, value: list[RenderTreeNode]) -> None:
+        self._children = value
+
+    @property
+    def parent(self) -> RenderTreeNode | None:
+        return self._parent
+
+    @parent.setter
+    def parent(self, value: RenderTreeNode | None) -> None:
+        self._parent = value
+
+    @property
+    def is_root(self) -> bool:
+        """Is the node a special root node?"""
+        return self._start == _ROOT
+
+    @property
+    def is_nested(self) -> bool:
+        """Is this node nested?.
+
+        Returns `True` if the node represents a `Token` pair and tokens
+        in the sequence between them, where `Token.nesting` of the first
+        `Token` in the pair is 1 and nesting of the other `Token` is -1.
+        """
+        return self._start != _ROOT and self._end - self._start > 1
+
+    @property
+    def token(self) -> Token | None:
+        """The `Token` of a node representing an unnested token."""
+        if self._start == _ROOT or self._end - self._start > 1:
+            return None
+        return self._tokens[self._start]
+
+    @property
+    def nester_tokens(self) -> NesterTokens | None:
+        """Opening and closing `Token`s of a container node."""
+        if not self.is_nested:
+            return None
+        return NesterTokens(self._tokens[self._start], self._tokens[self._end - 1])
+
+    @property
+    def siblings(self) -> Sequence[RenderTreeNode]:
+        """Get siblings of the node.
+
+        Gets the whole group of siblings, including self.
+        """
+        if not self._parent:
+            return [self]
+        return self._parent.children
+
+    def _sibling_index(self) -> int:
+        siblings = self.siblings
+        index = self._index
+        # Children may have been replaced using the `children` setter
+        if index >= len(siblings) or siblings[index] is not self:
+            index = siblings.index(self)
+        return index
+
+    @property
+    def type(self) -> str:
+        """Get a string type of the represented syntax.
+
+        - "root" for root nodes
+        - `Token.type` if the node represents an unnested token
+        - `Token.type` of the opening token, with "_open" suffix stripped, if
+            the node represents a nester token pair
+        """
+        if self._start == _ROOT:
+            return "root"
+        token_type = self._tokens[self._start].type
+        if self._end - self._start == 1:
+            return token_type
+        return token_type.removesuffix("_open")
+
+    @property
+    def next_sibling(self) -> RenderTreeNode | None:
+        """Get the next node in the sequence of siblings.
+
+        Returns `None` if this is the last sibling.
+        """
+        siblings = self.siblings
+        index = self._sibling_index() + 1
+        if index < len(siblings):
+            return siblings[index]
+        return None
+
+    @property
+    def previous_sibling(self) -> RenderTreeNode | None:
+        """Get the previous node in the sequence of siblings.
+
+        Returns `None` if this is the first sibling.
+        """
+        index = self._sibling_index() - 1
+        if index >= 0:
+            return self.siblings[index]
+        return None
+
+    def pretty(
+        self, *, indent: int = 2, show_text: bool = False, _current: int = 0
+    ) -> str:
+        """Create an XML style string of the tree."""
+        prefix = " " * _current
+        text = prefix + f"<{self.type}"
+        if not self.is_root and self.attrs:
+            text += " " + " ".join(f"{k}={v!r}" for k, v in self.attrs.items())
+        text += ">"
+        if (
+            show_text
+            and not self.is_root
+            and self.type in ("text", "text_special")
+            and self.content
+        ):
+            text += "\n" + textwrap.indent(self.content, prefix + " " * indent)
+        for child in self.children:
+            text += "\n" + child.pretty(
+                indent=indent, show_text=show_text, _current=_current + indent
+            )
+        return text
+
+    def walk(
+        self, *, include_self: bool = True
+    ) -> Generator[RenderTreeNode, None, None]:
+        """Recursively yield all descendant nodes in the tree starting at self.
+
+        The order mimics the order of the underlying linear token
+        stream (i.e. depth first).
+        """
+        if include_self:
+            yield self
+        for child in self.children:
+            yield from child.walk(include_self=True)
+
+    # NOTE:
+    # The values of the properties defined below directly map to properties
+    # of the underlying `Token`s. A root node does not translate to a `Token`
+    # object, so calling these property getters on a root node will raise an
+    # `AttributeError`.
+
+    def _attribute_token(self) -> Token:
+        """Return the `Token` that is used as the data source for the
+        properties defined below."""
+        if self._start == _ROOT:
+            raise AttributeError("Root node does not have the accessed attribute")
+        return self._tokens[self._start]
+
+    @property
+    def tag(self) -> str:
+        """Html tag name, e.g. "p"."""
+        return self._attribute_token().tag
+
+    @property
+    def attrs(self) -> dict[str, str | int | float]:
+        """Html attributes."""
+        return self._attribute_token().attrs
+
+    def attrGet(self, name: str) -> None | str | int | float:
+        """Get the value of attribute `name`, or null if it does not
+        exist."""
+        return self._attribute_token().attrGet(name)
+
+    @property
+    def map(self) -> tuple[int, int] | None:
+        """Source map info.
+
+        Format: `tuple[ line_begin, line_end ]`
+        """
+        map_ = self._attribute_token().map
+        if map_:
+            return (map_[0], map_[1])
+        return None
+
+    @property
+    def level(self) -> int:
+        """Nesting level, the same as `state.level`"""
+        return self._attribute_token().level
+
+    @property
+    def content(self) -> str:
+        """In a case of self-closing tag (code, html, fence, etc.), it has
+        contents of this tag."""
+        return self._attribute_token().content
+
+    @property
+    def markup(self) -> str:
+        """'*' or '_' for emphasis, fence string for fence, etc."""
+        return self._attribute_token().markup
+
+    @property
+    def info(self) -> str:
+        """Fence infostring."""
+        return self._attribute_token().info
+
+    @property
+    def meta(self) -> dict[Any, Any]:
+        """A place for plugins to store an arbitrary data."""
+        return self._attribute_token().meta
+
+    @property
+    def block(self) -> bool:
+        """True for block-level tokens, false for inline tokens."""
+        return self._attribute_token().block
+
+    @property
+    def hidden(self) -> bool:
+        """If it's true, ignore this element when rendering.
+
+        Used for tight lists to hide paragraphs.
+        """
+        return self._attribute_token().hidden
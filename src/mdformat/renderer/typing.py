@@ -1,4 +1,4 @@
-from typing import TYPE_CHECKING, Any, Callable
+from typing import TYPE_CHECKING, Any, Callable, Hashable
 
 if TYPE_CHECKING:
     from mdformat.renderer import RenderTreeNode
@@ -13,3 +13,6 @@ Render = Callable[
 ]
 
 Postprocess = Callable[[str, "RenderTreeNode", Any], str]
+
+# A function returning everything that output of a pure `Render` depends on
+MemoKey = Callable[["RenderTreeNode", Any], Hashable]
@@ -6,6 +6,7 @@ import pytest
 import mdformat
 from mdformat._util import is_md_equal
 from mdformat.renderer import MDRenderer
+from tests.test_commonmark_spec import SPECTESTS_CASES
 
 UNFORMATTED_MARKDOWN = "\n\n# A header\n\n"
 FORMATTED_MARKDOWN = "# A header\n"
@@ -146,3 +147,120 @@ def test_mdrenderer_no_finalize(tmp_path):
 def test_ascii_whitespace_deprecation():
     with pytest.warns(DeprecationWarning):
         mdformat.codepoints.ASCII_WHITESPACE
+
+
+@pytest.mark.parametrize("wrap", ["keep", 40])
+def test_formatter_cache__equals_cold(wrap):
+    options = {"wrap": wrap}
+    formatter = mdformat.Formatter(options=options, cache=True)
+    for entry in SPECTESTS_CASES:
+        md = entry["md"]
+        assert formatter.text(md) == mdformat.text(md, options=options)
+        # Again with a warm cache
+        assert formatter.text(md) == mdformat.text(md, options=options)
+
+
+@pytest.mark.parametrize(
+    "before,after",
+    [
+        pytest.param(
+            "- a\n\n* b\n\n- c\n\ntext\n",
+            "* b\n\n- c\n\ntext\n",
+            id="consecutive-lists",
+        ),
+        pytest.param(
+            "\\[x\\]\n\n[x]\n\n\\[x\\]\n\n[x]: /url\n",
+            "\\[x\\]\n\n\\[x\\]\n\n[x]: /url\n",
+            id="used-refs",
+        ),
+        pytest.param(
+            "[x]\n\n[x]: /url\n",
+            "[x]\n\n[y]: /url\n",
+            id="reference-definitions",
+        ),
+        pytest.param(
+            "1. a\n\n   b\n",
+            "1. a\n\n   b\n\nnew paragraph\n",
+            id="append",
+        ),
+    ],
+)
+def test_formatter_cache__edit(before, after):
+    formatter = mdformat.Formatter(cache=True)
+    assert formatter.text(before) == mdformat.text(before)
+    assert formatter.text(after) == mdformat.text(after)
+
+
+def test_lines():
+    md = "* a\n* b\n\n# Title\n\nSome   *text*\n\n[ref]: /url\n"
+    assert mdformat.text(md, lines=[]) == md
+    assert mdformat.text(md, lines=[(5, 5)]) == md
+    assert (
+        mdformat.text(md, lines=[(6, 8)])
+        == "* a\n* b\n\n# Title\n\nSome *text*\n\n[ref]: /url\n"
+    )
+    # The block following a formatted list is formatted too
+    assert mdformat.text(md, lines=[(1, 1)]) == mdformat.text(
+        md, lines=[(1, 1), (4, 4)]
+    )
+    with pytest.raises(ValueError):
+        mdformat.text(md, lines=[(2, 1)])
+
+
+@pytest.mark.parametrize("wrap", ["keep", 10])
+def test_lines__html_equal(wrap):
+    """Test that formatting any single line keeps the document's HTML
+    equal."""
+    options = {"wrap": wrap}
+    for entry in SPECTESTS_CASES:
+        md = entry["md"]
+        for line in range(1, md.count("\n") + 2):
+            formatted = mdformat.text(md, options=options, lines=[(line, line)])
+            assert is_md_equal(md, formatted), f"line {line} of {md!r}"
+
+
+def test_lines__all_lines():
+    for entry in SPECTESTS_CASES:
+        md = entry["md"]
+        formatted = mdformat.text(md, lines=[(1, md.count("\n") + 1)])
+        assert mdformat.text(formatted) == mdformat.text(md)
+
+
+def test_fingerprint(monkeypatch):
+    monkeypatch.setitem(mdformat.plugins.PARSER_EXTENSIONS, "a", object())
+    monkeypatch.setitem(mdformat.plugins.PARSER_EXTENSIONS, "b", object())
+    monkeypatch.setattr(
+        mdformat.plugins, "_PARSER_EXTENSION_DISTS", {"dist": ("1.0", ["a", "b"])}
+    )
+    default = mdformat.fingerprint()
+    assert default == mdformat.fingerprint(options={"wrap": "keep"})
+    assert default != mdformat.fingerprint(options={"wrap": 80})
+    with_a = mdformat.fingerprint(extensions=["a"])
+    assert with_a != default
+    assert mdformat.fingerprint(extensions=["a", "b"]) == mdformat.fingerprint(
+        extensions=["b", "a", "a"]
+    )
+
+    # Versions of plugin distributions are part of the fingerprint
+    monkeypatch.setattr(
+        mdformat.plugins, "_PARSER_EXTENSION_DISTS", {"dist": ("2.0", ["a", "b"])}
+    )
+    assert mdformat.fingerprint(extensions=["a"]) != with_a
+
+    with pytest.raises(KeyError):
+        mdformat.fingerprint(codeformatters=["not-installed"])
+
+
+def test_text_bytes():
+    formatted = b"- a\n- b\n"
+    assert mdformat.text_bytes(formatted) is formatted
+    assert mdformat.text_bytes(b"* a\n* b\n") == formatted
+    assert (
+        mdformat.text_bytes(b"* a\r\n* b\r\n", options={"end_of_line": "keep"})
+        == b"- a\r\n- b\r\n"
+    )
+    crlf = b"- \xc3\xa4\r\n"
+    assert mdformat.text_bytes(crlf, options={"end_of_line": "crlf"}) is crlf
+    assert mdformat.text_bytes(b"- \xc3\xa4\n", options={"end_of_line": "crlf"}) == crlf
+    with pytest.raises(UnicodeDecodeError):
+        mdformat.text_bytes(b"\xff")
@@ -1,12 +1,25 @@
-from io import StringIO
+from io import BytesIO, StringIO, TextIOWrapper
+import json
 import os
+from pathlib import Path
+import shutil
+import subprocess
 import sys
+import time
 from unittest.mock import patch
 
 import pytest
 
 import mdformat
-from mdformat._cli import get_plugin_info_str, run, wrap_paragraphs
+from mdformat._cli import (
+    get_plugin_info_str,
+    read_path_list,
+    run,
+    shard_file_paths,
+    walk_md_files,
+    wrap_paragraphs,
+)
+from mdformat._git import changed_lines
 from mdformat.plugins import CODEFORMATTERS, PARSER_EXTENSIONS
 from tests.utils import (
     FORMATTED_MARKDOWN,
@@ -143,6 +156,78 @@ def test_formatter_plugin(tmp_path, monkeypatch):
     assert file_path.read_text() == "```lang\ndummy\n```\n"
 
 
+@pytest.mark.parametrize(
+    "pool_args",
+    [
+        pytest.param(["--codeformatter-workers", "2"], id="threads"),
+        pytest.param(
+            ["--codeformatter-workers", "2", "--codeformatter-processes"],
+            id="processes",
+        ),
+    ],
+)
+def test_formatter_plugin__workers(tmp_path, monkeypatch, pool_args):
+    monkeypatch.setitem(CODEFORMATTERS, "lang", example_formatter)
+    file_path = tmp_path / "test_markdown.md"
+    file_path.write_text("```lang\nother\n```\n\n```lang\nanother\n```\n")
+    assert run((str(file_path), *pool_args)) == 0
+    assert file_path.read_text() == "```lang\ndummy\n```\n\n```lang\ndummy\n```\n"
+
+
+def sleepy_formatter(code, info):
+    if code == "slow\n":
+        time.sleep(60)
+    return "dummy\n"
+
+
+def sleepy_batch_formatter(code, info):
+    return sleepy_formatter(code, info)
+
+
+def _sleepy_format_batch(blocks):
+    return [sleepy_formatter(code, info) for code, info in blocks]
+
+
+sleepy_batch_formatter.format_batch = _sleepy_format_batch  # type: ignore[attr-defined]
+
+
+@pytest.mark.parametrize("fmt_func", [sleepy_formatter, sleepy_batch_formatter])
+def test_codeformatter_timeout(tmp_path, monkeypatch, capsys, fmt_func):
+    monkeypatch.setitem(CODEFORMATTERS, "lang", fmt_func)
+    file_path = tmp_path / "test_markdown.md"
+    file_path.write_text("```lang\nslow\n```\n\n```lang\nfast\n```\n")
+    start = time.monotonic()
+    assert run((str(file_path), "--codeformatter-timeout", "0.5")) == 0
+    assert time.monotonic() - start < 30
+    assert file_path.read_text() == "```lang\nslow\n```\n\n```lang\ndummy\n```\n"
+    assert capsys.readouterr().err == (
+        "Warning: Failed formatting content of a lang code block "
+        f"(line 1 before formatting). Filename: {file_path}\n"
+    )
+
+
+def test_codeformatter_workers__invalid(capsys):
+    with pytest.raises(SystemExit) as exc_info:
+        run(["some-path.md", "--codeformatter-workers=0"])
+    assert exc_info.value.code == 2
+    assert "error: argument --codeformatter-workers" in capsys.readouterr().err
+
+
+def test_pipeline_per_conf(tmp_path):
+    sub_dir = tmp_path / "sub"
+    sub_dir.mkdir()
+    (sub_dir / ".mdformat.toml").write_text("wrap = 'no'\n")
+    paths: list[Path] = []
+    for directory in (tmp_path, sub_dir, tmp_path, sub_dir):
+        path = directory / f"file{len(paths)}.md"
+        path.write_text("a\nb\n")
+        paths.append(path)
+    with patch("mdformat.Formatter", wraps=mdformat.Formatter) as formatter_spy:
+        assert run([str(p) for p in paths]) == 0
+    assert formatter_spy.call_count == 2
+    assert [p.read_text() for p in paths] == ["a\nb\n", "a b\n", "a\nb\n", "a b\n"]
+
+
 def test_dash_stdin(capfd, monkeypatch):
     monkeypatch.setattr(sys, "stdin", StringIO(UNFORMATTED_MARKDOWN))
     assert run(("-",)) == 0
@@ -387,9 +472,6 @@ def test_no_timestamp_modify(tmp_path):
     assert os.path.getmtime(file_path) == initial_mod_time
 
 
-@pytest.mark.skipif(
-    sys.version_info < (3, 13), reason="'exclude' only possible on 3.13+"
-)
 def test_exclude(tmp_path):
     subdir_path_1 = tmp_path / "folder1"
     subdir_path_2 = subdir_path_1 / "folder2"
@@ -423,6 +505,543 @@ def test_exclude(tmp_path):
             assert file_path_1.read_text() == FORMATTED_MARKDOWN
 
 
+def test_exclude__dir_not_walked(tmp_path):
+    excluded_dir = tmp_path / "node_modules"
+    (excluded_dir / "pkg").mkdir(parents=True)
+    (excluded_dir / "pkg" / "file.md").write_text(UNFORMATTED_MARKDOWN)
+    file_path = tmp_path / "file.md"
+    file_path.write_text(UNFORMATTED_MARKDOWN)
+
+    with (
+        patch("mdformat._cli.Path.cwd", return_value=tmp_path),
+        patch("mdformat._cli.os.scandir", wraps=os.scandir) as scandir_spy,
+    ):
+        assert run([str(tmp_path), "--exclude", "node_modules/**"]) == 0
+    assert [call.args for call in scandir_spy.call_args_list] == [(str(tmp_path),)]
+    assert file_path.read_text() == FORMATTED_MARKDOWN
+    assert (excluded_dir / "pkg" / "file.md").read_text() == UNFORMATTED_MARKDOWN
+
+
+def test_respect_gitignore(tmp_path):
+    (tmp_path / ".git").mkdir()
+    (tmp_path / ".gitignore").write_text("build/\n*.gen.md\n!keep.gen.md\n")
+    (tmp_path / "docs").mkdir()
+    (tmp_path / "docs" / ".gitignore").write_text("/drafts\n")
+    paths = ("a.md", "a.gen.md", "keep.gen.md", "build/b.md", "docs/drafts/c.md")
+    for path in paths:
+        (tmp_path / path).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / path).write_text(UNFORMATTED_MARKDOWN)
+
+    with patch("mdformat._cli.os.scandir", wraps=os.scandir) as scandir_spy:
+        assert run([str(tmp_path), "--respect-gitignore"]) == 0
+    walked = {call.args[0] for call in scandir_spy.call_args_list}
+    assert walked == {str(tmp_path), str(tmp_path / "docs")}
+    formatted = {
+        path for path in paths if (tmp_path / path).read_text() == FORMATTED_MARKDOWN
+    }
+    assert formatted == {"a.md", "keep.gen.md"}
+
+
+def git(*args, cwd):
+    subprocess.run(
+        ["git", "-c", "user.name=a", "-c", "user.email=a@a", *args],
+        cwd=cwd,
+        check=True,
+        capture_output=True,
+    )
+
+
+@pytest.mark.skipif(shutil.which("git") is None, reason="requires git")
+def test_changed_since(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    for path in ("old.md", "modified.md", "staged.md", "deleted.md", "docs/old.md"):
+        (tmp_path / path).parent.mkdir(exist_ok=True)
+        (tmp_path / path).write_text(UNFORMATTED_MARKDOWN)
+    git("init", "-q", cwd=tmp_path)
+    git("add", ".", cwd=tmp_path)
+    git("commit", "-q", "-m", "initial", cwd=tmp_path)
+    (tmp_path / "staged.md").write_text(UNFORMATTED_MARKDOWN + "\n")
+    git("add", "staged.md", cwd=tmp_path)
+    (tmp_path / "modified.md").write_text(UNFORMATTED_MARKDOWN + "\n")
+    (tmp_path / "docs" / "new.md").write_text(UNFORMATTED_MARKDOWN)
+    (tmp_path / "deleted.md").unlink()
+
+    assert run([".", "--check", "--staged"]) == 1
+    with patch("mdformat._cli.print_error") as print_error:
+        run([".", "--check", "--changed-since", "HEAD"])
+    reported = {call.args[0] for call in print_error.call_args_list}
+    assert reported == {
+        f'File "{tmp_path / name}" is not formatted.'
+        for name in ("modified.md", "staged.md", os.path.join("docs", "new.md"))
+    }
+
+    assert run(["docs", "--changed-since", "HEAD"]) == 0
+    assert (tmp_path / "docs" / "new.md").read_text() == FORMATTED_MARKDOWN
+    assert (tmp_path / "docs" / "old.md").read_text() == UNFORMATTED_MARKDOWN
+    assert (tmp_path / "modified.md").read_text() != FORMATTED_MARKDOWN
+
+
+@pytest.mark.skipif(shutil.which("git") is None, reason="requires git")
+def test_changed_since__invalid_ref(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    git("init", "-q", cwd=tmp_path)
+    assert run([".", "--changed-since", "no-such-ref"]) == 1
+    assert "Error:" in capsys.readouterr().err
+    assert run([".", "--changed-since=--output=x"]) == 1
+    assert not (tmp_path / "x").exists()
+
+
+def test_lines(tmp_path):
+    file_path = tmp_path / "test.md"
+    file_path.write_text("Some   text\n\n\n*   a\n\nMore   text\n")
+    assert run([str(file_path), "--lines", "1:2"]) == 0
+    assert file_path.read_text() == "Some text\n\n\n*   a\n\nMore   text\n"
+    assert run([str(file_path), "--lines", "1", "--lines", "4"]) == 0
+    assert file_path.read_text() == "Some text\n\n\n- a\n\nMore text\n"
+
+
+@pytest.mark.parametrize("value", ["2:1", "0", "a:b", "1:"])
+def test_lines__invalid(capsys, value):
+    with pytest.raises(SystemExit):
+        run(["-", "--lines", value])
+    err = capsys.readouterr().err
+    assert (
+        f"argument --lines: invalid line range {value!r}: "
+        "expected START[:END] with 1 <= START <= END"
+    ) in err
+    assert "validate_line_range_arg" not in err
+
+
+@pytest.mark.skipif(shutil.which("git") is None, reason="requires git")
+def test_diff_ranges(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    original = "Some   text\n\n# Title\n\nMore   text\n"
+    for name in ("changed.md", "unchanged.md"):
+        (tmp_path / name).write_text(original)
+    git("init", "-q", cwd=tmp_path)
+    git("add", ".", cwd=tmp_path)
+    git("commit", "-q", "-m", "initial", cwd=tmp_path)
+    (tmp_path / "changed.md").write_text(original.replace("More", "Changed"))
+    (tmp_path / "new.md").write_text(original)
+
+    assert run([".", "--diff-ranges"]) == 0
+    assert (
+        tmp_path / "changed.md"
+    ).read_text() == "Some   text\n\n# Title\n\nChanged text\n"
+    assert (tmp_path / "unchanged.md").read_text() == original
+    assert (tmp_path / "new.md").read_text() == "Some text\n\n# Title\n\nMore text\n"
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="file names invalid on Windows")
+def test_changed_lines__headers(tmp_path):
+    names = ["plain.md", "with space.md", 'quo"te.md', 'ä "b.md', "tab\there.md"]
+    for name in names:
+        (tmp_path / name).write_text("a\n")
+    git("init", "-q", cwd=tmp_path)
+    git("add", ".", cwd=tmp_path)
+    git("commit", "-q", "-m", "initial", cwd=tmp_path)
+    for name in names:
+        # An added line starting with "++ " is a diff line starting with "+++ "
+        (tmp_path / name).write_text("a\n++ x\nb\n")
+
+    assert changed_lines(tmp_path, None, staged=False) == {
+        tmp_path / name: [(2, 3)] for name in names
+    }
+
+
+@pytest.mark.parametrize("null", [False, True])
+def test_files_from(tmp_path, monkeypatch, null):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "a.md").write_text(UNFORMATTED_MARKDOWN)
+    (tmp_path / "-").write_text(UNFORMATTED_MARKDOWN)
+    (tmp_path / "dir").mkdir()
+    (tmp_path / "dir" / "b.md").write_text(UNFORMATTED_MARKDOWN)
+    (tmp_path / "arg.md").write_text(UNFORMATTED_MARKDOWN)
+    sep = "\0" if null else "\r\n"
+    (tmp_path / "list").write_text(sep.join(["a.md", "-", "", "dir"]) + sep)
+    args = ["--files-from", "list", "arg.md"]
+    assert run(args + ["-0"] if null else args) == 0
+    for path in ["a.md", "-", "dir/b.md", "arg.md"]:
+        assert (tmp_path / path).read_text() == FORMATTED_MARKDOWN
+
+
+def test_files_from__stdin(tmp_path, monkeypatch):
+    file_path = tmp_path / "a.md"
+    file_path.write_text(UNFORMATTED_MARKDOWN)
+    monkeypatch.setattr(sys, "stdin", TextIOWrapper(BytesIO(f"{file_path}".encode())))
+    assert run(["--files-from", "-"]) == 0
+    assert file_path.read_text() == FORMATTED_MARKDOWN
+
+
+def test_files_from__invalid(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "list").write_text("missing.md\n")
+    assert run(["--files-from", "list"]) == 1
+    # The message is wrapped at a width that depends on the path length
+    assert "missing.md" in capsys.readouterr().err
+
+    with pytest.raises(SystemExit):
+        run(["--files-from", "no-such-list"])
+    assert 'Can not read "no-such-list"' in capsys.readouterr().err
+
+    with pytest.raises(SystemExit):
+        run(["--files-from", "-", "-"])
+
+
+@pytest.mark.parametrize("by_size", [False, True])
+def test_shard(tmp_path, monkeypatch, by_size):
+    monkeypatch.chdir(tmp_path)
+    sizes = {}
+    for i in range(30):
+        path = tmp_path / f"dir{i % 3}" / f"{i}.md"
+        path.parent.mkdir(exist_ok=True)
+        path.write_text(UNFORMATTED_MARKDOWN * (i % 7 + 1))
+        sizes[path] = path.stat().st_size
+    shards = []
+    for index in range(1, 4):
+        paths = list(
+            shard_file_paths(walk_md_files(tmp_path), index, 3, by_size=by_size)
+        )
+        # Shards do not depend on the order files are found in
+        assert set(paths) == set(
+            shard_file_paths(
+                reversed(list(walk_md_files(tmp_path))), index, 3, by_size=by_size
+            )
+        )
+        shards.append(set(paths))
+    assert set().union(*shards) == set(sizes)
+    assert sum(len(shard) for shard in shards) == len(sizes)
+    if by_size:
+        totals = [sum(sizes[p] for p in shard) for shard in shards]
+        assert max(totals) - min(totals) <= max(sizes.values())
+
+    # Shards are assigned by paths relative to the configuration file
+    (tmp_path / ".mdformat.toml").write_text("")
+    moved = tmp_path / "moved"
+    shutil.copytree(tmp_path, moved, ignore=shutil.ignore_patterns("moved"))
+    assert {
+        os.path.relpath(str(p), moved)
+        for p in shard_file_paths(walk_md_files(moved), 1, 3, by_size=by_size)
+    } == {os.path.relpath(str(p), tmp_path) for p in shards[0]}
+
+
+def test_shard__cli(tmp_path, capsys):
+    for i in range(10):
+        (tmp_path / f"{i}.md").write_text(UNFORMATTED_MARKDOWN)
+    unformatted_counts = []
+    for index in (1, 2):
+        assert run(["--check", "--shard", f"{index}/2", str(tmp_path)]) == 1
+        unformatted_counts.append(capsys.readouterr().err.count("Error: File"))
+    assert sum(unformatted_counts) == 10
+
+    for args in (["--shard", "3/2"], ["--shard", "1"], ["--shard-by-size"]):
+        with pytest.raises(SystemExit):
+            run([*args, str(tmp_path)])
+
+
+def test_stat_cache(tmp_path):
+    cache_dir = tmp_path / "cache"
+    file_path = tmp_path / "test.md"
+    file_path.write_text("- a\n")
+    past_ns = time.time_ns() - 10**10
+    os.utime(file_path, ns=(past_ns, past_ns))
+    assert run(["--check", "--cache-dir", str(cache_dir), str(file_path)]) == 0
+
+    # Unformatted content of equal size and modification time is not read
+    file_path.write_text("* a\n")
+    os.utime(file_path, ns=(past_ns, past_ns))
+    assert run(["--check", "--cache-dir", str(cache_dir), str(file_path)]) == 0
+    assert (
+        run(
+            [
+                "--check",
+                "--no-stat-cache",
+                "--cache-dir",
+                str(cache_dir),
+                str(file_path),
+            ]
+        )
+        == 1
+    )
+    # A change of configuration invalidates the index
+    assert (
+        run(["--check", "--number", "--cache-dir", str(cache_dir), str(file_path)]) == 1
+    )
+
+    # Formatting records the written file
+    other_path = tmp_path / "other.md"
+    other_path.write_text("* a\n")
+    assert run(["--cache-dir", str(cache_dir), str(other_path)]) == 0
+    assert other_path.read_text() == "- a\n"
+    index = json.loads((cache_dir / "stat-index-v1.json").read_text())
+    assert index[str(other_path)][:2] == [
+        other_path.stat().st_size,
+        other_path.stat().st_mtime_ns,
+    ]
+
+
+def test_stat_cache__racy(tmp_path):
+    cache_dir = tmp_path / "cache"
+    file_path = tmp_path / "test.md"
+    file_path.write_text("- a\n")
+    future_ns = time.time_ns() + 10**10
+    os.utime(file_path, ns=(future_ns, future_ns))
+    assert run(["--check", "--cache-dir", str(cache_dir), str(file_path)]) == 0
+
+    # The file was not older than the index, so it is checked again
+    file_path.write_text("* a\n")
+    os.utime(file_path, ns=(future_ns, future_ns))
+    assert run(["--check", "--cache-dir", str(cache_dir), str(file_path)]) == 1
+
+
+def test_print_fingerprint(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "sub" / ".mdformat.toml").write_text("wrap = 40\n")
+    assert run(["--print-fingerprint"]) == 0
+    default = capsys.readouterr().out.strip()
+    assert default == mdformat.fingerprint(
+        extensions=PARSER_EXTENSIONS, codeformatters=CODEFORMATTERS
+    )
+
+    assert run(["--print-fingerprint", "a.md", "sub/b.md"]) == 0
+    lines = capsys.readouterr().out.splitlines()
+    assert lines[0] == f"{default}  a.md"
+    sub_fingerprint, _ = lines[1].split("  ")
+    assert sub_fingerprint != default
+
+    # Equal effective options give an equal fingerprint
+    assert run(["--print-fingerprint", "--wrap=40", "a.md"]) == 0
+    assert capsys.readouterr().out == f"{sub_fingerprint}  a.md\n"
+
+    assert run(["--print-fingerprint", "--extensions=not-installed"]) == 1
+    assert "'not-installed' plugin is not installed" in capsys.readouterr().err
+
+
+def test_output_dir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "docs" / "sub").mkdir(parents=True)
+    (tmp_path / "docs" / "a.md").write_text(UNFORMATTED_MARKDOWN)
+    (tmp_path / "docs" / "sub" / "b b.md").write_text(FORMATTED_MARKDOWN)
+    (tmp_path / "docs" / "sub" / ".mdformat.toml").write_text("")
+    args = ["--output-dir", "docs/build", "--depfile", "deps.d", "docs"]
+    assert run(args) == 0
+    assert (tmp_path / "docs" / "a.md").read_text() == UNFORMATTED_MARKDOWN
+    out_a = tmp_path / "docs" / "build" / "docs" / "a.md"
+    out_b = tmp_path / "docs" / "build" / "docs" / "sub" / "b b.md"
+    assert out_a.read_text() == FORMATTED_MARKDOWN
+    assert out_b.read_text() == FORMATTED_MARKDOWN
+    assert (tmp_path / "deps.d").read_text().splitlines() == [
+        "docs/build/docs/a.md: docs/a.md",
+        "docs/build/docs/sub/b\\ b.md: docs/sub/b\\ b.md docs/sub/.mdformat.toml",
+    ]
+
+    # Copies newer than their file and configuration file are skipped,
+    # and the output directory is not formatted into itself
+    future_ns = time.time_ns() + 10**10
+    os.utime(out_a, ns=(future_ns, future_ns))
+    out_a.write_text("stale")
+    os.utime(out_a, ns=(future_ns, future_ns))
+    os.utime(out_b, ns=(0, 0))
+    out_b.write_text("stale")
+    os.utime(out_b, ns=(0, 0))
+    assert run(args) == 0
+    assert out_a.read_text() == "stale"
+    assert out_b.read_text() == FORMATTED_MARKDOWN
+    assert not (tmp_path / "docs" / "build" / "docs" / "build").exists()
+    assert len((tmp_path / "deps.d").read_text().splitlines()) == 2
+
+
+def test_output_dir__interrupted_write(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "a.md").write_text(UNFORMATTED_MARKDOWN)
+    out_a = tmp_path / "out" / "a.md"
+
+    def interrupted_write(f, md, newline):
+        f.write(md[:5].encode())
+        raise KeyboardInterrupt
+
+    with patch("mdformat._output_dir.write_md", interrupted_write):
+        with pytest.raises(KeyboardInterrupt):
+            run(["--output-dir", "out", "a.md"])
+    # No truncated copy is left behind to look up to date
+    assert os.listdir(tmp_path / "out") == []
+    assert run(["--output-dir", "out", "a.md"]) == 0
+    assert out_a.read_text() == FORMATTED_MARKDOWN
+    assert os.listdir(tmp_path / "out") == ["a.md"]
+    assert out_a.stat().st_mode == (tmp_path / "a.md").stat().st_mode
+
+
+def test_output_dir__invalid(tmp_path, monkeypatch, capsys):
+    file_path = tmp_path / "a.md"
+    file_path.write_text(FORMATTED_MARKDOWN)
+    other_dir = tmp_path / "other"
+    other_dir.mkdir()
+    monkeypatch.chdir(other_dir)
+    assert run(["--output-dir", "out", str(file_path)]) == 1
+    assert "must be in the current directory" in capsys.readouterr().err
+
+    for args in (
+        ["--output-dir=out", "-"],
+        ["--depfile=d"],
+        ["--check", "--output-dir=out"],
+    ):
+        with pytest.raises(SystemExit):
+            run([*args, str(file_path)])
+
+
+def test_io_workers(tmp_path, capsys):
+    def make_tree(root):
+        for i in range(20):
+            path = root / f"dir{i % 4}" / f"{i}.md"
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(UNFORMATTED_MARKDOWN if i % 3 else FORMATTED_MARKDOWN)
+        (root / "dir3" / ".mdformat.toml").write_text("invalid")
+
+    results: list[tuple] = []
+    for args in ([], ["--io-workers=3"]):
+        root = tmp_path / str(len(results))
+        make_tree(root)
+        check_code = run(["--check", *args, str(root)])
+        check_err = capsys.readouterr().err.replace(str(root), "ROOT")
+        code = run([*args, str(root)])
+        err = capsys.readouterr().err.replace(str(root), "ROOT")
+        contents = {
+            str(p.relative_to(root)): p.read_text() for p in walk_md_files(root)
+        }
+        results.append((check_code, check_err, code, err, contents))
+    # Files are reported, formatted and left as is in the same order
+    assert results[0] == results[1]
+    assert results[1][0] == results[1][2] == 1
+    assert "Invalid TOML syntax" in results[1][3]
+    assert FORMATTED_MARKDOWN in results[1][4].values()
+    assert UNFORMATTED_MARKDOWN in results[1][4].values()
+
+
+@pytest.mark.parametrize("args", [[], ["--io-workers=4"]])
+def test_io_workers__missing_file(tmp_path, monkeypatch, capsys, args):
+    monkeypatch.chdir(tmp_path)
+    for name in ("a.md", "b.md"):
+        (tmp_path / name).write_text(UNFORMATTED_MARKDOWN)
+    (tmp_path / "list.txt").write_text("a.md\nb.md\nmissing.md\n")
+    assert run(["--files-from=list.txt", *args]) == 1
+    assert "missing.md" in capsys.readouterr().err
+    # Files before the missing one are formatted
+    for name in ("a.md", "b.md"):
+        assert (tmp_path / name).read_text() == FORMATTED_MARKDOWN
+
+
+def test_read_path_list():
+    class ChunkedReader(BytesIO):
+        def read1(self, size=-1):
+            return super().read1(3)
+
+    assert list(read_path_list(ChunkedReader(b"abcdef\0g\0\0hij"), True)) == [
+        "abcdef",
+        "g",
+        "hij",
+    ]
+    assert list(read_path_list(ChunkedReader(b"a b\r\n\nc\n"), False)) == [
+        "a b",
+        "c",
+    ]
+
+
+def batch_request(text, path=""):
+    data = text.encode()
+    header = f"{len(data)} {path}".rstrip()
+    return header.encode() + b"\n" + data
+
+
+def test_stdin_batch(tmp_path, monkeypatch, capfdbinary):
+    (tmp_path / ".mdformat.toml").write_text("wrap = 10\nexclude = ['skip.md']\n")
+    monkeypatch.chdir(tmp_path)
+    stdin = b"".join(
+        [
+            batch_request(UNFORMATTED_MARKDOWN),
+            batch_request("word word word\n", "sub/doc.md"),
+            batch_request("* ä\n", "skip.md"),
+            batch_request(""),
+        ]
+    )
+    monkeypatch.setattr(sys, "stdin", TextIOWrapper(BytesIO(stdin)))
+    assert run(["--stdin-batch"]) == 0
+    assert capfdbinary.readouterr().out == (
+        b"ok 11\n# A header\n"
+        + b"ok 15\nword word\nword\n"
+        + b"ok 5\n* \xc3\xa4\n"
+        + b"ok 0\n"
+    )
+
+
+def test_stdin_batch__errors(monkeypatch, capfdbinary):
+    stdin = b"3\n\xff\n\n" + b"5\nabc"
+    monkeypatch.setattr(sys, "stdin", TextIOWrapper(BytesIO(stdin)))
+    assert run(["--stdin-batch"]) == 1
+    captured = capfdbinary.readouterr()
+    assert captured.out.startswith(b"error ")
+    assert b"Invalid UTF-8" in captured.out
+    assert b"Unexpected end of batch input" in captured.err
+
+    monkeypatch.setattr(sys, "stdin", TextIOWrapper(BytesIO(b"x\n")))
+    assert run(["--stdin-batch"]) == 1
+    assert b"Invalid batch request header" in capfdbinary.readouterr().err
+
+
+def test_stdin_batch__format_error(monkeypatch, capfdbinary):
+    def failing_format_text(pipeline, original_str, *args):
+        if original_str == "fail\n":
+            raise ValueError("plugin bug")
+        return original_str
+
+    monkeypatch.setattr("mdformat._batch.format_text", failing_format_text)
+    stdin = batch_request("fail\n") + batch_request("ok\n")
+    monkeypatch.setattr(sys, "stdin", TextIOWrapper(BytesIO(stdin)))
+    assert run(["--stdin-batch"]) == 1
+    # Later documents are still formatted
+    assert capfdbinary.readouterr().out == (
+        b"error 43\nFailed formatting: ValueError('plugin bug')" + b"ok 3\nok\n"
+    )
+
+
+def test_stdin_batch__invalid_args(capsys):
+    with pytest.raises(SystemExit) as exc_info:
+        run(["--stdin-batch", "README.md"])
+    assert exc_info.value.code == 2
+    assert "--stdin-batch can not be used with" in capsys.readouterr().err
+
+
+@pytest.mark.skipif(
+    sys.version_info < (3, 13), reason="'exclude' only possible on 3.13+"
+)
+def test_exclude__conf_in_excluded_dir(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / ".mdformat.toml").write_text("exclude = ['docs/**']\n")
+    (tmp_path / "docs" / "sub").mkdir(parents=True)
+    (tmp_path / "docs" / "sub" / ".mdformat.toml").write_text("wrap = 'keep'\n")
+    (tmp_path / "docs" / "sub" / "a.md").write_text(UNFORMATTED_MARKDOWN)
+    # The deeper configuration file, which does not exclude the file,
+    # applies to it
+    assert run(["--check", "."]) == 1
+    assert "a.md" in capsys.readouterr().err
+
+
+def test_walk_md_files(tmp_path):
+    for path in ("a.md", "b.txt", "sub/c.md", "dir.md/d.md", "skip/e.md"):
+        (tmp_path / path).parent.mkdir(exist_ok=True)
+        (tmp_path / path).write_text("")
+    if os.name != "nt":
+        (tmp_path / "link").symlink_to(tmp_path / "sub")
+        (tmp_path / "link.md").symlink_to(tmp_path / "a.md")
+    paths = walk_md_files(tmp_path, skip_dir=lambda path: path.name == "skip")
+    assert {path.relative_to(tmp_path).as_posix() for path in paths} == {
+        "a.md",
+        "sub/c.md",
+        "dir.md/d.md",
+        *(["link.md"] if os.name != "nt" else []),
+    }
+
+
 def test_codeformatters(tmp_path, monkeypatch):
     monkeypatch.setitem(CODEFORMATTERS, "enabled-lang", lambda code, info: "dumdum")
     monkeypatch.setitem(CODEFORMATTERS, "disabled-lang", lambda code, info: "dumdum")
@@ -77,8 +77,6 @@ def test_invalid_toml(tmp_path, capsys):
     ],
 )
 def test_invalid_conf_value(bad_conf, conf_key, tmp_path, capsys):
-    if conf_key == "exclude" and sys.version_info < (3, 13):
-        pytest.skip("exclude conf only on Python 3.13+")
     config_path = tmp_path / ".mdformat.toml"
     config_path.write_text(bad_conf)
 
@@ -102,23 +100,6 @@ def test_conf_with_stdin(tmp_path, capfd, monkeypatch):
     assert captured.out == "1. one\n2. two\n3. three\n"
 
 
-@pytest.mark.skipif(
-    sys.version_info >= (3, 13), reason="'exclude' only possible on 3.13+"
-)
-def test_exclude_conf_on_old_python(tmp_path, capsys):
-    config_path = tmp_path / ".mdformat.toml"
-    config_path.write_text("exclude = ['**']")
-
-    file_path = tmp_path / "test_markdown.md"
-    file_path.write_text("# Test Markdown")
-
-    assert run((str(file_path),)) == 1
-    assert "only available on Python 3.13+" in capsys.readouterr().err
-
-
-@pytest.mark.skipif(
-    sys.version_info < (3, 13), reason="'exclude' only possible on 3.13+"
-)
 def test_exclude(tmp_path, capsys):
     config_path = tmp_path / ".mdformat.toml"
     config_path.write_text("exclude = ['dir1/*', 'file1.md']")
@@ -138,9 +119,6 @@ def test_exclude(tmp_path, capsys):
     assert file3_path.read_text() == UNFORMATTED_MARKDOWN
 
 
-@pytest.mark.skipif(
-    sys.version_info < (3, 13), reason="'exclude' only possible on 3.13+"
-)
 def test_empty_exclude(tmp_path, capsys):
     config_path = tmp_path / ".mdformat.toml"
     config_path.write_text("exclude = []")
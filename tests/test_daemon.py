@@ -0,0 +1,109 @@
+import io
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+import mdformat
+from mdformat import _daemon
+from tests.utils import FORMATTED_MARKDOWN, UNFORMATTED_MARKDOWN
+
+pytestmark = pytest.mark.skipif(os.name == "nt", reason="requires Unix domain sockets")
+
+
+@pytest.fixture
+def daemon(tmp_path, monkeypatch):
+    socket_path = str(tmp_path / "daemon" / "sock")
+    monkeypatch.setenv("MDFORMAT_DAEMON_SOCKET", socket_path)
+    process = subprocess.Popen(
+        [sys.executable, "-m", "mdformat", "--daemon"], stderr=subprocess.PIPE
+    )
+    for _ in range(200):
+        if os.path.exists(socket_path):
+            break
+        time.sleep(0.05)
+    yield socket_path
+    process.terminate()
+    process.wait(10)
+    assert not os.path.exists(socket_path)
+
+
+def test_forward__no_daemon(tmp_path, monkeypatch):
+    monkeypatch.setenv("MDFORMAT_DAEMON_SOCKET", str(tmp_path / "sock"))
+    assert _daemon.forward(["--version"]) is None
+
+
+def test_forward(daemon, tmp_path, monkeypatch, capfd):
+    file_path = tmp_path / "test.md"
+    file_path.write_text(UNFORMATTED_MARKDOWN)
+    monkeypatch.chdir(tmp_path)
+    assert _daemon.forward(["--check", "test.md"]) == 1
+    assert 'File "' in capfd.readouterr().err
+    assert _daemon.forward(["test.md"]) == 0
+    assert file_path.read_text() == FORMATTED_MARKDOWN
+
+    monkeypatch.setattr(sys, "stdin", io.StringIO(UNFORMATTED_MARKDOWN))
+    assert _daemon.forward(["-"]) == 0
+    assert capfd.readouterr().out == FORMATTED_MARKDOWN
+
+    file_path.write_text(UNFORMATTED_MARKDOWN)
+    monkeypatch.setattr(sys, "stdin", io.StringIO("test.md\n"))
+    assert _daemon.forward(["--files-from", "-"]) == 0
+    assert file_path.read_text() == FORMATTED_MARKDOWN
+
+    assert _daemon.forward(["--no-such-option"]) == 2
+    assert "unrecognized arguments" in capfd.readouterr().err
+
+
+def test_forward__conf_change(daemon, tmp_path, monkeypatch, capfd):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(sys, "stdin", io.StringIO("1. a\n1. b\n"))
+    assert _daemon.forward(["-"]) == 0
+    assert capfd.readouterr().out == "1. a\n1. b\n"
+
+    (tmp_path / ".mdformat.toml").write_text("number = true\n")
+    monkeypatch.setattr(sys, "stdin", io.StringIO("1. a\n1. b\n"))
+    assert _daemon.forward(["-"]) == 0
+    assert capfd.readouterr().out == "1. a\n2. b\n"
+
+
+def test_forward__version_mismatch(daemon, monkeypatch):
+    monkeypatch.setattr(mdformat, "__version__", "0.0.0")
+    monkeypatch.setattr(sys, "stdin", io.StringIO(UNFORMATTED_MARKDOWN))
+    assert _daemon.forward(["-"]) is None
+    # The input is left for formatting in-process
+    assert sys.stdin.read() == UNFORMATTED_MARKDOWN
+
+
+def test_forward__environment_mismatch(daemon, tmp_path, monkeypatch):
+    file_path = tmp_path / "test.md"
+    file_path.write_text(UNFORMATTED_MARKDOWN)
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(sys, "prefix", str(tmp_path / "other-venv"))
+    assert _daemon.forward(["test.md"]) is None
+    assert file_path.read_text() == UNFORMATTED_MARKDOWN
+
+
+def test_forward__plugin_mismatch(daemon, tmp_path, monkeypatch):
+    identity = _daemon._identity()
+    identity["plugins"].append(["mdformat.codeformatter", "new", "new-plugin", "1.0"])
+    monkeypatch.setattr(_daemon, "_identity", lambda: identity)
+    monkeypatch.chdir(tmp_path)
+    assert _daemon.forward(["--version"]) is None
+
+
+def test_forward__env(daemon, tmp_path, monkeypatch, capfd):
+    (tmp_path / "test.md").write_text(UNFORMATTED_MARKDOWN)
+    monkeypatch.chdir(tmp_path)
+    # git, run by `--changed-since`, reads environment variables of the
+    # client
+    monkeypatch.setenv("GIT_DIR", str(tmp_path / "no-such-repo"))
+    assert _daemon.forward(["--changed-since", "HEAD", "test.md"]) == 1
+    assert "no-such-repo" in capfd.readouterr().err
+
+
+def test_serve__already_running(daemon, capsys):
+    assert _daemon.serve(daemon) == 1
+    assert "already listening" in capsys.readouterr().err
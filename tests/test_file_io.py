@@ -0,0 +1,73 @@
+import functools
+import threading
+import time
+
+import pytest
+
+from mdformat._file_io import FileIO
+
+
+@pytest.mark.parametrize("workers", [0, 1, 4])
+def test_read_ahead(workers):
+    lock = threading.Lock()
+    started: list[int] = []
+
+    def read(item):
+        with lock:
+            started.append(item)
+        # Finish in reverse order of starting
+        time.sleep(0.01 * (10 - item))
+        if item == 7:
+            raise OSError("read error")
+        return item * 2
+
+    results = []
+    with FileIO(workers) as file_io:
+        for item, result in file_io.read_ahead(range(10), read):
+            if item == 3:
+                # Reads are bounded to a window ahead of the caller
+                assert max(started) <= 3 + 2 * workers
+            if item == 7:
+                with pytest.raises(OSError, match="read error"):
+                    result()
+                continue
+            results.append(result())
+    assert results == [0, 2, 4, 6, 8, 10, 12, 16, 18]
+
+
+@pytest.mark.parametrize("workers", [0, 4])
+def test_read_ahead__items_error(workers):
+    def items():
+        yield from range(3)
+        raise ValueError("no more items")
+
+    results = []
+    with FileIO(workers) as file_io:
+        with pytest.raises(ValueError, match="no more items"):
+            for item, result in file_io.read_ahead(items(), lambda item: item * 2):
+                results.append(result())
+    # Items before the error are yielded first
+    assert results == [0, 2, 4]
+
+
+@pytest.mark.parametrize("workers", [0, 3])
+def test_write(workers):
+    done: list[int] = []
+
+    def write(item):
+        time.sleep(0.01 * (5 - item))
+        return item
+
+    with FileIO(workers) as file_io:
+        for item in range(5):
+            file_io.write(functools.partial(write, item), done.append)
+        file_io.finish_writes()
+    assert done == [0, 1, 2, 3, 4]
+
+    def failing_write():
+        raise OSError("write error")
+
+    with FileIO(workers) as file_io:
+        with pytest.raises(OSError, match="write error"):
+            file_io.write(failing_write, done.append)
+            file_io.finish_writes()
@@ -0,0 +1,60 @@
+import pytest
+
+from mdformat._gitignore import GitIgnore
+
+
+@pytest.mark.parametrize(
+    "lines,path,is_dir,expected",
+    [
+        (["a.md"], "a.md", False, True),
+        (["a.md"], "sub/a.md", False, True),
+        (["/a.md"], "sub/a.md", False, False),
+        (["sub/a.md"], "sub/a.md", False, True),
+        (["sub/a.md"], "x/sub/a.md", False, False),
+        (["**/sub/a.md"], "x/sub/a.md", False, True),
+        (["sub/**"], "sub/x/a.md", False, True),
+        (["a/**/b.md"], "a/b.md", False, True),
+        (["a/**/b.md"], "a/x/y/b.md", False, True),
+        (["build/"], "build", True, True),
+        (["build/"], "build", False, False),
+        (["*.md", "!a.md"], "a.md", False, False),
+        (["!a.md", "*.md"], "a.md", False, True),
+        (["*.md"], "dir.md/a.txt", False, False),
+        (["?.md"], "ab.md", False, False),
+        (["[a-c].md"], "b.md", False, True),
+        (["[!a].md"], "a.md", False, False),
+        (["\\!a.md"], "!a.md", False, True),
+        (["\\#a.md"], "#a.md", False, True),
+        (["#a.md"], "#a.md", False, False),
+        (["a.md  "], "a.md", False, True),
+        (["a.md\\ "], "a.md ", False, True),
+        (["", "   "], "a.md", False, False),
+    ],
+)
+def test_patterns(tmp_path, lines, path, is_dir, expected):
+    (tmp_path / ".git").mkdir()
+    (tmp_path / ".gitignore").write_text("\n".join(lines) + "\n")
+    assert GitIgnore().is_ignored(str(tmp_path / path), is_dir=is_dir) is expected
+
+
+def test_nested(tmp_path):
+    (tmp_path / ".git" / "info").mkdir(parents=True)
+    (tmp_path / ".git" / "info" / "exclude").write_text("*.tmp.md\n")
+    (tmp_path / ".gitignore").write_text("*.md\n")
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "sub" / ".gitignore").write_text("!*.md\n/b.md\n")
+    gitignore = GitIgnore()
+    assert gitignore.is_ignored(str(tmp_path / "a.md"), is_dir=False)
+    assert not gitignore.is_ignored(str(tmp_path / "sub" / "a.md"), is_dir=False)
+    assert gitignore.is_ignored(str(tmp_path / "sub" / "b.md"), is_dir=False)
+    assert not gitignore.is_ignored(str(tmp_path / "sub" / "x.tmp.md"), is_dir=False)
+    assert gitignore.is_ignored(str(tmp_path / ".git"), is_dir=True)
+
+
+def test_repository_root(tmp_path):
+    """Test that ignore files above the repository root are not read."""
+    (tmp_path / ".gitignore").write_text("*.md\n")
+    (tmp_path / "repo" / ".git").mkdir(parents=True)
+    gitignore = GitIgnore()
+    assert not gitignore.is_ignored(str(tmp_path / "repo" / "a.md"), is_dir=False)
+    assert gitignore.is_ignored(str(tmp_path / "a.md"), is_dir=False)
@@ -0,0 +1,124 @@
+from pathlib import PurePosixPath
+import sys
+
+import pytest
+
+from mdformat._glob import compile_patterns
+
+PATTERNS = (
+    "a.md",
+    "./a.md",
+    "dir//a.md",
+    "/a.md",
+    "*",
+    "*.md",
+    "*/*.md",
+    "**",
+    "**/*.md",
+    "**/**/*.md",
+    "dir/**",
+    "**/dir/**",
+    "dir/**/b.md",
+    "**file.md",
+    "d*r/*.m?",
+    "?.md",
+    ".*",
+    "[ab].md",
+    "[!ab].md",
+    "[a-c]*.md",
+    "[c-a].md",
+    "[]].md",
+    "[!]].md",
+    "[^a].md",
+    "[a-].md",
+    "[&&a].md",
+    "[.md",
+    "a\\.md",
+    "dir/*",
+    "",
+)
+PATHS = (
+    "a.md",
+    "b.md",
+    "c.md",
+    "d.md",
+    "^.md",
+    "].md",
+    "-.md",
+    "&.md",
+    "[.md",
+    "ab.md",
+    ".hidden",
+    "file.md",
+    "a_file.md",
+    "dir",
+    "dir/a.md",
+    "dir/b.md",
+    "dir/sub/b.md",
+    "dir/sub/deeper/c.md",
+    "dor/x.mx",
+    "other/dir/a.md",
+    "other/a.txt",
+)
+
+
+@pytest.mark.parametrize(
+    "pattern, matching",
+    [
+        ("a.md", {"a.md"}),
+        ("./a.md", {"a.md"}),
+        ("dir//a.md", {"dir/a.md"}),
+        ("/a.md", set()),
+        ("*.md", {"a.md", "ab.md", "file.md"}),
+        ("dir/*", {"dir/a.md", "dir/sub"}),
+        ("dir/**", {"dir/a.md", "dir/sub", "dir/sub/b.md"}),
+        ("**/*.md", {"a.md", "ab.md", "file.md", "dir/a.md", "dir/sub/b.md"}),
+        ("dir/**/b.md", {"dir/sub/b.md"}),
+        ("**file.md", {"file.md"}),
+        ("[!a]*.md", {"file.md"}),
+        ("[a-b]?.md", {"ab.md"}),
+        ("", set()),
+    ],
+)
+def test_match(pattern, matching):
+    paths = ("a.md", "ab.md", "file.md", "dir", "dir/a.md", "dir/sub", "dir/sub/b.md")
+    matcher = compile_patterns((pattern,))
+    assert {path for path in paths if matcher.match(path)} == matching
+
+
+def test_match__combined():
+    matcher = compile_patterns(("README.md", "docs/**", "**/*.txt"))
+    assert matcher.match("README.md")
+    assert matcher.match("docs/a/b.md")
+    assert matcher.match("a/b.txt")
+    assert not matcher.match("a/README.md")
+
+
+def test_match__case_insensitive():
+    matcher = compile_patterns(("readme.md", "*.TXT"), case_sensitive=False)
+    assert matcher.match("README.md")
+    assert matcher.match("a.txt")
+    assert not compile_patterns(("readme.md",), case_sensitive=True).match("README.md")
+
+
+def test_match_dir():
+    matcher = compile_patterns(("venv/**", "**/node_modules/**", "docs/*"))
+    assert matcher.match_dir("venv")
+    assert matcher.match_dir("venv/lib")
+    assert matcher.match_dir("node_modules")
+    assert matcher.match_dir("a/b/node_modules")
+    assert not matcher.match_dir("docs")
+    assert not matcher.match_dir("docs/sub")
+    assert not matcher.match_dir("a")
+    assert compile_patterns(("**",)).match_dir("a")
+
+
+@pytest.mark.skipif(
+    sys.version_info < (3, 13), reason="`PurePath.full_match` requires 3.13+"
+)
+@pytest.mark.parametrize("pattern", PATTERNS)
+def test_equal_to_full_match(pattern):  # pragma: >=3.13 cover
+    matcher = compile_patterns((pattern,), case_sensitive=True)
+    for path in PATHS:
+        expected = PurePosixPath(path).full_match(pattern)  # type: ignore[attr-defined]
+        assert matcher.match(path) == expected, path
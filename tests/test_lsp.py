@@ -0,0 +1,200 @@
+import io
+import json
+import subprocess
+import sys
+
+import pytest
+
+from mdformat._conf import read_toml_opts
+from mdformat.lsp import LanguageServer, text_edits
+
+
+def encode(*messages):
+    stream = b""
+    for message in messages:
+        body = json.dumps({"jsonrpc": "2.0", **message}).encode()
+        stream += b"Content-Length: %d\r\n\r\n" % len(body) + body
+    return stream
+
+
+def decode(stream):
+    messages = []
+    while stream:
+        header, _, rest = stream.partition(b"\r\n\r\n")
+        length = int(header.split(b":")[1])
+        messages.append(json.loads(rest[:length]))
+        stream = rest[length:]
+    return messages
+
+
+def apply_edits(text, edits):
+    lines = text.splitlines(keepends=True)
+    offsets = [0]
+    for line in lines:
+        offsets.append(offsets[-1] + len(line))
+
+    def offset(position):
+        line = lines[position["line"]] if position["line"] < len(lines) else ""
+        # Characters are counted in UTF-16 code units
+        prefix = line.encode("utf-16-le")[: 2 * position["character"]]
+        return offsets[position["line"]] + len(prefix.decode("utf-16-le"))
+
+    for edit in sorted(edits, key=lambda e: offset(e["range"]["start"]), reverse=True):
+        start, end = offset(edit["range"]["start"]), offset(edit["range"]["end"])
+        text = text[:start] + edit["newText"] + text[end:]
+    return text
+
+
+def did_open(uri, text, version=1):
+    return {
+        "method": "textDocument/didOpen",
+        "params": {
+            "textDocument": {
+                "uri": uri,
+                "languageId": "markdown",
+                "version": version,
+                "text": text,
+            }
+        },
+    }
+
+
+def formatting(msg_id, uri):
+    return {
+        "id": msg_id,
+        "method": "textDocument/formatting",
+        "params": {"textDocument": {"uri": uri}, "options": {}},
+    }
+
+
+def serve(*messages):
+    writer = io.BytesIO()
+    server = LanguageServer(io.BytesIO(encode(*messages)), writer)
+    exit_code = server.serve()
+    return exit_code, {m.get("id"): m for m in decode(writer.getvalue())}
+
+
+@pytest.mark.parametrize(
+    "original,formatted",
+    [
+        ("", "a\n"),
+        ("a", "a\n"),
+        ("a\nb\nc\n", "a\nB\nc\n"),
+        ("a\r\nb\r\n", "a\nb\n"),
+        ("a\n\n\nb\n", "a\n\nb\n"),
+        ("a\nb", "x\na\nb"),
+        ("ä😀b", "ä😀b\n"),
+    ],
+)
+def test_text_edits(original, formatted):
+    assert apply_edits(original, text_edits(original, formatted)) == formatted
+
+
+def test_text_edits__minimal():
+    original = "# Title\n\n* a\n\ntext\n"
+    assert text_edits(original, "# Title\n\n- a\n\ntext\n") == [
+        {
+            "range": {
+                "start": {"line": 2, "character": 0},
+                "end": {"line": 3, "character": 0},
+            },
+            "newText": "- a\n",
+        }
+    ]
+    assert text_edits(original, original) == []
+
+
+def test_formatting(tmp_path):
+    uri = (tmp_path / "doc.md").as_uri()
+    text = "Title\n=====\n\n* a\n* b\n\nPara\n"
+    range_params = {
+        "textDocument": {"uri": uri},
+        "range": {
+            "start": {"line": 3, "character": 0},
+            "end": {"line": 4, "character": 3},
+        },
+        "options": {},
+    }
+    exit_code, responses = serve(
+        {"id": 1, "method": "initialize", "params": {"capabilities": {}}},
+        {"method": "initialized", "params": {}},
+        did_open(uri, text),
+        formatting(2, uri),
+        {"id": 3, "method": "textDocument/rangeFormatting", "params": range_params},
+        formatting(4, "file:///not/open.md"),
+        {"id": 5, "method": "no/suchMethod"},
+        {"id": 6, "method": "shutdown"},
+        {"id": 7, "method": "textDocument/formatting"},
+        {"method": "exit"},
+    )
+    assert exit_code == 0
+    capabilities = responses[1]["result"]["capabilities"]
+    assert capabilities["documentFormattingProvider"]
+    assert capabilities["documentRangeFormattingProvider"]
+    assert apply_edits(text, responses[2]["result"]) == "# Title\n\n- a\n- b\n\nPara\n"
+    assert apply_edits(text, responses[3]["result"]) == (
+        "Title\n=====\n\n- a\n- b\n\nPara\n"
+    )
+    assert responses[4]["error"]["code"] == -32602
+    assert responses[5]["error"]["code"] == -32601
+    assert responses[6]["result"] is None
+    assert responses[7]["error"]["code"] == -32600
+
+
+def test_formatting__config(tmp_path):
+    read_toml_opts.cache_clear()
+    (tmp_path / ".mdformat.toml").write_text("wrap = 10\nexclude = ['skip.md']\n")
+    uri = (tmp_path / "doc.md").as_uri()
+    skip_uri = (tmp_path / "skip.md").as_uri()
+    text = "word word word\n"
+    _, responses = serve(
+        did_open(uri, text),
+        did_open(skip_uri, text),
+        formatting(1, uri),
+        formatting(2, skip_uri),
+    )
+    assert apply_edits(text, responses[1]["result"]) == "word word\nword\n"
+    assert responses[2]["result"] == []
+
+
+def test_cancel_and_content_modified():
+    uri = "untitled:Untitled-1"
+    writer = io.BytesIO()
+    server = LanguageServer(io.BytesIO(), writer)
+    server.handle(did_open(uri, "* a\n"))
+    server.handle(formatting(1, uri))
+    server.handle(formatting(2, uri))
+    server.handle(formatting(3, uri))
+    server.handle({"method": "$/cancelRequest", "params": {"id": 1}})
+    server.handle(
+        {
+            "method": "textDocument/didChange",
+            "params": {
+                "textDocument": {"uri": uri, "version": 2},
+                "contentChanges": [{"text": "* b\n"}],
+            },
+        }
+    )
+    server.handle(formatting(4, uri))
+    for _ in range(4):
+        request = server._requests.get_nowait()
+        assert request is not None
+        server._process(*request)
+    responses = {m["id"]: m for m in decode(writer.getvalue())}
+    assert responses[1]["error"]["code"] == -32800
+    assert responses[2]["error"]["code"] == -32801
+    assert responses[3]["error"]["code"] == -32801
+    assert apply_edits("* b\n", responses[4]["result"]) == "- b\n"
+
+
+def test_main():
+    stream = encode(
+        {"id": 1, "method": "initialize", "params": {"capabilities": {}}},
+        {"method": "exit"},
+    )
+    result = subprocess.run(
+        [sys.executable, "-m", "mdformat.lsp"], input=stream, capture_output=True
+    )
+    assert result.returncode == 1  # exit without shutdown
+    (response,) = decode(result.stdout)
+    assert response["result"]["serverInfo"]["name"] == "mdformat"
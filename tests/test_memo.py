@@ -0,0 +1,73 @@
+import logging
+from pathlib import Path
+
+from markdown_it.utils import read_fixture_file
+import pytest
+
+import mdformat
+from mdformat._util import build_mdit
+from mdformat.renderer import LOGGER, MDRenderer, RenderMemo, pure_render
+from tests.test_commonmark_spec import SPECTESTS_CASES
+from tests.utils import TextEditorPlugin
+
+STYLE_CASES = tuple(
+    case[2]
+    for case in read_fixture_file(Path(__file__).parent / "data" / "default_style.md")
+)
+
+
+@pytest.mark.parametrize("wrap", ["keep", "no", 40])
+def test_shared_memo_output_equal(wrap):
+    cold_mdit = build_mdit(MDRenderer, mdformat_opts={"wrap": wrap})
+    memo_mdit = build_mdit(MDRenderer, mdformat_opts={"wrap": wrap})
+    memo = RenderMemo(maxsize=512)
+    memo_mdit.options["render_memo"] = memo
+    cases = [entry["md"] for entry in SPECTESTS_CASES] + list(STYLE_CASES)
+    for md in cases:
+        assert memo_mdit.render(md) == cold_mdit.render(md)
+    assert memo.hits
+    assert len(memo._cache) <= memo.maxsize
+
+
+def test_memo__used_refs():
+    """Test that escaping of square brackets follows used refs."""
+    md = "\\[a\\]\n\n[a]\n\n\\[a\\]\n\n[a]: https://example.com\n"
+    mdit = build_mdit(MDRenderer)
+    mdit.options["render_memo"] = RenderMemo()
+    assert mdit.render(md) == mdformat.text(md)
+    assert mdit.render(md) == "[a]\n\n[a]\n\n\\[a\\]\n\n[a]: https://example.com\n"
+
+
+def test_memo__plugin_renderer(monkeypatch):
+    calls = []
+
+    @pure_render()
+    def text_renderer(node, context):
+        calls.append(node.content)
+        return node.content.upper()
+
+    monkeypatch.setitem(TextEditorPlugin.RENDERERS, "text", text_renderer)
+    mdit = build_mdit(MDRenderer)
+    mdit.options["parser_extension"] = [TextEditorPlugin]
+    mdit.options["render_memo"] = RenderMemo()
+    assert mdit.render("a\n\n*a*\n\nb\n\na\n") == "A\n\n*A*\n\nB\n\nA\n"
+    assert calls == ["a", "b"]
+
+
+def test_memo__lru_eviction():
+    memo = RenderMemo(maxsize=1)
+    mdit = build_mdit(MDRenderer)
+    mdit.options["render_memo"] = memo
+    mdit.render("a\n\nb\n\na\n")
+    assert (memo.hits, memo.misses) == (0, 3)
+    assert memo.hit_rate == 0.0
+    mdit.render("a\n\na\n")
+    assert (memo.hits, memo.misses) == (2, 3)
+
+
+def test_memo__debug_stat(caplog):
+    mdit = build_mdit(MDRenderer)
+    mdit.options["render_memo"] = RenderMemo()
+    with caplog.at_level(logging.DEBUG, logger=LOGGER.name):
+        mdit.render("a\n\na\n")
+    assert "Render memo: 1 hits, 1 misses (50.0% hit rate)" in caplog.messages
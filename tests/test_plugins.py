@@ -1,5 +1,9 @@
 import argparse
+from concurrent.futures import ThreadPoolExecutor
+import os
+from pathlib import Path
 from textwrap import dedent
+import traceback
 from unittest.mock import patch
 
 from markdown_it import MarkdownIt
@@ -8,13 +12,14 @@ import pytest
 import mdformat
 from mdformat._cli import run
 from mdformat._compat import importlib_metadata
+from mdformat._workers import IsolatedExecutor
 from mdformat.plugins import (
     _PARSER_EXTENSION_DISTS,
     CODEFORMATTERS,
     PARSER_EXTENSIONS,
     _load_entrypoints,
 )
-from mdformat.renderer import MDRenderer
+from mdformat.renderer import CodeFormatterCache, MDRenderer
 from tests.utils import (
     ASTChangingPlugin,
     JSONFormatterPlugin,
@@ -334,6 +339,157 @@ def test_code_format_warnings__api(monkeypatch, caplog):
     )
 
 
+def test_code_formatter__executor(monkeypatch, caplog):
+    calls = []
+
+    def fmt_func(code, info):
+        calls.append(code)
+        if code == "invalid\n":
+            raise ValueError("invalid code")
+        return code.upper()
+
+    monkeypatch.setitem(CODEFORMATTERS, "lang", fmt_func)
+    md = (
+        "```lang\na\n```\n\n"
+        "- ```lang\n  b\n  ```\n\n"
+        "```lang\na\n```\n\n"
+        "```lang\ninvalid\n```\n"
+    )
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        formatter = mdformat.Formatter(
+            codeformatters={"lang"}, codeformatter_executor=executor
+        )
+        assert formatter.text(md) == mdformat.text(md, codeformatters={"lang"})
+    assert sorted(calls[:3]) == ["a\n", "b\n", "invalid\n"]
+    assert caplog.messages == 2 * [
+        "Failed formatting content of a lang code block (line 13 before formatting)"
+    ]
+
+
+@pytest.mark.parametrize("use_executor", [False, True])
+def test_code_formatter__cache(monkeypatch, tmp_path, caplog, use_executor):
+    calls = []
+
+    def fmt_func(code, info):
+        calls.append(code)
+        if code == "invalid\n":
+            raise ValueError("invalid code")
+        return code.upper()
+
+    monkeypatch.setitem(CODEFORMATTERS, "lang", fmt_func)
+    md = "```lang\na\n```\n\n```lang\ninvalid\n```\n\n```lang\na\n```\n"
+    expected = "```lang\nA\n```\n\n```lang\ninvalid\n```\n\n```lang\nA\n```\n"
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        for _ in range(2):
+            cache = CodeFormatterCache(directory=tmp_path)
+            formatter = mdformat.Formatter(
+                codeformatters={"lang"},
+                codeformatter_executor=executor if use_executor else None,
+                codeformatter_cache=cache,
+            )
+            assert formatter.text(md) == expected
+            assert formatter.text(md) == expected
+    # The second cache loads results persisted by the first one
+    assert sorted(calls) == ["a\n", "invalid\n"]
+    # Without an executor, duplicate blocks of a document are looked up twice
+    assert (cache.hits, cache.misses) == ((4, 0) if use_executor else (6, 0))
+    assert caplog.messages == 4 * [
+        "Failed formatting content of a lang code block (line 5 before formatting)"
+    ]
+
+
+def test_code_formatter__cached_error_traceback(monkeypatch):
+    def fmt_func(code, info):
+        raise ValueError("invalid code")
+
+    monkeypatch.setitem(CODEFORMATTERS, "lang", fmt_func)
+    cache = CodeFormatterCache()
+    formatter = mdformat.Formatter(codeformatters={"lang"}, codeformatter_cache=cache)
+    md = "```lang\ninvalid\n```\n"
+    tb_lengths = []
+    for _ in range(5):
+        assert formatter.text(md) == md
+        error = cache.get(fmt_func, ("lang", "lang", "invalid\n"))
+        assert isinstance(error, ValueError)
+        tb_lengths.append(len(traceback.extract_tb(error.__traceback__)))
+    # Raising the cached exception again does not grow its traceback
+    assert len(set(tb_lengths)) == 1
+
+
+def crash_once_formatter(code, info):
+    """Crash the process on first call, with the code as a marker
+    file."""
+    marker = Path(code.strip())
+    if not marker.exists():
+        marker.touch()
+        os._exit(1)
+    return "formatted\n"
+
+
+def test_code_formatter__cache_worker_crash(monkeypatch, tmp_path, caplog):
+    monkeypatch.setitem(CODEFORMATTERS, "lang", crash_once_formatter)
+    md = f"```lang\n{tmp_path / 'marker'}\n```\n"
+    outputs = []
+    for _ in range(2):
+        with IsolatedExecutor(1) as executor:
+            formatter = mdformat.Formatter(
+                codeformatters={"lang"},
+                codeformatter_executor=executor,
+                codeformatter_cache=CodeFormatterCache(directory=tmp_path / "cache"),
+            )
+            outputs.append(formatter.text(md))
+    # The crash is not cached, so the second run formats the block
+    assert outputs == [md, "```lang\nformatted\n```\n"]
+
+
+def test_code_formatter__cache_eviction(monkeypatch, tmp_path):
+    monkeypatch.setitem(CODEFORMATTERS, "lang", lambda code, info: code.upper())
+    cache = CodeFormatterCache(maxsize=1, directory=tmp_path, max_disk_size=10)
+    formatter = mdformat.Formatter(codeformatters={"lang"}, codeformatter_cache=cache)
+    formatter.text("```lang\naaaa\n```\n")
+    assert len(list((tmp_path / "codeformatter-v1").iterdir())) == 1
+    formatter.text("```lang\nbbbb\n```\n")
+    assert len(cache._cache) == 1
+    assert len(list((tmp_path / "codeformatter-v1").iterdir())) == 1
+
+
+@pytest.mark.parametrize("use_executor", [False, True])
+def test_code_formatter__batch(monkeypatch, caplog, use_executor):
+    calls = []
+
+    def fmt_func(code, info):
+        calls.append(code)
+        if code == "invalid\n":
+            raise ValueError("invalid code")
+        return code.upper()
+
+    def format_batch(blocks):
+        calls.append(blocks)
+        return [fmt_func(code, info) for code, info in blocks]
+
+    fmt_func.format_batch = format_batch  # type: ignore[attr-defined]
+    monkeypatch.setitem(CODEFORMATTERS, "lang", fmt_func)
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        formatter = mdformat.Formatter(
+            codeformatters={"lang"},
+            codeformatter_executor=executor if use_executor else None,
+        )
+        md = "```lang\na\n```\n\n- ```lang x\n  b\n  ```\n\n```lang\na\n```\n"
+        assert formatter.text(md) == (
+            "```lang\nA\n```\n\n- ```lang x\n  B\n  ```\n\n```lang\nA\n```\n"
+        )
+        assert calls[0] == [("a\n", "lang"), ("b\n", "lang x")]
+
+        # Fall back to formatting blocks one by one if the batch fails
+        calls.clear()
+        md = "```lang\nc\n```\n\n```lang\ninvalid\n```\n"
+        assert formatter.text(md) == "```lang\nC\n```\n\n```lang\ninvalid\n```\n"
+        assert calls[-2:] == ["c\n", "invalid\n"]
+    assert caplog.messages == [
+        "Failed formatting content of a lang code block (line 5 before formatting)"
+    ]
+
+
 def test_plugin_conflict(monkeypatch, tmp_path, capsys):
     """Test a warning when plugins try to render same syntax."""
     plugin_name_1 = "plug1"
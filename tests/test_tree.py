@@ -0,0 +1,94 @@
+from markdown_it import MarkdownIt
+from markdown_it.tree import SyntaxTreeNode
+import pytest
+
+from mdformat.renderer import RenderTreeNode
+
+EXAMPLE_MD = """\
+# Heading
+
+Paragraph with *emphasis*, `code` and a [link](https://example.com "title").
+
+- item 1
+- item 2
+  > quote with ![image](img.png)
+
+1) first
+
+```python
+print("hello")
+```
+"""
+
+
+def _node_attrs(node):
+    attrs = {
+        "type": node.type,
+        "is_root": node.is_root,
+        "is_nested": node.is_nested,
+        "children": len(node.children),
+        "next_sibling": repr(node.next_sibling),
+        "previous_sibling": repr(node.previous_sibling),
+        "parent": repr(node.parent),
+    }
+    if not node.is_root:
+        for name in (
+            "tag",
+            "attrs",
+            "map",
+            "level",
+            "content",
+            "markup",
+            "info",
+            "meta",
+            "block",
+            "hidden",
+        ):
+            attrs[name] = getattr(node, name)
+    return attrs
+
+
+def test_api_matches_syntax_tree_node():
+    tokens = MarkdownIt().parse(EXAMPLE_MD)
+    syntax_nodes = list(SyntaxTreeNode(tokens).walk())
+    render_nodes = list(RenderTreeNode(tokens).walk())
+    assert len(syntax_nodes) == len(render_nodes)
+    for syntax_node, render_node in zip(syntax_nodes, render_nodes):
+        expected = _node_attrs(syntax_node)
+        expected["next_sibling"] = expected["next_sibling"].replace(
+            "SyntaxTreeNode", "RenderTreeNode"
+        )
+        expected["previous_sibling"] = expected["previous_sibling"].replace(
+            "SyntaxTreeNode", "RenderTreeNode"
+        )
+        expected["parent"] = expected["parent"].replace(
+            "SyntaxTreeNode", "RenderTreeNode"
+        )
+        assert _node_attrs(render_node) == expected
+        assert render_node.to_tokens() == syntax_node.to_tokens()
+    assert RenderTreeNode(tokens).pretty(show_text=True) == SyntaxTreeNode(
+        tokens
+    ).pretty(show_text=True)
+
+
+def test_create_root_false():
+    tokens = MarkdownIt().parse("*a*\n")
+    node = RenderTreeNode(tokens, create_root=False)
+    assert node.type == "paragraph"
+    assert node.nester_tokens == (tokens[0], tokens[-1])
+    assert node.token is None
+    assert RenderTreeNode(tokens[1:2], create_root=False).token is tokens[1]
+
+    with pytest.raises(ValueError):
+        RenderTreeNode([], create_root=False)
+    with pytest.raises(ValueError):
+        RenderTreeNode(tokens[:1], create_root=False)
+
+
+def test_children_setter():
+    tree = RenderTreeNode(MarkdownIt().parse("a\n\nb\n\nc\n"))
+    first, second, third = tree.children
+    tree.children = [third, first]
+    assert first.previous_sibling is third
+    assert third.next_sibling is first
+    assert second not in tree.children
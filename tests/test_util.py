@@ -1,4 +1,9 @@
-from mdformat._util import is_md_equal
+from io import BytesIO
+
+import pytest
+
+import mdformat._util
+from mdformat._util import is_md_equal, newline_converted_equal, read_md, write_md
 
 
 def test_is_md_equal():
@@ -48,3 +53,38 @@ console.log()
 """
     assert not is_md_equal(md1, md2)
     assert not is_md_equal(md1, md2, codeformatters=("js",))
+
+
+@pytest.mark.parametrize(
+    "md,newline,original,expected",
+    [
+        ("a\nb\n", "\n", "a\nb\n", True),
+        ("a\nb\n", "\r\n", "a\r\nb\r\n", True),
+        ("a\nb\n", "\r\n", "a\nb\n", False),
+        ("a\nb\n", "\r\n", "a\r\nc\r\n", False),
+    ],
+)
+def test_newline_converted_equal(md, newline, original, expected, monkeypatch):
+    assert newline_converted_equal(md, newline, original) is expected
+    monkeypatch.setattr(mdformat._util, "_CHUNK_SIZE", 1)
+    assert newline_converted_equal(md, newline, original) is expected
+
+
+def test_write_md(monkeypatch):
+    monkeypatch.setattr(mdformat._util, "_CHUNK_SIZE", 2)
+    f = BytesIO()
+    write_md(f, "a\nä\n\n", "\r\n")
+    assert f.getvalue() == "a\r\nä\r\n\r\n".encode()
+
+
+@pytest.mark.parametrize("threshold", [1, 1 << 24])
+def test_read_md(tmp_path, monkeypatch, threshold):
+    monkeypatch.setattr(mdformat._util, "MMAP_THRESHOLD", threshold)
+    path = tmp_path / "test.md"
+    path.write_bytes("- ä\r\n- b\n".encode())
+    assert read_md(path) == "- ä\r\n- b\n"
+    path.write_bytes(b"")
+    assert read_md(path) == ""
+    path.write_bytes(b"\xff")
+    with pytest.raises(UnicodeDecodeError):
+        read_md(path)
@@ -0,0 +1,125 @@
+import os
+from pathlib import Path
+import subprocess
+import sys
+import time
+
+import pytest
+
+from mdformat._cli import run, walk_md_files
+from mdformat._watch import InotifyWatcher, PollingWatcher, Watcher
+from tests.utils import FORMATTED_MARKDOWN, UNFORMATTED_MARKDOWN
+
+
+def wait_for(watcher, expected, timeout=5.0):
+    changed: set[Path] = set()
+    deadline = time.monotonic() + timeout
+    while not expected <= changed and time.monotonic() < deadline:
+        changed |= watcher.wait(0.1)
+    return changed
+
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="requires inotify")
+def test_inotify_watcher(tmp_path):
+    (tmp_path / "skipped").mkdir()
+    (tmp_path / "sub").mkdir()
+    with InotifyWatcher(
+        [tmp_path], skip_dir=lambda path: path.name == "skipped"
+    ) as watcher:
+        (tmp_path / "skipped" / "a.md").write_text("a")
+        (tmp_path / "sub" / "b.md").write_text("b")
+        assert wait_for(watcher, {tmp_path / "sub" / "b.md"}) == {
+            tmp_path / "sub" / "b.md"
+        }
+
+        # A new directory is reported, and then watched
+        (tmp_path / "new").mkdir()
+        assert wait_for(watcher, {tmp_path / "new"}) == {tmp_path / "new"}
+        (tmp_path / "new" / "c.md").write_text("c")
+        assert wait_for(watcher, {tmp_path / "new" / "c.md"}) == {
+            tmp_path / "new" / "c.md"
+        }
+
+        # Atomic replace of a file
+        (tmp_path / "tmp").write_text("d")
+        os.replace(tmp_path / "tmp", tmp_path / "d.md")
+        assert tmp_path / "d.md" in wait_for(watcher, {tmp_path / "d.md"})
+        assert watcher.wait(0.1) == set()
+
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="requires inotify")
+def test_inotify_watcher__file_root(tmp_path):
+    file_path = tmp_path / "a.md"
+    file_path.write_text("a")
+    with InotifyWatcher([file_path]) as watcher:
+        file_path.write_text("b")
+        assert wait_for(watcher, {file_path}) == {file_path}
+
+
+def test_polling_watcher(tmp_path):
+    (tmp_path / "a.md").write_text("a")
+    watcher = PollingWatcher(lambda: walk_md_files(tmp_path), interval=0.01)
+    assert watcher.wait(0) == set()
+    (tmp_path / "a.md").write_text("changed")
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "sub" / "b.md").write_text("b")
+    expected = {tmp_path / "a.md", tmp_path / "sub" / "b.md"}
+    assert wait_for(watcher, expected) == expected
+    assert watcher.wait(0.05) == set()
+
+
+def test_batches(tmp_path):
+    (tmp_path / "a.md").write_text("a")
+    watcher = PollingWatcher(lambda: walk_md_files(tmp_path), interval=0.01)
+    (tmp_path / "a.md").write_text("changed")
+    (tmp_path / "b.md").write_text("b")
+    assert next(watcher.batches(0.05)) == {tmp_path / "a.md", tmp_path / "b.md"}
+
+
+def test_watcher__abstract():
+    class IncompleteWatcher(Watcher):
+        pass
+
+    with pytest.raises(TypeError):
+        IncompleteWatcher()  # type: ignore[abstract]
+
+
+def test_cli_watch(tmp_path):
+    file_path = tmp_path / "test.md"
+    file_path.write_text(UNFORMATTED_MARKDOWN)
+    process = subprocess.Popen(
+        [sys.executable, "-m", "mdformat", "--watch", str(tmp_path)],
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+    try:
+        assert process.stderr is not None
+        assert "Watching for changes" in process.stderr.readline()
+        assert file_path.read_text() == FORMATTED_MARKDOWN
+
+        new_path = tmp_path / "sub" / "new.md"
+        new_path.parent.mkdir()
+        new_path.write_text(UNFORMATTED_MARKDOWN)
+        file_path.write_text("* a\n")
+        deadline = time.monotonic() + 10
+        while time.monotonic() < deadline:
+            if file_path.read_text() == "- a\n" and new_path.read_text() == (
+                FORMATTED_MARKDOWN
+            ):
+                break
+            time.sleep(0.05)
+        assert file_path.read_text() == "- a\n"
+        assert new_path.read_text() == FORMATTED_MARKDOWN
+    finally:
+        process.terminate()
+        process.wait(10)
+
+
+@pytest.mark.parametrize(
+    "args", [["-"], ["--changed-since=HEAD", "."], ["--diff-ranges", "."]]
+)
+def test_cli_watch__invalid(args, capsys):
+    with pytest.raises(SystemExit) as exc_info:
+        run(["--watch", *args])
+    assert exc_info.value.code == 2
+    assert "--watch can not be used with" in capsys.readouterr().err
@@ -0,0 +1,72 @@
+from concurrent.futures import wait
+import os
+import threading
+import time
+
+import pytest
+
+from mdformat._workers import IsolatedExecutor
+
+
+def sleep_and_get_pid(seconds):
+    time.sleep(seconds)
+    return os.getpid()
+
+
+def crash():
+    os._exit(1)
+
+
+def raise_value_error():
+    raise ValueError("oops")
+
+
+@pytest.fixture
+def executor():
+    with IsolatedExecutor(1, timeout=2) as executor:
+        yield executor
+
+
+def test_worker_reuse(executor):
+    pid = executor.submit(sleep_and_get_pid, 0).result()
+    assert executor.submit(sleep_and_get_pid, 0).result() == pid
+    assert pid != os.getpid()
+
+
+def test_timeout_recycles_worker(executor):
+    pid = executor.submit(sleep_and_get_pid, 0).result()
+    slow = executor.submit(sleep_and_get_pid, 60)
+    fast = executor.submit(sleep_and_get_pid, 0)
+    with pytest.raises(TimeoutError):
+        slow.result()
+    assert fast.result() != pid
+
+
+def test_crash_and_exception(executor):
+    with pytest.raises(RuntimeError, match="Worker process died"):
+        executor.submit(crash).result()
+    with pytest.raises(ValueError, match="oops"):
+        executor.submit(raise_value_error).result()
+    assert executor.submit(sleep_and_get_pid, 0).result() != os.getpid()
+
+
+def test_unpicklable(executor):
+    pid = executor.submit(sleep_and_get_pid, 0).result()
+    with pytest.raises(TypeError):
+        executor.submit(sleep_and_get_pid, threading.Lock()).result()
+    with pytest.raises(RuntimeError):
+        executor.submit(threading.Lock).result()
+    # The worker process is not replaced
+    assert executor.submit(sleep_and_get_pid, 0).result() == pid
+
+
+def test_shutdown():
+    executor = IsolatedExecutor(2)
+    futures = [executor.submit(sleep_and_get_pid, 0.1) for _ in range(4)]
+    executor.shutdown()
+    done, not_done = wait(futures)
+    assert not not_done
+    with pytest.raises(RuntimeError):
+        executor.submit(sleep_and_get_pid, 0)
+    with pytest.raises(ValueError):
+        IsolatedExecutor(0)